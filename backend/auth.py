@@ -1,8 +1,10 @@
 """
 Authentication utilities - JWT tokens and password hashing
 """
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -14,6 +16,10 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# In-process user cache (USER_CACHE_TTL=0 disables it)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "5"))  # seconds
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -21,6 +27,49 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 
+class UserCache:
+    """Short-TTL, size-bounded cache of user documents keyed by user id"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        self._entries.move_to_end(user_id)
+        return dict(user)
+
+    def set(self, user_id: str, user: dict):
+        if self.ttl <= 0:
+            return
+        # Keep our own copy: callers may mutate the dict they were given
+        self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+
+
+def invalidate_user(user_id: str):
+    """Drop a cached user after any write to its users document"""
+    user_cache.invalidate(user_id)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -72,18 +121,22 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
     
-    # Get user from database - will be injected by the route
-    from motor.motor_asyncio import AsyncIOMotorClient
-    mongo_url = os.getenv("MONGO_URL")
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.getenv("DB_NAME")]
+    # Get user from the cache or the shared, pooled database handle
+    from database import db
     
-    user = await db.users.find_one({"id": user_id})
+    user = user_cache.get(user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
+        user = await db.users.find_one({"id": user_id})
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        user_cache.set(user_id, user)
+    elif await db.users.find_one({"id": user_id, "is_banned": True}, {"_id": 1}):
+        # Bans are set outside this process: never trust a cached copy for them
+        invalidate_user(user_id)
+        user["is_banned"] = True
     
     if user.get("is_banned"):
         raise HTTPException(
@@ -0,0 +1,128 @@
+"""
+Server-side auto-caller: one asyncio task per room drawing numbers on a fixed beat
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUTO_SPEED = 5  # seconds between numbers
+MIN_AUTO_SPEED = 1
+MAX_AUTO_SPEED = 60
+
+# A failing tick is retried this many times, backing off, before giving up
+AUTO_CALL_RETRIES = 3
+AUTO_CALL_BACKOFF = 1.0  # seconds, doubled on each consecutive failure
+
+# Called once per tick with the room id; returning False stops the caller
+CallFn = Callable[[str], Awaitable[bool]]
+# Called with the room id when a caller ends on its own (game over or errors)
+StopFn = Callable[[str], Awaitable[None]]
+
+
+class AutoCaller:
+    """
+    Registry of per-room auto-call tasks.
+
+    Ticks are scheduled against absolute deadlines on the event loop clock,
+    so a slow call delays only that tick instead of pushing every later
+    number back. Paused rooms keep their task alive but skip calls. A
+    failing tick is retried with backoff; a caller that gives up, or whose
+    game ends, reports it through `on_stop` so clients stop showing it.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._speeds: Dict[str, float] = {}
+        self._paused: Set[str] = set()
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def speed(self, room_id: str) -> float:
+        return self._speeds.get(room_id, DEFAULT_AUTO_SPEED)
+
+    def start(self, room_id: str, call: CallFn, auto_speed: float = DEFAULT_AUTO_SPEED,
+              paused: bool = False, on_stop: Optional[StopFn] = None):
+        """Start (or restart with a new speed) auto-calling for a room"""
+        self.stop(room_id)
+        auto_speed = max(MIN_AUTO_SPEED, min(MAX_AUTO_SPEED, auto_speed))
+        self._speeds[room_id] = auto_speed
+        self.set_paused(room_id, paused)
+        self._tasks[room_id] = asyncio.create_task(self._run(room_id, auto_speed, call, on_stop))
+        logger.info(f"Auto-caller started in room {room_id} every {auto_speed}s")
+
+    def set_paused(self, room_id: str, paused: bool):
+        if paused:
+            self._paused.add(room_id)
+        else:
+            self._paused.discard(room_id)
+
+    def stop(self, room_id: str):
+        """Stop auto-calling for a room. Safe to call from inside the tick itself."""
+        task = self._tasks.pop(room_id, None)
+        self._speeds.pop(room_id, None)
+        self._paused.discard(room_id)
+        if task is None:
+            return
+        # When stopped from within its own tick (e.g. game completion) the
+        # loop notices it is no longer registered and exits on its own
+        if task is not asyncio.current_task():
+            task.cancel()
+        logger.info(f"Auto-caller stopped in room {room_id}")
+
+    async def stop_all(self):
+        tasks = list(self._tasks.values())
+        for room_id in list(self._tasks):
+            self.stop(room_id)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, room_id: str, interval: float, call: CallFn, on_stop: Optional[StopFn]):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        next_tick = loop.time()
+        failures = 0
+        try:
+            while self._tasks.get(room_id) is task:
+                if room_id not in self._paused:
+                    try:
+                        if not await call(room_id):
+                            break
+                        failures = 0
+                    except Exception as e:
+                        failures += 1
+                        if failures > AUTO_CALL_RETRIES:
+                            logger.error(f"Auto-caller giving up in room {room_id}: {e}")
+                            break
+                        backoff = AUTO_CALL_BACKOFF * 2 ** (failures - 1)
+                        logger.warning(f"Auto-caller error in room {room_id}, retrying in {backoff}s: {e}")
+                        await asyncio.sleep(backoff)
+                        next_tick = loop.time()
+                        continue
+
+                next_tick += interval
+                delay = next_tick - loop.time()
+                if delay < 0:
+                    # Fell a whole beat behind; resync rather than burst-call
+                    next_tick = loop.time()
+                    delay = 0
+                await asyncio.sleep(delay)
+        finally:
+            if self._tasks.get(room_id) is task:
+                self._tasks.pop(room_id, None)
+                self._speeds.pop(room_id, None)
+                self._paused.discard(room_id)
+                # Ended on its own rather than through stop(): tell the room
+                if on_stop is not None:
+                    try:
+                        await on_stop(room_id)
+                    except Exception as e:
+                        logger.error(f"Auto-caller stop notice failed in room {room_id}: {e}")
+
+
+# Shared process-wide scheduler
+auto_caller = AutoCaller()
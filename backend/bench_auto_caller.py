@@ -0,0 +1,67 @@
+"""
+Benchmark: auto-caller tick drift with thousands of rooms on one event loop
+
+Each room's tick does a small amount of async work (simulating the Mongo
+write and broadcast); drift is how late each tick fires versus its
+scheduled slot.
+
+Usage: python bench_auto_caller.py [--rooms 1000 5000] [--speed 1] [--ticks 10]
+"""
+import argparse
+import asyncio
+import statistics
+
+import auto_caller as auto_caller_module
+from auto_caller import AutoCaller
+
+
+async def run(rooms, speed, ticks, work_ms):
+    # Let the benchmark use sub-second beats
+    auto_caller_module.MIN_AUTO_SPEED = 0.01
+
+    loop = asyncio.get_running_loop()
+    caller = AutoCaller()
+    drifts = []
+    counts = {}
+    starts = {}
+
+    async def tick(room_id):
+        now = loop.time()
+        n = counts.get(room_id, 0)
+        if n == 0:
+            starts[room_id] = now
+        else:
+            drifts.append(now - (starts[room_id] + n * speed))
+        counts[room_id] = n + 1
+        await asyncio.sleep(work_ms / 1000)
+        return counts[room_id] < ticks
+
+    for i in range(rooms):
+        caller.start(f"room-{i}", tick, auto_speed=speed)
+
+    while len(caller):
+        await asyncio.sleep(speed)
+
+    drifts_ms = sorted(d * 1000 for d in drifts)
+    p99 = drifts_ms[int(len(drifts_ms) * 0.99) - 1]
+    print(
+        f"{rooms:>7} {len(drifts_ms):>8} "
+        f"{statistics.mean(drifts_ms):>10.2f} {statistics.median(drifts_ms):>10.2f} "
+        f"{p99:>10.2f} {drifts_ms[-1]:>10.2f}"
+    )
+
+
+async def main(args):
+    print(f"{'rooms':>7} {'ticks':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for rooms in args.rooms:
+        await run(rooms, args.speed, args.ticks, args.work_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--speed", type=float, default=1.0, help="seconds between numbers")
+    parser.add_argument("--ticks", type=int, default=10, help="numbers called per room")
+    parser.add_argument("--work-ms", type=float, default=2.0, help="simulated work per tick")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,98 @@
+"""
+Benchmark: per-call auto-marking latency, legacy loop vs bulk index path
+
+Seeds a throwaway room with 100, 1k and 10k tickets in a separate
+"<DB_NAME>_bench" database and times calling numbers through both paths.
+
+Usage: python bench_auto_mark.py [--calls 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from ticket_generator import generate_tambola_ticket  # noqa: E402
+from ticket_index import RoomTicketIndex  # noqa: E402
+import ticket_index as ticket_index_module  # noqa: E402
+
+TICKET_COUNTS = [100, 1000, 10000]
+
+
+async def legacy_mark(db, room_id, number):
+    """The previous call_number auto-mark loop, kept for comparison"""
+    tickets = await db.tickets.find({"room_id": room_id}).to_list(None)
+    for ticket in tickets:
+        if any(number in row for row in ticket["grid"]):
+            marked = ticket.get("marked_numbers", [])
+            if number not in marked:
+                marked.append(number)
+                await db.tickets.update_one(
+                    {"id": ticket["id"]},
+                    {"$set": {"marked_numbers": marked}}
+                )
+
+
+async def seed_room(db, count):
+    room_id = str(uuid.uuid4())
+    docs = []
+    for i in range(count):
+        data = generate_tambola_ticket(i + 1)
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "room_id": room_id,
+            "user_id": f"user-{i % 50}",
+            "ticket_number": i + 1,
+            "grid": data["grid"],
+            "numbers": data["numbers"],
+            "marked_numbers": [],
+        })
+    await db.tickets.insert_many(docs)
+    return room_id
+
+
+async def time_calls(mark, db, room_id, calls):
+    numbers = random.sample(range(1, 91), calls)
+    start = time.perf_counter()
+    for number in numbers:
+        await mark(db, room_id, number)
+    return (time.perf_counter() - start) / calls * 1000
+
+
+async def main(calls):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME'] + "_bench"]
+    await db.tickets.create_index([("room_id", 1)])
+    await db.tickets.create_index([("id", 1)])
+
+    print(f"{'tickets':>8} {'legacy ms/call':>16} {'bulk ms/call':>14}")
+    try:
+        for count in TICKET_COUNTS:
+            legacy_room = await seed_room(db, count)
+            bulk_room = await seed_room(db, count)
+
+            legacy_ms = await time_calls(legacy_mark, db, legacy_room, calls)
+
+            # Fresh index so the one-off build is included in the first call
+            ticket_index_module.ticket_index = RoomTicketIndex()
+            bulk_ms = await time_calls(ticket_index_module.mark_number, db, bulk_room, calls)
+
+            print(f"{count:>8} {legacy_ms:>16.2f} {bulk_ms:>14.2f}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
@@ -0,0 +1,141 @@
+"""
+Benchmark: Socket.IO connections and broadcast throughput vs worker count
+
+Starts N worker processes (uvicorn + python-socketio, one port each)
+sharing a Redis message queue, spreads client connections across them
+from several client processes, then has one worker broadcast to a room
+everyone joined. Reports connections/s and delivered messages/s.
+
+Needs a Redis server plus the client extras (aiohttp):
+
+    pip install "python-socketio[asyncio_client]" uvicorn redis
+    python bench_cluster.py --workers 1 2 4 --clients 400 --messages 200
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import time
+
+BASE_PORT = 8600
+ROOM = "bench"
+
+
+# ============= WORKER =============
+def run_worker(port: int, queue_url: str):
+    import socketio
+    import uvicorn
+    from cluster import make_client_manager
+
+    sio = socketio.AsyncServer(async_mode="asgi", client_manager=make_client_manager(queue_url))
+
+    @sio.event
+    async def join(sid, data):
+        await sio.enter_room(sid, ROOM)
+
+    @sio.event
+    async def blast(sid, data):
+        for i in range(data["count"]):
+            await sio.emit("tick", {"i": i}, room=ROOM)
+
+    uvicorn.run(socketio.ASGIApp(sio), host="127.0.0.1", port=port, log_level="error")
+
+
+# ============= CLIENTS =============
+async def _clients(ports, count, offset, expected, ready, go, results):
+    import socketio
+
+    received = 0
+    done = asyncio.Event()
+    clients = []
+
+    def on_tick(data):
+        nonlocal received
+        received += 1
+        if received >= expected * count:
+            done.set()
+
+    start = time.perf_counter()
+    for i in range(count):
+        client = socketio.AsyncClient()
+        client.on("tick", on_tick)
+        await client.connect(f"http://127.0.0.1:{ports[(offset + i) % len(ports)]}", transports=["websocket"])
+        await client.emit("join", {})
+        clients.append(client)
+    connect_time = time.perf_counter() - start
+
+    ready.put(connect_time)
+    await asyncio.get_running_loop().run_in_executor(None, go.wait)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(done.wait(), timeout=60)
+    except asyncio.TimeoutError:
+        pass
+    results.put((received, time.perf_counter() - start))
+
+    for client in clients:
+        await client.disconnect()
+
+
+def run_clients(ports, count, offset, expected, ready, go, results):
+    asyncio.run(_clients(ports, count, offset, expected, ready, go, results))
+
+
+async def _trigger(port: int, messages: int):
+    import socketio
+    client = socketio.AsyncClient()
+    await client.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+    await client.emit("blast", {"count": messages})
+    await asyncio.sleep(0.5)
+    await client.disconnect()
+
+
+def measure(workers: int, clients: int, client_procs: int, messages: int, queue_url: str):
+    ports = [BASE_PORT + i for i in range(workers)]
+    servers = [mp.Process(target=run_worker, args=(port, queue_url if workers > 1 else ""), daemon=True)
+               for port in ports]
+    for server in servers:
+        server.start()
+    time.sleep(1.5)
+
+    ready, results, go = mp.Queue(), mp.Queue(), mp.Event()
+    per_proc = clients // client_procs
+    procs = [mp.Process(target=run_clients, args=(ports, per_proc, i * per_proc, messages, ready, go, results))
+             for i in range(client_procs)]
+    for proc in procs:
+        proc.start()
+    connect_times = [ready.get() for _ in procs]
+
+    go.set()
+    asyncio.run(_trigger(ports[0], messages))
+    outcomes = [results.get() for _ in procs]
+
+    for proc in procs:
+        proc.join(timeout=10)
+    for server in servers:
+        server.terminate()
+
+    connected = per_proc * client_procs
+    delivered = sum(r for r, _ in outcomes)
+    elapsed = max(t for _, t in outcomes)
+    print(f"{workers:>8} {connected:>8} {connected / max(connect_times):>11,.0f} "
+          f"{delivered:>10,} {delivered / elapsed:>13,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=400)
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--queue", default=os.getenv("SOCKETIO_MESSAGE_QUEUE") or "redis://localhost:6379/0")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'clients':>8} {'conns/s':>11} {'delivered':>10} {'msgs/s':>13}")
+    for workers in args.workers:
+        measure(workers, args.clients, args.client_procs, args.messages, args.queue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: ticket-number allocation under concurrent buyers
+
+Compares the previous count_documents()+1 numbering with the block-cached
+allocator, timing allocations and counting duplicate numbers. Runs in a
+separate "<DB_NAME>_bench" database.
+
+Usage: python bench_sequences.py [--buyers 200] [--existing 5000]
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from sequences import TicketNumberAllocator  # noqa: E402
+
+
+async def seed_room(db, existing):
+    room_id = str(uuid.uuid4())
+    if existing:
+        await db.tickets.insert_many([
+            {"id": str(uuid.uuid4()), "room_id": room_id, "ticket_number": i + 1}
+            for i in range(existing)
+        ])
+    return room_id
+
+
+async def legacy_buyer(db, room_id):
+    """The previous numbering: count, then insert"""
+    number = await db.tickets.count_documents({"room_id": room_id}) + 1
+    await db.tickets.insert_one({"id": str(uuid.uuid4()), "room_id": room_id, "ticket_number": number})
+    return number
+
+
+async def allocator_buyer(allocator, db, room_id):
+    number = (await allocator.allocate(db, room_id))[0]
+    await db.tickets.insert_one({"id": str(uuid.uuid4()), "room_id": room_id, "ticket_number": number})
+    return number
+
+
+async def run(buyers, coro_for):
+    start = time.perf_counter()
+    numbers = await asyncio.gather(*[coro_for() for _ in range(buyers)])
+    elapsed = time.perf_counter() - start
+    return elapsed, buyers - len(set(numbers))
+
+
+async def main(buyers, existing):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME'] + "_bench"]
+    await db.tickets.create_index([("room_id", 1), ("user_id", 1)])
+
+    print(f"{'numbering':<26} {'buyers':>7} {'ms':>9} {'buys/s':>9} {'duplicates':>11}")
+    try:
+        room_id = await seed_room(db, existing)
+        elapsed, dupes = await run(buyers, lambda: legacy_buyer(db, room_id))
+        print(f"{'count_documents + 1':<26} {buyers:>7} {elapsed * 1000:>9.1f} {buyers / elapsed:>9,.0f} {dupes:>11}")
+
+        for block_size in (1, 50):
+            room_id = await seed_room(db, existing)
+            allocator = TicketNumberAllocator(block_size)
+            elapsed, dupes = await run(buyers, lambda: allocator_buyer(allocator, db, room_id))
+            label = f"allocator (block {block_size})"
+            print(f"{label:<26} {buyers:>7} {elapsed * 1000:>9.1f} {buyers / elapsed:>9,.0f} {dupes:>11}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--existing", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.buyers, args.existing))
@@ -0,0 +1,99 @@
+"""
+Benchmark: serializing a 50-player room and 1000 tickets
+
+Compares the previous path (recursive serialize_doc, then Pydantic
+validation and FastAPI's jsonable_encoder for responses, stdlib json for
+Socket.IO packets) with the serialization module (documents read without
+_id, one encoder pass).
+
+Usage: python bench_serialization.py [--players 50] [--tickets 1000]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from models import Room, RoomType, PrizeConfig, PrizeType, Ticket
+from serialization import dumpb, dumps
+from ticket_generator import generate_tickets
+
+
+def legacy_serialize_doc(doc):
+    """The recursive serializer previously defined in both server modules"""
+    if doc is None:
+        return None
+    if isinstance(doc, ObjectId):
+        return str(doc)
+    if isinstance(doc, dict):
+        return {key: legacy_serialize_doc(value) for key, value in doc.items()}
+    if isinstance(doc, list):
+        return [legacy_serialize_doc(item) for item in doc]
+    if isinstance(doc, datetime):
+        return doc.isoformat()
+    return doc
+
+
+def build(players: int, tickets: int):
+    room = Room(
+        name="Bench", host_id="host", host_name="Host", room_type=RoomType.PUBLIC,
+        ticket_price=10, max_players=players, min_players=2, auto_start=False,
+        prizes=[PrizeConfig(prize_type=p, amount=100) for p in PrizeType],
+        players=[{"id": str(uuid.uuid4()), "name": f"Player {i}", "joined_at": datetime.utcnow()}
+                 for i in range(players)],
+        called_numbers=list(range(1, 61)),
+    ).model_dump()
+    ticket_docs = [
+        Ticket(
+            ticket_number=t["ticket_number"], user_id=room["players"][i % players]["id"],
+            user_name=room["players"][i % players]["name"], room_id=room["id"],
+            grid=t["grid"], numbers=t["numbers"], marked_numbers=t["numbers"][:5],
+        ).model_dump()
+        for i, t in enumerate(generate_tickets(tickets))
+    ]
+    # As read from Mongo without a projection
+    with_id = [{"_id": ObjectId(), **doc} for doc in [room] + ticket_docs]
+    return room, ticket_docs, with_id[0], with_id[1:]
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main(players, tickets, rounds):
+    room, ticket_docs, room_raw, tickets_raw = build(players, tickets)
+
+    cases = [
+        ("room response",
+         lambda: json.dumps(jsonable_encoder(Room(**legacy_serialize_doc(room_raw)))).encode(),
+         lambda: dumpb(Room(**room))),
+        ("room socket payload",
+         lambda: json.dumps(["room_joined", {"room": legacy_serialize_doc(room_raw)}], separators=(",", ":")),
+         lambda: dumps(["room_joined", {"room": room}])),
+        (f"{tickets} tickets response",
+         lambda: json.dumps(jsonable_encoder([Ticket(**legacy_serialize_doc(t)) for t in tickets_raw])).encode(),
+         lambda: dumpb(ticket_docs)),
+        (f"{tickets} tickets socket payload",
+         lambda: json.dumps(["tickets", [legacy_serialize_doc(t) for t in tickets_raw]], separators=(",", ":")),
+         lambda: dumps(["tickets", ticket_docs])),
+    ]
+
+    print(f"{'payload':<28} {'legacy ms':>10} {'new ms':>9} {'speedup':>8}")
+    for name, legacy, new in cases:
+        legacy_ms, new_ms = timed(legacy, rounds), timed(new, rounds)
+        print(f"{name:<28} {legacy_ms:>10.3f} {new_ms:>9.3f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    main(args.players, args.tickets, args.rounds)
@@ -0,0 +1,105 @@
+"""
+Benchmark: paying out a room's winners, per-claim writes vs settlement
+
+Seeds rooms with 10, 100 and 1000 unpaid winners in a separate
+"<DB_NAME>_bench" database. The legacy path pays each winner the way
+claim_prize_api did (wallet, stats, ledger entry) and then ranks them one
+update_one at a time like end_game; the settlement path runs settle_room.
+
+Usage: python bench_settlement.py
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from models import Transaction, TransactionType, Winner, PrizeType  # noqa: E402
+from settlement import rank_winners, settle_room  # noqa: E402
+
+WINNER_COUNTS = [10, 100, 1000]
+PLAYERS = 50
+
+
+async def legacy_payout(db, room_id, room_name):
+    """Per-winner credit plus per-rank update, as before settlement"""
+    winners = await db.winners.find({"room_id": room_id}, {"_id": 0}).to_list(None)
+    for winner in winners:
+        user = await db.users.find_one({"id": winner["user_id"]})
+        new_balance = user.get("wallet_balance", 0.0) + winner["amount"]
+        await db.users.update_one(
+            {"id": winner["user_id"]},
+            {"$set": {"wallet_balance": new_balance},
+             "$inc": {"total_wins": 1, "total_winnings": winner["amount"]}}
+        )
+        await db.transactions.insert_one(Transaction(
+            user_id=winner["user_id"], amount=winner["amount"], type=TransactionType.CREDIT,
+            description=f"Won {winner['prize_type']} in {room_name}", balance_after=new_balance,
+            room_id=room_id, ticket_id=winner["ticket_id"]
+        ).dict())
+    for winner in rank_winners(winners):
+        await db.winners.update_one({"id": winner["id"]}, {"$set": {"rank": winner["rank"]}})
+
+
+async def seed_room(db, count):
+    room_id = str(uuid.uuid4())
+    prize_types = list(PrizeType)
+    await db.rooms.insert_one({"id": room_id, "name": "Bench", "status": "completed", "winners": []})
+    await db.winners.insert_many([
+        Winner(
+            user_id=f"user-{i % PLAYERS}", user_name=f"Player {i % PLAYERS}", room_id=room_id,
+            ticket_id=str(uuid.uuid4()), ticket_number=i + 1,
+            prize_type=prize_types[i % len(prize_types)], amount=10.0, verified=True,
+            verified_at=datetime.utcnow()
+        ).dict()
+        for i in range(count)
+    ])
+    return room_id
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME'] + "_bench"]
+    await db.users.create_index([("id", 1)], unique=True)
+    await db.winners.create_index([("room_id", 1)])
+    await db.winners.create_index([("id", 1)])
+    await db.transactions.create_index([("key", 1)], unique=True, partialFilterExpression={"key": {"$type": "string"}})
+    await db.users.insert_many([{"id": f"user-{i}", "wallet_balance": 0.0} for i in range(PLAYERS)])
+
+    print(f"{'winners':>8} {'legacy ms':>10} {'settle ms':>10} {'re-run ms':>10}")
+    try:
+        for count in WINNER_COUNTS:
+            legacy_room = await seed_room(db, count)
+            settle_room_id = await seed_room(db, count)
+
+            start = time.perf_counter()
+            await legacy_payout(db, legacy_room, "Bench")
+            legacy_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            await settle_room(db, settle_room_id, "Bench")
+            settle_ms = (time.perf_counter() - start) * 1000
+
+            # A second run must find everything paid and credit nothing
+            start = time.perf_counter()
+            await settle_room(db, settle_room_id, "Bench")
+            rerun_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{count:>8} {legacy_ms:>10.1f} {settle_ms:>10.1f} {rerun_ms:>10.1f}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark: game_started ticket payload, JSON vs packed
+
+Builds a room of tickets shaped like stored documents, then compares the
+JSON payload the start_game handler used to build (serialize_doc on every
+ticket) with pack_tickets, in encoded bytes and CPU per broadcast. Also
+round-trips every ticket through the codec.
+
+Usage: python bench_ticket_codec.py [--tickets 1000] [--players 50]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from bson import ObjectId
+
+from ticket_codec import pack_tickets, unpack_tickets, with_packed, unpack_grid, pack_grid
+from ticket_generator import generate_tickets
+
+
+def serialize_doc(doc):
+    """The recursive serializer used for socket payloads"""
+    if doc is None:
+        return None
+    if isinstance(doc, ObjectId):
+        return str(doc)
+    if isinstance(doc, dict):
+        return {key: serialize_doc(value) for key, value in doc.items()}
+    if isinstance(doc, list):
+        return [serialize_doc(item) for item in doc]
+    if isinstance(doc, datetime):
+        return doc.isoformat()
+    return doc
+
+
+def build_room(tickets: int, players: int):
+    users = [(str(uuid.uuid4()), f"Player {i}") for i in range(players)]
+    docs = []
+    for i, ticket in enumerate(generate_tickets(tickets)):
+        user_id, user_name = users[i % players]
+        docs.append(with_packed({
+            "_id": ObjectId(),
+            "id": str(uuid.uuid4()),
+            "ticket_number": ticket["ticket_number"],
+            "user_id": user_id,
+            "user_name": user_name,
+            "room_id": "bench",
+            "grid": ticket["grid"],
+            "numbers": ticket["numbers"],
+            "marked_numbers": [],
+            "strip_id": None,
+            "strip_index": None,
+            "purchased_at": datetime.utcnow(),
+        }))
+    return docs
+
+
+def packed_size(payload: dict) -> int:
+    """JSON text plus the binary attachments Socket.IO sends alongside it"""
+    attachments = {k: v for k, v in payload.items() if isinstance(v, bytes)}
+    text = json.dumps({k: (None if k in attachments else v) for k, v in payload.items()},
+                      separators=(",", ":"))
+    return len(text) + sum(len(v) for v in attachments.values())
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def main(tickets, players, rounds):
+    docs = build_room(tickets, players)
+
+    for doc in docs:
+        assert unpack_grid(doc["packed"]) == doc["grid"]
+        assert unpack_grid(pack_grid(doc["grid"])) == doc["grid"]
+    restored = unpack_tickets(pack_tickets(docs))
+    assert all(r["grid"] == d["grid"] and r["numbers"] == d["numbers"] and r["user_id"] == d["user_id"]
+               for r, d in zip(restored, docs))
+    print(f"round-trip ok for {len(docs)} tickets")
+
+    def as_json():
+        return json.dumps([serialize_doc({k: v for k, v in t.items() if k != "packed"}) for t in docs],
+                          separators=(",", ":"))
+
+    json_ms, json_text = timed(as_json, rounds)
+    packed_ms, payload = timed(lambda: pack_tickets(docs), rounds)
+    b64_ms, b64_payload = timed(lambda: json.dumps(pack_tickets(docs, binary=False), separators=(",", ":")), rounds)
+
+    json_bytes = len(json_text)
+    print(f"\n{'payload':<22} {'bytes':>10} {'ratio':>7} {'ms':>8}")
+    print(f"{'json (serialize_doc)':<22} {json_bytes:>10,} {1:>7.1f} {json_ms:>8.2f}")
+    print(f"{'packed (binary)':<22} {packed_size(payload):>10,} {json_bytes / packed_size(payload):>7.1f} {packed_ms:>8.2f}")
+    print(f"{'packed (base64 json)':<22} {len(b64_payload):>10,} {json_bytes / len(b64_payload):>7.1f} {b64_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    main(args.tickets, args.players, args.rounds)
@@ -0,0 +1,198 @@
+"""
+Ticket generator benchmark and property checks
+
+Usage: python bench_ticket_generator.py [--tickets 10000] [--check 100000]
+
+Checks every generated ticket against the Tambola rules (15 numbers, 5 per
+row, every column used, columns sorted and in range) and every strip covers
+1-90 once, then compares batch throughput with the previous per-ticket
+generator.
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from ticket_generator import (
+    COLUMNS, ROWS, STRIP_SIZE, generate_strip_grids, generate_strips, generate_ticket_grids,
+    generate_tickets, get_layouts, validate_strip, validate_ticket,
+)
+
+
+def legacy_generate_tambola_ticket(ticket_number: int):
+    """The previous shuffle-and-balance generator, kept for comparison"""
+    ticket = [[None for _ in range(9)] for _ in range(3)]
+    
+    column_ranges = [
+        (1, 9), (10, 19), (20, 29), (30, 39), (40, 49),
+        (50, 59), (60, 69), (70, 79), (80, 90)
+    ]
+    
+    column_numbers = []
+    for start, end in column_ranges:
+        available = list(range(start, end + 1))
+        random.shuffle(available)
+        column_numbers.append(available)
+    
+    column_counts = []
+    remaining = 15
+    for i in range(9):
+        if i == 8:
+            column_counts.append(remaining)
+        else:
+            max_for_this = min(3, remaining - (8 - i))
+            min_for_this = max(0, remaining - (8 - i) * 3)
+            count = random.randint(min_for_this, max_for_this)
+            column_counts.append(count)
+            remaining -= count
+    
+    rows_distribution = [[] for _ in range(3)]
+    for col_idx, count in enumerate(column_counts):
+        if count == 0:
+            continue
+        available_rows = [0, 1, 2]
+        random.shuffle(available_rows)
+        selected_rows = available_rows[:count]
+        for row_idx in selected_rows:
+            rows_distribution[row_idx].append(col_idx)
+    
+    for row_idx in range(3):
+        current_count = len(rows_distribution[row_idx])
+        if current_count < 5:
+            available_cols = [c for c in range(9) 
+                            if c not in rows_distribution[row_idx] 
+                            and column_counts[c] < 3]
+            needed = 5 - current_count
+            for _ in range(needed):
+                if available_cols:
+                    col = random.choice(available_cols)
+                    rows_distribution[row_idx].append(col)
+                    column_counts[col] += 1
+                    available_cols.remove(col)
+                    if column_counts[col] >= 3:
+                        available_cols = [c for c in available_cols if c != col]
+        elif current_count > 5:
+            extra = current_count - 5
+            random.shuffle(rows_distribution[row_idx])
+            to_remove = rows_distribution[row_idx][:extra]
+            for col in to_remove:
+                rows_distribution[row_idx].remove(col)
+                column_counts[col] -= 1
+    
+    for col_idx in range(9):
+        rows_with_numbers = [r for r in range(3) if col_idx in rows_distribution[r]]
+        rows_with_numbers.sort()
+        for idx, row_idx in enumerate(rows_with_numbers):
+            ticket[row_idx][col_idx] = column_numbers[col_idx][idx]
+    
+    numbers_list = []
+    for row in ticket:
+        for num in row:
+            if num is not None:
+                numbers_list.append(num)
+    
+    return {
+        "ticket_number": ticket_number,
+        "grid": ticket,
+        "numbers": sorted(numbers_list)
+    }
+
+
+def check_properties(count: int, seed: int = 0):
+    """Generate `count` tickets and assert every invariant holds"""
+    rng = np.random.default_rng(seed)
+    grids = generate_ticket_grids(count, rng)
+    filled = grids > 0
+
+    assert (filled.sum(axis=2) == 5).all(), "row without exactly 5 numbers"
+    assert filled.any(axis=1).all(), "empty column"
+    for c in range(COLUMNS):
+        column = grids[:, :, c]
+        low, high = (1, 9) if c == 0 else (c * 10, 90 if c == 8 else c * 10 + 9)
+        values = column[column > 0]
+        assert ((values >= low) & (values <= high)).all(), f"column {c} out of range"
+        # Filled cells strictly increase down the column
+        for r in range(1, ROWS):
+            for above in range(r):
+                both = filled[:, above, c] & filled[:, r, c]
+                assert (column[both, above] < column[both, r]).all(), f"column {c} not sorted"
+
+    tickets = generate_tickets(min(count, 10000), rng=rng)
+    assert all(validate_ticket(t["grid"]) for t in tickets)
+    assert all(len(set(t["numbers"])) == 15 for t in tickets)
+
+    # Every number should turn up about equally often within its column
+    counts = Counter(grids[filled].tolist())
+    print(f"  {count:,} tickets valid; {len(get_layouts()):,} layouts; "
+          f"number frequency min/max {min(counts.values())}/{max(counts.values())}")
+
+
+def check_strip_properties(count: int, seed: int = 0):
+    """Generate `count` strips and assert each covers 1-90 once with valid tickets"""
+    rng = np.random.default_rng(seed)
+    strips = generate_strip_grids(count, rng)
+    filled = strips > 0
+
+    assert (filled.sum(axis=3) == 5).all(), "row without exactly 5 numbers"
+    assert filled.any(axis=2).all(), "empty column"
+    assert (np.sort(strips.reshape(count, -1), axis=1)[:, -90:] == np.arange(1, 91)).all(), \
+        "strip does not cover 1-90 exactly once"
+
+    sample = generate_strips(min(count, 2000), rng=rng)
+    assert all(validate_strip([t["grid"] for t in strip]) for strip in sample)
+    print(f"  {count:,} strips valid")
+
+
+def check_legacy(count: int):
+    """How often the old generator broke each rule"""
+    broken = Counter()
+    for i in range(count):
+        grid = legacy_generate_tambola_ticket(i + 1)["grid"]
+        columns = [[grid[r][c] for r in range(ROWS) if grid[r][c] is not None] for c in range(COLUMNS)]
+        broken["row without 5 numbers"] += any(sum(v is not None for v in row) != 5 for row in grid)
+        broken["empty column"] += any(not col for col in columns)
+        broken["unsorted column"] += any(col != sorted(col) for col in columns)
+        broken["any rule"] += not validate_ticket(grid)
+    print(f"  legacy generator over {count:,} tickets: " +
+          ", ".join(f"{rule} {n / count:.1%}" for rule, n in broken.items()))
+
+
+def main(tickets: int, check: int):
+    print("Property checks")
+    check_properties(check)
+    check_strip_properties(max(check // STRIP_SIZE, 1))
+    check_legacy(min(check, 20000))
+
+    generate_strips(1)  # exclude the one-off layout tables from timings
+    print(f"\n{'generator':<22} {'tickets':>8} {'ms':>9} {'tickets/s':>12}")
+    for n in (100, 1000, tickets):
+        start = time.perf_counter()
+        for i in range(n):
+            legacy_generate_tambola_ticket(i + 1)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_ticket_grids(n)
+        arrays = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_tickets(n)
+        batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_strips(max(n // STRIP_SIZE, 1))
+        strips = time.perf_counter() - start
+
+        for name, elapsed in (("legacy loop", legacy), ("generate_ticket_grids", arrays),
+                              ("generate_tickets", batch), ("generate_strips", strips)):
+            print(f"{name:<22} {n:>8,} {elapsed * 1000:>9.1f} {n / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--check", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.tickets, args.check)
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: prize claim validation, list scans vs compiled bitmasks
+
+Usage: python bench_win_engine.py [--tickets 2000] [--rounds 5]
+"""
+import argparse
+import random
+import time
+
+from models import PrizeType
+from win_engine import CompiledTicket, compile_ticket, check_prize, numbers_mask
+from ticket_index import ticket_grid, numbers_on_ticket
+
+PRIZES = [
+    PrizeType.EARLY_FIVE, PrizeType.TOP_LINE, PrizeType.MIDDLE_LINE,
+    PrizeType.BOTTOM_LINE, PrizeType.FOUR_CORNERS, PrizeType.FULL_HOUSE,
+]
+
+
+def legacy_validate_win(ticket, called_numbers, prize_type):
+    """The previous list-scan validate_win, kept for comparison"""
+    grid = ticket["grid"]
+    numbers = ticket["numbers"]
+    if prize_type == PrizeType.EARLY_FIVE:
+        return len([n for n in called_numbers if n in numbers]) >= 5
+    if prize_type == PrizeType.TOP_LINE:
+        return all(n in called_numbers for n in grid[0] if n is not None)
+    if prize_type == PrizeType.MIDDLE_LINE:
+        return all(n in called_numbers for n in grid[1] if n is not None)
+    if prize_type == PrizeType.BOTTOM_LINE:
+        return all(n in called_numbers for n in grid[2] if n is not None)
+    if prize_type == PrizeType.FOUR_CORNERS:
+        top = [n for n in grid[0] if n is not None]
+        bottom = [n for n in grid[2] if n is not None]
+        corners = [top[0], top[-1], bottom[0], bottom[-1]]
+        return all(n in called_numbers for n in corners)
+    if prize_type == PrizeType.FULL_HOUSE:
+        return all(n in called_numbers for n in numbers)
+    return False
+
+
+def make_ticket(i):
+    from ticket_generator import generate_tambola_ticket
+    data = generate_tambola_ticket(i)
+    return {"id": str(i), "grid": data["grid"], "numbers": data["numbers"]}
+
+
+def rate(fn, claims):
+    start = time.perf_counter()
+    for args in claims:
+        fn(*args)
+    return len(claims) / (time.perf_counter() - start)
+
+
+def main(tickets, rounds):
+    docs = [make_ticket(i) for i in range(tickets)]
+    print(f"{'called':>7} {'legacy claims/s':>16} {'compile+check/s':>16} {'cached check/s':>16}")
+    for called_count in (15, 45, 75):
+        called = random.sample(range(1, 91), called_count)
+        mask = numbers_mask(called)
+        claims = [(t, p) for t in docs for p in PRIZES] * rounds
+
+        # Sanity: both engines agree
+        assert all(legacy_validate_win(t, called, p) == check_prize(compile_ticket(t), mask, p)
+                   for t, p in claims)
+
+        legacy = rate(lambda t, p: legacy_validate_win(t, called, p), claims)
+        # Worst case: a ticket compiled from scratch for every claim
+        uncached = rate(
+            lambda t, p: check_prize(CompiledTicket(t["id"], ticket_grid(t), numbers_on_ticket(t)), mask, p),
+            claims
+        )
+        # What the handlers do: compiled form cached by ticket id
+        cached = rate(lambda t, p: check_prize(compile_ticket(t), mask, p), claims)
+        print(f"{called_count:>7} {legacy:>16,.0f} {uncached:>16,.0f} {cached:>16,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    main(args.tickets, args.rounds)
@@ -0,0 +1,77 @@
+"""
+Prize claims - the one validation path for REST and socket claims
+
+Checks run against the room's live state (status, configured prizes,
+called-number mask) and the stored ticket; the winning pattern itself is
+checked by the shared bitset engine. A valid claim is reserved in memory
+before the first write, so concurrent claims for the same prize lose, and
+released again if the winner can't be recorded. Winners are stored
+unpaid and credited when the room completes (settlement.py).
+"""
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from models import PrizeType, RoomStatus, Winner
+from room_state import RoomState
+from win_engine import check_prize, compile_ticket
+
+logger = logging.getLogger(__name__)
+
+
+async def claim_prize(db, state: RoomState, user: dict, ticket_id: str, prize_type) -> Winner:
+    """Validate and record a claim; raises HTTPException when it is refused"""
+    try:
+        prize_type = PrizeType(getattr(prize_type, "value", prize_type))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prize type")
+
+    if state.status != RoomStatus.ACTIVE.value:
+        raise HTTPException(status_code=400, detail="Game not active")
+
+    ticket = await db.tickets.find_one({"id": ticket_id}, {"_id": 0, "packed": 0})
+    if not ticket or ticket.get("room_id") != state.room_id:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    if ticket["user_id"] != user["id"]:
+        raise HTTPException(status_code=403, detail="Not your ticket")
+
+    prize_config = next((p for p in state.prizes if p["prize_type"] == prize_type), None)
+    if not prize_config:
+        raise HTTPException(status_code=400, detail="Prize not configured")
+
+    if prize_type.value in state.claimed_prizes and not prize_config.get("multiple_winners", False):
+        raise HTTPException(status_code=400, detail="Prize already claimed")
+
+    if not check_prize(compile_ticket(ticket), state.called_mask, prize_type):
+        raise HTTPException(status_code=400, detail="Invalid claim - winning condition not met")
+
+    # Reserve the prize before any await so concurrent claims lose
+    reserved = prize_type.value not in state.claimed_prizes
+    state.claimed_prizes.add(prize_type.value)
+
+    winner = Winner(
+        user_id=user["id"],
+        user_name=user.get("name", ""),
+        room_id=state.room_id,
+        ticket_id=ticket_id,
+        ticket_number=ticket["ticket_number"],
+        prize_type=prize_type,
+        amount=prize_config["amount"],
+        verified=True,
+        verified_at=datetime.utcnow(),
+        paid=False
+    )
+    try:
+        await db.winners.insert_one(winner.dict())
+    except Exception:
+        # Not recorded: release the reservation (unless an earlier winner holds it)
+        if reserved:
+            state.claimed_prizes.discard(prize_type.value)
+        raise
+
+    await db.rooms.update_one({"id": state.room_id}, {"$push": {"winners": winner.dict()}})
+
+    logger.info(f"User {user['id']} won {prize_type.value} in room {state.room_id}")
+    return winner
@@ -0,0 +1,434 @@
+"""
+Multi-worker support - Socket.IO message queue and shared presence
+
+    SOCKETIO_MESSAGE_QUEUE=redis://host:6379/0   # fan emits out to every worker
+    PRESENCE_BACKEND=redis                       # memory (default) | redis
+
+Without a message queue each worker only reaches its own sockets, which is
+fine for a single worker. MemoryPubSubManager fans emits out between
+several servers in one process (tests and benchmarks).
+
+Live game state (RoomState, ticket index, auto-caller) stays in the memory
+of one worker per room: RoomRouter sends every operation on it to that
+room's owner. The lobby cache is per worker but only trusted for
+LOBBY_CACHE_TTL seconds, and ticket-number blocks come from a shared Mongo
+counter, so neither needs an owner.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "memory").lower()
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", SOCKETIO_MESSAGE_QUEUE or "redis://localhost:6379/0")
+
+
+# ============= MESSAGE QUEUE =============
+class MemoryPubSubManager(AsyncPubSubManager):
+    """In-process stand-in for AsyncRedisManager: servers sharing a channel see each other's emits"""
+    name = "memory"
+    _subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    async def _publish(self, data):
+        for queue in self._subscribers.get(self.channel, []):
+            queue.put_nowait(data)
+
+    async def _listen(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(self.channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[self.channel].remove(queue)
+
+
+def make_client_manager(url: Optional[str] = None) -> Optional[socketio.AsyncManager]:
+    """Client manager for the AsyncServer; None keeps the default in-process one"""
+    url = SOCKETIO_MESSAGE_QUEUE if url is None else url
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryPubSubManager(channel=url[len("memory://"):] or "socketio", json=serialization)
+    logger.info(f"Socket.IO cluster mode via {url.split('@')[-1]}")
+    # Emits are relayed as JSON, so the queue needs the same encoder as the server
+    return socketio.AsyncRedisManager(url, json=serialization)
+
+
+# ============= ROOM OWNERSHIP =============
+ROOM_OWNER_TTL = 15  # seconds; a dead owner's rooms are taken over after this
+ROOM_OP_TIMEOUT = float(os.getenv("ROOM_OP_TIMEOUT", "10"))
+
+# Claim a room unless someone else holds it; returns the owner
+_CLAIM_SCRIPT = """
+local owner = redis.call('get', KEYS[1])
+if owner then return owner end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return ARGV[1]
+"""
+# Extend (ARGV[2] > 0) or delete a claim, only while it is still ours
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then return 0 end
+if tonumber(ARGV[2]) > 0 then return redis.call('expire', KEYS[1], ARGV[2]) end
+return redis.call('del', KEYS[1])
+"""
+
+
+class RoomOwnerUnavailable(Exception):
+    """The worker owning a room did not answer a forwarded operation"""
+
+
+class MemoryRoomBus:
+    """In-process stand-in for RedisRoomBus: routers sharing a namespace see each other"""
+    _namespaces: Dict[str, dict] = {}
+
+    def __init__(self, namespace: str = "rooms"):
+        shared = self._namespaces.setdefault(namespace, {"owners": {}, "channels": {}})
+        self._owners: Dict[str, str] = shared["owners"]
+        self._channels: Dict[str, List[asyncio.Queue]] = shared["channels"]
+
+    async def claim(self, key: str, worker_id: str, ttl: int) -> str:
+        return self._owners.setdefault(key, worker_id)
+
+    async def renew(self, key: str, worker_id: str, ttl: int) -> bool:
+        if self._owners.get(key) != worker_id:
+            return False
+        if ttl <= 0:
+            del self._owners[key]
+        return True
+
+    async def publish(self, channel: str, message: str):
+        for queue in self._channels.get(channel, []):
+            queue.put_nowait(message)
+
+    async def listen(self, channel: str):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._channels.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._channels[channel].remove(queue)
+
+
+class RedisRoomBus:
+    """Room ownership keys and the worker-to-worker operation channels in Redis"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(url, decode_responses=True)
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._renew = self.redis.register_script(_RENEW_SCRIPT)
+
+    async def claim(self, key: str, worker_id: str, ttl: int) -> str:
+        return await self._claim(keys=[key], args=[worker_id, ttl])
+
+    async def renew(self, key: str, worker_id: str, ttl: int) -> bool:
+        return bool(await self._renew(keys=[key], args=[worker_id, ttl]))
+
+    async def publish(self, channel: str, message: str):
+        await self.redis.publish(channel, message)
+
+    async def listen(self, channel: str):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+
+
+class RoomRouter:
+    """
+    Runs every live-state operation of a room on one worker, its owner.
+
+    Handlers that read or change RoomState, the ticket index or the
+    auto-caller are registered by name, and callers go through run(): the
+    owner runs the operation itself, any other worker forwards it over the
+    bus and waits for the result (HTTPExceptions travel back as they are).
+    The owner answers socket clients held by other workers through the
+    Socket.IO message queue, so handlers take the caller's user id instead
+    of reading it from the sid.
+
+    A room belongs to the first worker that needs it and stays with it
+    while that worker holds its state, renewing a Redis key
+    (room-owner:<room_id>). When an owner dies the key runs out and the
+    next worker to get an operation for the room takes it over, reloading
+    the state from Mongo. Without a bus (one worker) everything runs locally.
+    """
+
+    def __init__(self, bus=None, ttl: int = ROOM_OWNER_TTL, timeout: float = ROOM_OP_TIMEOUT):
+        self.bus = bus
+        self.ttl = ttl
+        self.timeout = timeout
+        self.worker_id = str(uuid.uuid4())
+        self.is_live: Callable[[str], bool] = lambda room_id: True
+        self._ops: Dict[str, Callable[..., Awaitable]] = {}
+        self._on_acquire: List[Callable[[str], None]] = []
+        self._on_release: List[Callable[[str], None]] = []
+        self._owned: Dict[str, float] = {}  # room_id -> when this worker took it
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def clustered(self) -> bool:
+        return self.bus is not None
+
+    def register(self, name: str, op: Callable[..., Awaitable]):
+        """Make `op` runnable by name; its kwargs and result must be JSON-serializable"""
+        self._ops[name] = op
+
+    def on_acquire(self, callback: Callable[[str], None]):
+        """Called with a room id when this worker takes it over"""
+        self._on_acquire.append(callback)
+
+    def on_release(self, callback: Callable[[str], None]):
+        """Called with a room id when this worker stops owning it"""
+        self._on_release.append(callback)
+
+    @staticmethod
+    def _key(room_id: str) -> str:
+        return f"room-owner:{room_id}"
+
+    @staticmethod
+    def _channel(worker_id: str) -> str:
+        return f"room-ops:{worker_id}"
+
+    async def owner(self, room_id: str) -> str:
+        """The owning worker's id, claiming the room if nobody holds it"""
+        if room_id in self._owned:
+            return self.worker_id
+        owner = await self.bus.claim(self._key(room_id), self.worker_id, self.ttl)
+        if owner == self.worker_id:
+            self._owned[room_id] = time.monotonic()
+            # Whatever this worker held for the room before may be stale
+            for callback in self._on_acquire:
+                callback(room_id)
+            logger.info(f"Worker {self.worker_id} now owns room {room_id}")
+        return owner
+
+    async def run(self, room_id: Optional[str], op: str, /, **kwargs):
+        """Run a registered operation on the room's owner and return its result"""
+        if self.bus is None or not room_id:
+            return await self._ops[op](**kwargs)
+        owner = await self.owner(room_id)
+        if owner == self.worker_id:
+            return await self._ops[op](**kwargs)
+        return await self._forward(owner, room_id, op, kwargs)
+
+    async def _forward(self, owner: str, room_id: str, op: str, kwargs: dict):
+        request_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        try:
+            await self.bus.publish(self._channel(owner), serialization.dumps({
+                "id": request_id, "reply_to": self.worker_id,
+                "room_id": room_id, "op": op, "kwargs": kwargs
+            }))
+            reply = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise RoomOwnerUnavailable(f"Room {room_id} is not responding, try again")
+        finally:
+            self._waiting.pop(request_id, None)
+
+        if "error" in reply:
+            if reply.get("status"):
+                from fastapi import HTTPException
+                raise HTTPException(status_code=reply["status"], detail=reply["error"])
+            raise RuntimeError(reply["error"])
+        return reply.get("result")
+
+    async def _serve(self, request: dict):
+        from fastapi import HTTPException
+        reply = {"id": request["id"]}
+        try:
+            if await self.owner(request["room_id"]) != self.worker_id:
+                raise HTTPException(status_code=503, detail="Room moved to another worker, try again")
+            reply["result"] = await self._ops[request["op"]](**request["kwargs"])
+        except HTTPException as e:
+            reply.update(error=e.detail, status=e.status_code)
+        except Exception as e:
+            logger.error(f"Room operation {request['op']} failed: {e}")
+            reply["error"] = str(e)
+        await self.bus.publish(self._channel(request["reply_to"]), serialization.dumps(reply))
+
+    async def _listen(self):
+        async for message in self.bus.listen(self._channel(self.worker_id)):
+            try:
+                message = serialization.loads(message)
+                if "op" in message:
+                    asyncio.create_task(self._serve(message))
+                else:
+                    future = self._waiting.get(message["id"])
+                    if future is not None and not future.done():
+                        future.set_result(message)
+            except Exception as e:
+                logger.error(f"Bad room operation message: {e}")
+
+    def _release_local(self, room_id: str):
+        self._owned.pop(room_id, None)
+        for callback in self._on_release:
+            callback(room_id)
+
+    async def _renew_owned(self):
+        """Keep the rooms this worker still holds; give up those it has let go of"""
+        now = time.monotonic()
+        for room_id, taken_at in list(self._owned.items()):
+            # A freshly taken room may not be loaded yet
+            keep = self.is_live(room_id) or now - taken_at < self.ttl
+            try:
+                still_ours = await self.bus.renew(self._key(room_id), self.worker_id, self.ttl if keep else 0)
+            except Exception as e:
+                logger.error(f"Renewing room {room_id} failed: {e}")
+                continue
+            if not still_ours:
+                logger.warning(f"Room {room_id} was taken over by another worker")
+            if not (keep and still_ours):
+                self._release_local(room_id)
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self._renew_owned()
+
+    def start(self):
+        if self.bus is not None and not self._tasks:
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._renew_loop())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        # Hand the rooms over now rather than after the TTL
+        for room_id in list(self._owned):
+            try:
+                await self.bus.renew(self._key(room_id), self.worker_id, 0)
+            except Exception as e:
+                logger.error(f"Releasing room {room_id} failed: {e}")
+            self._release_local(room_id)
+
+
+def make_room_router(url: Optional[str] = None) -> RoomRouter:
+    """Router over Redis when emits go through Redis, else one that runs everything locally"""
+    url = SOCKETIO_MESSAGE_QUEUE if url is None else url
+    if not url:
+        return RoomRouter()
+    if url.startswith("memory://"):
+        return RoomRouter(MemoryRoomBus(url[len("memory://"):] or "rooms"))
+    return RoomRouter(RedisRoomBus(url))
+
+
+# ============= PRESENCE =============
+class MemoryPresence:
+    """
+    Connection and room presence for a single worker.
+
+    sid -> user_id is only ever needed by the worker holding the socket
+    (clients stick to one worker), so every backend answers it from
+    memory. user -> room and online users are what must be shared.
+    """
+
+    def __init__(self):
+        self._sids: Dict[str, str] = {}  # sid -> user_id
+        self._rooms: Dict[str, str] = {}  # user_id -> room_id
+        self._online: Dict[str, int] = {}  # user_id -> open connections
+
+    def user_for(self, sid: str) -> Optional[str]:
+        return self._sids.get(sid)
+
+    async def bind(self, sid: str, user_id: str):
+        self._sids[sid] = user_id
+        self._online[user_id] = self._online.get(user_id, 0) + 1
+
+    async def unbind(self, sid: str) -> Optional[str]:
+        user_id = self._sids.pop(sid, None)
+        if user_id is not None:
+            left = self._online.get(user_id, 1) - 1
+            if left > 0:
+                self._online[user_id] = left
+            else:
+                self._online.pop(user_id, None)
+        return user_id
+
+    async def set_room(self, user_id: str, room_id: str):
+        self._rooms[user_id] = room_id
+
+    async def get_room(self, user_id: str) -> Optional[str]:
+        return self._rooms.get(user_id)
+
+    async def pop_room(self, user_id: str) -> Optional[str]:
+        return self._rooms.pop(user_id, None)
+
+    async def online_count(self) -> int:
+        return len(self._online)
+
+
+class RedisPresence(MemoryPresence):
+    """Presence shared by every worker through Redis hashes"""
+
+    ROOMS_KEY = "presence:rooms"    # user_id -> room_id
+    ONLINE_KEY = "presence:online"  # user_id -> open connections (all workers)
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(url, decode_responses=True)
+
+    async def bind(self, sid: str, user_id: str):
+        await super().bind(sid, user_id)
+        await self.redis.hincrby(self.ONLINE_KEY, user_id, 1)
+
+    async def unbind(self, sid: str) -> Optional[str]:
+        user_id = await super().unbind(sid)
+        if user_id is not None:
+            if await self.redis.hincrby(self.ONLINE_KEY, user_id, -1) <= 0:
+                await self.redis.hdel(self.ONLINE_KEY, user_id)
+        return user_id
+
+    async def set_room(self, user_id: str, room_id: str):
+        await self.redis.hset(self.ROOMS_KEY, user_id, room_id)
+
+    async def get_room(self, user_id: str) -> Optional[str]:
+        return await self.redis.hget(self.ROOMS_KEY, user_id)
+
+    async def pop_room(self, user_id: str) -> Optional[str]:
+        pipe = self.redis.pipeline()
+        pipe.hget(self.ROOMS_KEY, user_id)
+        pipe.hdel(self.ROOMS_KEY, user_id)
+        room_id, _ = await pipe.execute()
+        return room_id
+
+    async def online_count(self) -> int:
+        return await self.redis.hlen(self.ONLINE_KEY)
+
+
+def make_presence(backend: Optional[str] = None) -> MemoryPresence:
+    backend = PRESENCE_BACKEND if backend is None else backend
+    if backend == "redis":
+        return RedisPresence(PRESENCE_REDIS_URL)
+    return MemoryPresence()
+
+
+# Shared process-wide presence store
+presence = make_presence()
+
+# Process-wide room router; the server registers the room operations
+room_router = make_room_router()
@@ -0,0 +1,213 @@
+"""
+MongoDB index management - idempotent bootstrap plus a small diagnostics CLI
+
+    python indexes.py ensure    # create any missing indexes
+    python indexes.py report    # missing / unused indexes per collection
+    python indexes.py explain   # query plans for the hot queries
+"""
+import argparse
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+# Indexes every hot query relies on. Unique where the code assumes it.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("mobile", ASCENDING)], name="mobile_unique", unique=True),
+    ],
+    "rooms": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Lobby listing: status filter sorted by newest first
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+    ],
+    "tickets": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Also serves room_id-only queries (prefix)
+        IndexModel([("room_id", ASCENDING), ("user_id", ASCENDING)], name="room_id_user_id"),
+        # All-tickets pages and the ticket-number counter seed
+        IndexModel([("room_id", ASCENDING), ("ticket_number", ASCENDING)], name="room_id_ticket_number"),
+    ],
+    "winners": [
+        IndexModel([("room_id", ASCENDING), ("prize_type", ASCENDING)], name="room_id_prize_type"),
+        # Startup scan for rooms left unsettled; paid winners are left out
+        IndexModel([("paid", ASCENDING), ("room_id", ASCENDING)], name="unpaid",
+                   partialFilterExpression={"paid": False}),
+    ],
+    "wallets": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "transactions": [
+        # History pages: keyset on (created_at, id) within a user
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="user_id_created_at_id"),
+        # Wallet idempotency keys; unkeyed entries are left out
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True,
+                   partialFilterExpression={"key": {"$type": "string"}}),
+    ],
+}
+
+# Collections used by the legacy single-player server (server.py)
+LEGACY_INDEXES: Dict[str, List[IndexModel]] = {
+    "players": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "games": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+    ],
+    "tickets": [
+        IndexModel([("player_id", ASCENDING)], name="player_id", sparse=True),
+    ],
+}
+
+
+async def ensure_indexes(db, indexes: Optional[Dict[str, List[IndexModel]]] = None) -> Dict[str, List[str]]:
+    """
+    Create any missing indexes. Safe to run on every startup: existing
+    indexes with the same spec are left alone. A failing index (e.g.
+    duplicates blocking a unique one) is logged, not raised.
+    """
+    indexes = INDEXES if indexes is None else indexes
+    created: Dict[str, List[str]] = {}
+
+    for collection, models in indexes.items():
+        for model in models:
+            try:
+                names = await db[collection].create_indexes([model])
+                created.setdefault(collection, []).extend(names)
+            except OperationFailure as e:
+                logger.error(f"Could not create index {model.document['name']} on {collection}: {e}")
+
+    logger.info(f"Indexes ensured on {len(created)} collections")
+    return created
+
+
+# ============= DIAGNOSTICS =============
+# (collection, description, filter built from a sample document, sort)
+HOT_QUERIES: List[Tuple[str, str, Callable[[dict], dict], Optional[list]]] = [
+    ("rooms", "room by id", lambda d: {"id": d["id"]}, None),
+    ("rooms", "lobby listing",
+     lambda d: {"status": {"$in": ["waiting", "active"]}}, [("created_at", -1)]),
+    ("tickets", "ticket by id", lambda d: {"id": d["id"]}, None),
+    ("tickets", "room tickets", lambda d: {"room_id": d["room_id"]}, None),
+    ("tickets", "room tickets by number",
+     lambda d: {"room_id": d["room_id"]}, [("ticket_number", 1)]),
+    ("tickets", "user tickets in room",
+     lambda d: {"room_id": d["room_id"], "user_id": d["user_id"]}, None),
+    ("winners", "prize winner",
+     lambda d: {"room_id": d["room_id"], "prize_type": d["prize_type"]}, None),
+    ("winners", "unpaid winners", lambda d: {"paid": False}, None),
+    ("users", "user by id", lambda d: {"id": d["id"]}, None),
+    ("users", "user by email", lambda d: {"email": d["email"]}, None),
+    ("users", "user by mobile", lambda d: {"mobile": d["mobile"]}, None),
+    ("wallets", "wallet by user", lambda d: {"user_id": d["user_id"]}, None),
+    ("transactions", "transaction history",
+     lambda d: {"user_id": d["user_id"]}, [("created_at", -1), ("id", -1)]),
+    ("transactions", "transaction history page",
+     lambda d: {"user_id": d["user_id"], "$or": [
+         {"created_at": {"$lt": d["created_at"]}},
+         {"created_at": d["created_at"], "id": {"$lt": d["id"]}},
+     ]}, [("created_at", -1), ("id", -1)]),
+    ("transactions", "ledger entry by key", lambda d: {"key": d.get("key") or ""}, None),
+]
+
+
+def _key_of(model: IndexModel) -> list:
+    return list(model.document["key"].items())
+
+
+async def report(db):
+    """Print missing and unused indexes for every managed collection"""
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        existing_keys = [list(info["key"]) for info in existing.values()]
+        missing = [m.document["name"] for m in models if _key_of(m) not in existing_keys]
+
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure:
+            stats = []
+        unused = [s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0]
+
+        print(f"{collection}:")
+        print(f"  existing: {', '.join(sorted(existing)) or '-'}")
+        print(f"  missing:  {', '.join(missing) or '-'}")
+        print(f"  unused since restart: {', '.join(unused) or '-'}")
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "?")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain(db):
+    """Explain each hot query against a sample document; flag collection scans"""
+    for collection, description, build_filter, sort in HOT_QUERIES:
+        sample = await db[collection].find_one({})
+        if not sample:
+            print(f"{collection:<13} {description:<22} (empty collection)")
+            continue
+        try:
+            query_filter = build_filter(sample)
+        except KeyError:
+            print(f"{collection:<13} {description:<22} (sample lacks fields)")
+            continue
+
+        command = {"find": collection, "filter": query_filter}
+        if sort:
+            command["sort"] = dict(sort)
+        result = await db.command("explain", command, verbosity="executionStats")
+
+        stages = _plan_stages(result["queryPlanner"]["winningPlan"])
+        stats = result["executionStats"]
+        flag = "  <-- COLLSCAN" if "COLLSCAN" in stages else ""
+        print(
+            f"{collection:<13} {description:<22} {'>'.join(stages):<28} "
+            f"docs={stats['totalDocsExamined']:<7} keys={stats['totalKeysExamined']:<7} "
+            f"{stats['executionTimeMillis']}ms{flag}"
+        )
+
+    # Anything the profiler caught (enable with db.setProfilingLevel(1, {slowms: N}))
+    slow = await db["system.profile"].find(
+        {"planSummary": "COLLSCAN"}
+    ).sort("millis", -1).limit(10).to_list(10)
+    if slow:
+        print("\nSlowest profiled collection scans:")
+        for op in slow:
+            print(f"  {op.get('ns')} {op.get('op')} {op.get('millis')}ms {op.get('command', {}).get('filter')}")
+
+
+async def main(command: str):
+    from database import client, db
+
+    try:
+        if command == "ensure":
+            created = await ensure_indexes(db)
+            for collection, names in created.items():
+                print(f"{collection}: {', '.join(names)}")
+        elif command == "report":
+            await report(db)
+        elif command == "explain":
+            await explain(db)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage and inspect MongoDB indexes")
+    parser.add_argument("command", choices=["ensure", "report", "explain"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
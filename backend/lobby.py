@@ -0,0 +1,289 @@
+"""
+Cached lobby room listing and the lobby subscription feed
+
+GET /api/rooms is polled by every client sitting in the lobby. The
+listing is kept in memory as room summaries (no players, called numbers
+or winners), encoded once per change and served with an ETag. The
+handlers that change a listed room patch it in place; LOBBY_CACHE_TTL
+bounds how stale it can get when a change lands on another worker.
+
+The same hooks feed LobbyFeed, which pushes coalesced summary diffs to
+sockets subscribed to a lobby channel (room type x price band) at most
+every LOBBY_FEED_MS, instead of broadcasting rooms to every socket.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from serialization import dumpb
+
+logger = logging.getLogger(__name__)
+
+LOBBY_CACHE_TTL = float(os.getenv("LOBBY_CACHE_TTL", "5"))  # seconds, 0 = no cache
+LOBBY_FEED_MS = int(os.getenv("LOBBY_FEED_MS", "500"))
+LOBBY_LIMIT = 50
+
+ROOM_TYPES = ("public", "private")
+# (name, lowest ticket price) - each band runs up to the next one
+PRICE_BANDS = (("low", 0), ("mid", 50), ("high", 200))
+
+LISTED_STATUSES = ("waiting", "active")
+
+# Summary fields shown in room lists
+LOBBY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "room_code": 1,
+    "name": 1,
+    "host_id": 1,
+    "host_name": 1,
+    "room_type": 1,
+    "ticket_price": 1,
+    "max_players": 1,
+    "min_players": 1,
+    "current_players": 1,
+    "auto_start": 1,
+    "prizes": 1,
+    "status": 1,
+    "tickets_sold": 1,
+    "prize_pool": 1,
+    "created_at": 1,
+    "started_at": 1,
+}
+
+
+def room_summary(room: dict) -> dict:
+    """Lobby view of a full room document"""
+    return {key: room.get(key) for key in LOBBY_PROJECTION if key != "_id"}
+
+
+def price_band(ticket_price: float) -> str:
+    band = PRICE_BANDS[0][0]
+    for name, lowest in PRICE_BANDS:
+        if (ticket_price or 0) >= lowest:
+            band = name
+    return band
+
+
+def lobby_channel(room_type, ticket_price: float) -> str:
+    """Socket.IO room carrying lobby diffs for one room type and price band"""
+    return f"lobby:{getattr(room_type, 'value', room_type)}:{price_band(ticket_price)}"
+
+
+def lobby_channels(room_types: Optional[List[str]] = None, bands: Optional[List[str]] = None) -> List[str]:
+    """Channels matching a subscription filter (None = everything)"""
+    types = [t for t in ROOM_TYPES if not room_types or t in room_types]
+    names = [name for name, _ in PRICE_BANDS if not bands or name in bands]
+    return [f"lobby:{t}:{band}" for t in types for band in names]
+
+
+class LobbyFeed:
+    """
+    Pending lobby changes per room, merged until the next flush: several
+    player-count bumps become one update, and a room created and closed
+    within one interval is never sent at all.
+    """
+
+    def __init__(self, interval: float = LOBBY_FEED_MS / 1000):
+        self.interval = interval
+        self._pending: Dict[str, dict] = {}  # room_id -> {"op", "fields"}
+        self._channels: Dict[str, str] = {}  # room_id -> lobby channel
+        self._task: Optional[asyncio.Task] = None
+
+    def push(self, room_id: str, op: str, fields: Iterable[str] = (), channel: Optional[str] = None):
+        if channel is not None:
+            self._channels[room_id] = channel
+        change = self._pending.get(room_id)
+        if op == "closed":
+            if change and change["op"] == "created":
+                del self._pending[room_id]
+            else:
+                self._pending[room_id] = {"op": "closed", "fields": set()}
+        elif change is None:
+            self._pending[room_id] = {"op": op, "fields": set(fields)}
+        elif change["op"] != "closed":
+            change["fields"].update(fields)
+
+    async def flush(self, sio, db, cache: "LobbyCache"):
+        """Emit one lobby_update per channel with every change since the last flush"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        # Current values come from the cached listings, the rest from Mongo
+        summaries = {room_id: cache.find(room_id) for room_id in pending}
+        missing = [room_id for room_id, summary in summaries.items()
+                   if summary is None and (pending[room_id]["op"] != "closed" or room_id not in self._channels)]
+        if missing:
+            async for room in db.rooms.find({"id": {"$in": missing}}, LOBBY_PROJECTION):
+                summaries[room["id"]] = room
+
+        by_channel: Dict[str, List[dict]] = {}
+        for room_id, change in pending.items():
+            summary = summaries.get(room_id)
+            if summary is not None:
+                self._channels[room_id] = lobby_channel(summary["room_type"], summary["ticket_price"])
+            channel = self._channels.get(room_id)
+            if channel is None:
+                continue
+
+            if change["op"] == "closed":
+                self._channels.pop(room_id, None)
+                diff = {"op": "closed", "id": room_id}
+            elif change["op"] == "created":
+                diff = {"op": "created", "room": summary}
+            else:
+                diff = {"op": "updated", "id": room_id, **{f: summary.get(f) for f in change["fields"]}}
+            by_channel.setdefault(channel, []).append(diff)
+
+        for channel, changes in by_channel.items():
+            await sio.emit('lobby_update', {'changes': changes}, room=channel)
+
+    async def _flush_loop(self, sio, db, cache: "LobbyCache"):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(sio, db, cache)
+            except Exception as e:
+                logger.error(f"Lobby feed flush failed: {e}")
+
+    def start(self, sio, db, cache: "LobbyCache"):
+        """Start the background flusher"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(sio, db, cache))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class _Listing:
+    """One cached query (all rooms or one room type), newest first"""
+    __slots__ = ("rooms", "loaded_at", "version", "encoded")
+
+    def __init__(self, rooms: List[dict]):
+        self.rooms = rooms
+        self.loaded_at = time.monotonic()
+        self.version = 0
+        self.encoded: Optional[Tuple[str, bytes]] = None
+
+    def changed(self):
+        self.version += 1
+        self.encoded = None
+
+
+class LobbyCache:
+    """
+    Listings keyed by room type (None = all). A room can sit in two of
+    them (all + its type), so every patch goes to each listing holding it.
+    """
+
+    def __init__(self, ttl: float = LOBBY_CACHE_TTL, feed: Optional[LobbyFeed] = None):
+        self.ttl = ttl
+        self.feed = feed
+        # New ETags after a restart, so a client never matches an old one
+        self.epoch = uuid.uuid4().hex[:8]
+        self._listings: Dict[Optional[str], _Listing] = {}
+        self._generation: Dict[Optional[str], int] = {}
+        self._lock = asyncio.Lock()
+
+    async def listing(self, db, room_type: Optional[str] = None) -> Tuple[str, bytes]:
+        """(etag, encoded JSON) for the lobby, loading it from Mongo when stale"""
+        listing = self._fresh(room_type)
+        if listing is None:
+            async with self._lock:
+                listing = self._fresh(room_type)
+                if listing is None:
+                    listing = await self._load(db, room_type)
+
+        if listing.encoded is None:
+            generation = self._generation.get(room_type, 0)
+            etag = f'W/"{self.epoch}-{generation}-{listing.version}"'
+            listing.encoded = (etag, dumpb(listing.rooms))
+        return listing.encoded
+
+    def _fresh(self, room_type: Optional[str]) -> Optional[_Listing]:
+        listing = self._listings.get(room_type)
+        if listing is None or time.monotonic() - listing.loaded_at >= self.ttl:
+            return None
+        return listing
+
+    async def _load(self, db, room_type: Optional[str]) -> _Listing:
+        query = {"status": {"$in": list(LISTED_STATUSES)}}
+        if room_type:
+            query["room_type"] = room_type
+        rooms = await db.rooms.find(query, LOBBY_PROJECTION).sort("created_at", -1).limit(LOBBY_LIMIT).to_list(LOBBY_LIMIT)
+
+        listing = _Listing(rooms)
+        self._listings[room_type] = listing
+        self._generation[room_type] = self._generation.get(room_type, 0) + 1
+        return listing
+
+    def find(self, room_id: str) -> Optional[dict]:
+        """Cached summary of a listed room"""
+        for listing in self._listings.values():
+            for room in listing.rooms:
+                if room["id"] == room_id:
+                    return room
+        return None
+
+    def _holding(self, room_type: Optional[str]):
+        for key in (None, room_type):
+            listing = self._listings.get(key)
+            if listing is not None:
+                yield key, listing
+
+    # ============= CHANGE HOOKS =============
+    def room_created(self, room: dict):
+        summary = room_summary(room)
+        room_type = getattr(summary["room_type"], "value", summary["room_type"])
+        for _, listing in self._holding(room_type):
+            listing.rooms.insert(0, dict(summary))
+            del listing.rooms[LOBBY_LIMIT:]
+            listing.changed()
+        if self.feed is not None:
+            self.feed.push(summary["id"], "created", channel=lobby_channel(room_type, summary["ticket_price"]))
+
+    def update(self, room_id: str, set: Optional[dict] = None, inc: Optional[dict] = None):
+        """Apply a $set / $inc style change to a listed room"""
+        for listing in self._listings.values():
+            for room in listing.rooms:
+                if room["id"] == room_id:
+                    room.update(set or {})
+                    for key, delta in (inc or {}).items():
+                        room[key] = (room.get(key) or 0) + delta
+                    listing.changed()
+                    break
+        if self.feed is not None:
+            self.feed.push(room_id, "updated", [*(set or {}), *(inc or {})])
+
+    def room_closed(self, room_id: str):
+        """A room left the listed statuses (completed)"""
+        for key, listing in list(self._listings.items()):
+            before = len(listing.rooms)
+            listing.rooms = [room for room in listing.rooms if room["id"] != room_id]
+            if len(listing.rooms) == before:
+                continue
+            if before >= LOBBY_LIMIT:
+                # An older room may now make the cut; reload on next read
+                del self._listings[key]
+            else:
+                listing.changed()
+        if self.feed is not None:
+            self.feed.push(room_id, "closed")
+
+    def clear(self):
+        self._listings.clear()
+
+
+# Shared process-wide lobby feed and cache
+lobby_feed = LobbyFeed()
+lobby_cache = LobbyCache(feed=lobby_feed)
@@ -0,0 +1,114 @@
+"""
+Migration Script: upgrade tickets to the current schema version
+Older tickets nest the generator output under `grid` and may lack
+`numbers`, `user_name` and `packed` (see ticket_schema.py). This rewrites
+them as version 2 documents so readers take the fast path.
+
+Tickets are streamed in _id order and written back with one user lookup
+and one bulk write per batch. The last _id written is checkpointed in the
+`migrations` collection, so an interrupted run picks up where it stopped
+(--restart starts over). Only the schema fields are $set, so it is safe
+to run while games are marking numbers, and safe to run more than once.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+import os
+
+from ticket_codec import pack_grid
+from ticket_schema import TICKET_SCHEMA_VERSION, upgrade_ticket
+
+# Load environment
+load_dotenv()
+
+mongo_url = os.environ['MONGO_URL']
+db_name = os.environ['DB_NAME']
+
+BATCH_SIZE = 1000
+MIGRATION_ID = f"tickets-v{TICKET_SCHEMA_VERSION}"
+
+OUTDATED_QUERY = {"schema_version": {"$not": {"$gte": TICKET_SCHEMA_VERSION}}}
+PROJECTION = {"_id": 1, "user_id": 1, "user_name": 1, "numbers": 1, "grid": 1}
+
+
+async def upgrade_batch(db, tickets) -> int:
+    """One user lookup and one bulk write for a batch of tickets"""
+    user_ids = list({t["user_id"] for t in tickets if t.get("user_id") and not t.get("user_name")})
+    names = {
+        u["id"]: u.get("name", "")
+        async for u in db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "name": 1})
+    } if user_ids else {}
+
+    operations = []
+    for ticket in tickets:
+        upgraded = upgrade_ticket(ticket)
+        fields = {
+            "grid": upgraded["grid"],
+            "numbers": upgraded["numbers"],
+            "packed": pack_grid(upgraded["grid"]),
+            "schema_version": TICKET_SCHEMA_VERSION,
+        }
+        if ticket.get("user_id") and not ticket.get("user_name"):
+            fields["user_name"] = names.get(ticket["user_id"], "")
+        operations.append(UpdateOne({"_id": ticket["_id"]}, {"$set": fields}))
+
+    if operations:
+        await db.tickets.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def save_checkpoint(db, last_id, migrated: int, done: bool = False):
+    update = {"last_id": last_id, "migrated": migrated, "updated_at": datetime.utcnow()}
+    if done:
+        update["completed_at"] = datetime.utcnow()
+    await db.migrations.update_one({"_id": MIGRATION_ID}, {"$set": update}, upsert=True)
+
+
+async def migrate_tickets(batch_size: int = BATCH_SIZE, restart: bool = False):
+    """Upgrade outdated tickets in batches, resuming from the last checkpoint"""
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+
+    print(f"Starting ticket migration to schema version {TICKET_SCHEMA_VERSION}...")
+
+    checkpoint = None if restart else await db.migrations.find_one({"_id": MIGRATION_ID})
+    query = dict(OUTDATED_QUERY)
+    migrated = 0
+    last_id = None
+    if checkpoint and checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        migrated = checkpoint.get("migrated", 0)
+        last_id = checkpoint["last_id"]
+        print(f"   Resuming after {last_id} ({migrated} tickets already migrated)")
+
+    batch = []
+    cursor = db.tickets.find(query, PROJECTION).sort("_id", 1).batch_size(batch_size)
+    async for ticket in cursor:
+        batch.append(ticket)
+        if len(batch) >= batch_size:
+            migrated += await upgrade_batch(db, batch)
+            last_id = batch[-1]["_id"]
+            await save_checkpoint(db, last_id, migrated)
+            batch = []
+            print(f"   ... {migrated} tickets migrated")
+
+    if batch:
+        migrated += await upgrade_batch(db, batch)
+        last_id = batch[-1]["_id"]
+    await save_checkpoint(db, last_id, migrated, done=True)
+
+    print(f"\n🎉 Ticket migration complete!")
+    print(f"   - Tickets migrated: {migrated}")
+    print(f"   - Still outdated: {await db.tickets.count_documents(OUTDATED_QUERY)}")
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade tickets to the current schema version")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scan every ticket")
+    args = parser.parse_args()
+    asyncio.run(migrate_tickets(args.batch_size, args.restart))
@@ -1,13 +1,20 @@
 """
-Migration Script: Add ₹500 to all users' wallets
-Run this once to give existing users ₹500 initial balance
+Migration Script: move every balance onto users.wallet_balance
+Safe to run more than once.
+
+- Balances in the old `wallets` collection are credited to the user's
+  wallet_balance with one ledger entry each (key `migrate:<user_id>`),
+  so the balance still reconciles with the ledger.
+- Users who never got the ₹500 welcome bonus get it through the ledger.
 """
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
 from datetime import datetime
-import uuid
+
+import wallet
+from wallet import WELCOME_BONUS
 
 # Load environment
 load_dotenv()
@@ -16,78 +23,51 @@ mongo_url = os.environ['MONGO_URL']
 db_name = os.environ['DB_NAME']
 
 async def migrate_wallets():
-    """Add ₹500 to all users' wallets"""
+    """Fold legacy wallets into users and pay missing welcome bonuses"""
     client = AsyncIOMotorClient(mongo_url)
     db = client[db_name]
-    
+
     print("Starting wallet migration...")
-    
-    # Get all users
-    users = await db.users.find({}).to_list(1000)
-    print(f"Found {len(users)} users")
-    
-    updated_count = 0
-    created_count = 0
-    
-    for user in users:
-        user_id = user.get('id')
-        
-        # Check if wallet exists
-        wallet = await db.wallets.find_one({"user_id": user_id})
-        
-        if not wallet:
-            # Create new wallet with ₹500
-            wallet_id = str(uuid.uuid4())
-            new_wallet = {
-                "id": wallet_id,
-                "user_id": user_id,
-                "balance": 500.0,
-                "created_at": datetime.utcnow()
-            }
-            await db.wallets.insert_one(new_wallet)
-            
-            # Create transaction
-            transaction_id = str(uuid.uuid4())
-            await db.transactions.insert_one({
-                "id": transaction_id,
-                "user_id": user_id,
-                "type": "credit",
-                "amount": 500.0,
-                "description": "Welcome bonus - Initial wallet balance",
-                "created_at": datetime.utcnow()
-            })
-            
-            created_count += 1
-            print(f"✅ Created wallet for user {user.get('name')} with ₹500")
-        else:
-            # Update existing wallet - add ₹500 to current balance
-            current_balance = wallet.get('balance', 0)
-            new_balance = current_balance + 500.0
-            
-            await db.wallets.update_one(
-                {"user_id": user_id},
-                {"$set": {"balance": new_balance}}
+
+    folded_count = 0
+    bonus_count = 0
+
+    # Legacy wallets not moved yet
+    async for legacy in db.wallets.find({"migrated_at": {"$exists": False}}):
+        user_id = legacy.get('user_id')
+        balance = legacy.get('balance', 0.0)
+
+        # Keyed, so a crash before the mark below can't add it twice
+        if balance:
+            await wallet.credit(
+                db, user_id, balance, "Balance moved from legacy wallet", key=f"migrate:{user_id}"
             )
-            
-            # Create transaction
-            transaction_id = str(uuid.uuid4())
-            await db.transactions.insert_one({
-                "id": transaction_id,
-                "user_id": user_id,
-                "type": "credit",
-                "amount": 500.0,
-                "description": "Welcome bonus - Wallet top-up",
-                "created_at": datetime.utcnow()
-            })
-            
-            updated_count += 1
-            print(f"✅ Updated wallet for user {user.get('name')}: ₹{current_balance} → ₹{new_balance}")
-    
+        await db.wallets.update_one({"id": legacy["id"]}, {"$set": {"migrated_at": datetime.utcnow()}})
+
+        folded_count += 1
+        print(f"✅ Moved ₹{balance} from legacy wallet of user {user_id}")
+
+    # Everyone else without a welcome bonus
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "name": 1}):
+        user_id = user.get('id')
+        if await db.wallets.find_one({"user_id": user_id}, {"_id": 1}):
+            continue
+
+        key = f"welcome:{user_id}"
+        if await db.transactions.find_one({"key": key}, {"_id": 1}):
+            continue
+
+        await wallet.credit(db, user_id, WELCOME_BONUS, "Welcome bonus - Initial wallet balance", key=key)
+        bonus_count += 1
+        print(f"✅ Credited ₹{WELCOME_BONUS} welcome bonus to user {user.get('name')}")
+
     print(f"\n🎉 Migration complete!")
-    print(f"   - Created {created_count} new wallets")
-    print(f"   - Updated {updated_count} existing wallets")
-    print(f"   - Total users processed: {len(users)}")
-    
+    print(f"   - Moved {folded_count} legacy wallets")
+    print(f"   - Credited {bonus_count} welcome bonuses")
+
+    mismatches = await wallet.reconcile(db)
+    print(f"   - Balances not matching their ledger: {len(mismatches)}")
+
     client.close()
 
 if __name__ == "__main__":
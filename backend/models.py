@@ -7,6 +7,8 @@ from datetime import datetime
 from enum import Enum
 import uuid
 
+from ticket_schema import TICKET_SCHEMA_VERSION
+
 
 # ============= ENUMS =============
 class RoomStatus(str, Enum):
@@ -101,6 +103,8 @@ class RoomCreate(BaseModel):
     max_players: int = Field(default=50, ge=2, le=100)
     min_players: int = Field(default=2, ge=2)
     auto_start: bool = True
+    auto_speed: int = Field(default=5, ge=1, le=60)  # seconds between auto-called numbers
+    auto_claim: bool = False  # server awards prizes after each call
     prizes: List[PrizeConfig]
     password: Optional[str] = None
 
@@ -122,10 +126,13 @@ class Room(BaseModel):
     status: RoomStatus = RoomStatus.WAITING
     players: List[Dict[str, Any]] = []
     tickets_sold: int = 0
+    ticket_version: int = 0  # bumped whenever tickets are added to the room
     prize_pool: float = 0.0
     called_numbers: List[int] = []
     current_number: Optional[int] = None
     is_paused: bool = False
+    auto_speed: int = 5
+    auto_claim: bool = False
     winners: List[Dict[str, Any]] = []
     admin_selected_ticket: Optional[str] = None  # ticket_id for host's winner pick
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -133,6 +140,27 @@ class Room(BaseModel):
     completed_at: Optional[datetime] = None
 
 
+class RoomSummary(BaseModel):
+    """Lobby listing entry (lobby.LOBBY_PROJECTION)"""
+    id: str
+    room_code: str
+    name: str
+    host_id: str
+    host_name: str
+    room_type: RoomType
+    ticket_price: float
+    max_players: int
+    min_players: int
+    current_players: int = 0
+    auto_start: bool = False
+    prizes: List[PrizeConfig] = []
+    status: RoomStatus
+    tickets_sold: int = 0
+    prize_pool: float = 0.0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+
+
 class RoomJoin(BaseModel):
     room_id: str
     password: Optional[str] = None
@@ -142,6 +170,7 @@ class RoomJoin(BaseModel):
 class TicketPurchase(BaseModel):
     room_id: str
     quantity: int = Field(default=1, ge=1, le=10)
+    strips: bool = False  # quantity counts full strips of 6 tickets covering 1-90
 
 
 class Ticket(BaseModel):
@@ -153,13 +182,17 @@ class Ticket(BaseModel):
     grid: List[List[Optional[int]]]
     numbers: List[int]
     marked_numbers: List[int] = []
+    strip_id: Optional[str] = None
+    strip_index: Optional[int] = None  # position 0-5 within the strip
     purchased_at: datetime = Field(default_factory=datetime.utcnow)
+    schema_version: int = TICKET_SCHEMA_VERSION  # see ticket_schema.py
 
 
 # ============= WALLET MODELS =============
 class WalletAddMoney(BaseModel):
     amount: float = Field(..., ge=10, le=10000)
     payment_method: str = "razorpay"
+    idempotency_key: Optional[str] = Field(default=None, max_length=64)  # retries with the same key credit once
 
 
 class Transaction(BaseModel):
@@ -171,6 +204,7 @@ class Transaction(BaseModel):
     balance_after: float
     room_id: Optional[str] = None
     ticket_id: Optional[str] = None
+    key: Optional[str] = None  # idempotency key (unique in the ledger)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -198,6 +232,9 @@ class Winner(BaseModel):
     verified: bool = False
     claimed_at: datetime = Field(default_factory=datetime.utcnow)
     verified_at: Optional[datetime] = None
+    rank: Optional[int] = None  # set at settlement
+    paid: bool = False  # prize credited at settlement, when the game ends
+    paid_at: Optional[datetime] = None
 
 
 # ============= CHAT MODELS =============
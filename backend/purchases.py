@@ -0,0 +1,141 @@
+"""
+Ticket purchase pipeline - guarded writes, allocated ticket numbers, one insert
+
+Every write is conditional, so concurrent buyers can't overdraw a wallet
+or buy into a started room. On a replica set the whole purchase runs in a
+transaction. On a standalone server each step that already succeeded is
+undone if a later one fails (the debit by a refund entry in the ledger).
+"""
+import logging
+import os
+import uuid
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo.errors import ConfigurationError, OperationFailure
+
+from models import Ticket, RoomStatus
+from ticket_generator import generate_tickets, generate_strips, STRIP_SIZE
+from ticket_codec import with_packed
+from lobby import lobby_cache
+from sequences import ticket_numbers
+import wallet
+
+logger = logging.getLogger(__name__)
+
+# "auto" tries transactions and falls back once the server refuses them
+MONGO_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "auto").lower()
+
+PRIZE_POOL_SHARE = 0.8  # 80% of ticket sales goes to the prize pool
+
+_transactions_supported: Optional[bool] = None if MONGO_TRANSACTIONS == "auto" else MONGO_TRANSACTIONS == "on"
+
+
+async def _purchase(db, session, user: dict, room: dict, quantity: int, strips: bool) -> Tuple[List[dict], float]:
+    room_id = room["id"]
+    ticket_count = quantity * STRIP_SIZE if strips else quantity
+    total_cost = room["ticket_price"] * ticket_count
+    undo = []
+
+    try:
+        # Debit only if the balance covers it (no read-modify-write)
+        entry = await wallet.debit(
+            db, user["id"], total_cost,
+            f"Purchased {ticket_count} ticket(s) for {room['name']}",
+            room_id=room_id, session=session
+        )
+        new_balance = entry["balance_after"]
+        undo.append(lambda: wallet.refund(db, entry, f"Refund - ticket purchase for {room['name']} failed"))
+
+        # Count the sale only while the room is still open
+        room_update = {"tickets_sold": ticket_count, "prize_pool": total_cost * PRIZE_POOL_SHARE}
+        result = await db.rooms.update_one(
+            {"id": room_id, "status": RoomStatus.WAITING},
+            # ticket_version only ever grows, so it is left out of the undo
+            {"$inc": {**room_update, "ticket_version": ticket_count}},
+            session=session
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=400, detail="Cannot buy tickets after game starts")
+        undo.append(lambda: db.rooms.update_one(
+            {"id": room_id}, {"$inc": {k: -v for k, v in room_update.items()}}
+        ))
+
+        # Outside the transaction on purpose (see TicketNumberAllocator)
+        numbers = await ticket_numbers.allocate(db, room_id, ticket_count)
+        if strips:
+            batch = []
+            for strip in generate_strips(quantity):
+                strip_id = str(uuid.uuid4())
+                batch.extend((ticket_data, strip_id, i) for i, ticket_data in enumerate(strip))
+        else:
+            batch = [(ticket_data, None, None) for ticket_data in generate_tickets(quantity)]
+
+        tickets = [
+            Ticket(
+                ticket_number=number,
+                user_id=user["id"],
+                user_name=user["name"],
+                room_id=room_id,
+                grid=ticket_data["grid"],
+                numbers=ticket_data["numbers"],
+                strip_id=strip_id,
+                strip_index=strip_index
+            ).dict()
+            for number, (ticket_data, strip_id, strip_index) in zip(numbers, batch)
+        ]
+        await db.tickets.insert_many([with_packed(t) for t in tickets], session=session)
+    except Exception:
+        # Inside a transaction the abort rolls everything back instead
+        if session is None:
+            for step in reversed(undo):
+                await step()
+        raise
+
+    return tickets, new_balance
+
+
+async def transactions_supported(db) -> bool:
+    """Probe (once) whether the server accepts multi-document transactions"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            async with await db.client.start_session() as session:
+                async with session.start_transaction():
+                    await db.counters.find_one({}, session=session)
+            _transactions_supported = True
+        except (OperationFailure, ConfigurationError, NotImplementedError) as e:
+            # Standalone servers answer IllegalOperation (code 20)
+            logger.warning(f"MongoDB transactions unavailable, using compensating writes: {e}")
+            _transactions_supported = False
+    return _transactions_supported
+
+
+async def purchase_tickets(db, user: dict, room_id: str, quantity: int, strips: bool = False) -> Tuple[List[dict], float]:
+    """
+    Buy `quantity` tickets (or strips) for a user. Returns the inserted
+    ticket documents and the new wallet balance. Raises HTTPException on
+    a missing room, a started game or an insufficient balance.
+    """
+    room = await db.rooms.find_one(
+        {"id": room_id}, {"_id": 0, "id": 1, "name": 1, "status": 1, "ticket_price": 1}
+    )
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if room["status"] != RoomStatus.WAITING:
+        raise HTTPException(status_code=400, detail="Cannot buy tickets after game starts")
+
+    if await transactions_supported(db):
+        async with await db.client.start_session() as session:
+            # Retried automatically on transient errors (write conflicts)
+            tickets, new_balance = await session.with_transaction(
+                lambda s: _purchase(db, s, user, room, quantity, strips)
+            )
+    else:
+        tickets, new_balance = await _purchase(db, None, user, room, quantity, strips)
+
+    lobby_cache.update(room_id, inc={
+        "tickets_sold": len(tickets),
+        "prize_pool": room["ticket_price"] * len(tickets) * PRIZE_POOL_SHARE
+    })
+    return tickets, new_balance
@@ -0,0 +1,309 @@
+"""
+In-memory authoritative state for active rooms with write-behind persistence
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+ROOM_STATE_FLUSH_MS = int(os.getenv("ROOM_STATE_FLUSH_MS", "50"))
+# Recent room events kept for clients resuming after a disconnect
+ROOM_EVENT_BUFFER = int(os.getenv("ROOM_EVENT_BUFFER", "256"))
+# Seconds before a loaded room is re-read for writes made elsewhere (0 = never)
+ROOM_STATE_REFRESH = float(os.getenv("ROOM_STATE_REFRESH", "5"))
+
+# Only the fields the live game needs
+ROOM_STATE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "host_id": 1,
+    "status": 1,
+    "called_numbers": 1,
+    "current_number": 1,
+    "is_paused": 1,
+    "prizes": 1,
+    "auto_speed": 1,
+    "auto_claim": 1,
+}
+
+
+@dataclass
+class RoomState:
+    """Live game state of one room"""
+    room_id: str
+    host_id: str
+    status: str
+    name: str = ""
+    called_numbers: List[int] = field(default_factory=list)
+    called_mask: int = 0  # bit n set once number n has been called
+    current_number: Optional[int] = None
+    is_paused: bool = False
+    prizes: List[dict] = field(default_factory=list)
+    claimed_prizes: Set[str] = field(default_factory=set)
+    auto_speed: int = 5
+    auto_claim: bool = False
+    # Resume support: events numbered per state instance. The epoch changes
+    # whenever the state is (re)loaded, so seqs from a previous load are
+    # never mistaken for current ones.
+    event_seq: int = 0
+    events: Deque[Tuple[int, str, dict]] = field(default_factory=lambda: deque(maxlen=ROOM_EVENT_BUFFER))
+    epoch: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    refreshed_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_doc(cls, room: dict, claimed_prizes: Set[str]) -> "RoomState":
+        called = list(room.get("called_numbers") or [])
+        mask = 0
+        for n in called:
+            mask |= 1 << n
+        return cls(
+            room_id=room["id"],
+            host_id=room["host_id"],
+            status=room.get("status", "waiting"),
+            name=room.get("name", ""),
+            called_numbers=called,
+            called_mask=mask,
+            current_number=room.get("current_number"),
+            is_paused=room.get("is_paused", False),
+            prizes=list(room.get("prizes") or []),
+            claimed_prizes=set(claimed_prizes),
+            auto_speed=room.get("auto_speed", 5),
+            auto_claim=room.get("auto_claim", False),
+        )
+
+    def merge(self, room: dict, claimed_prizes: Set[str], pending: dict):
+        """
+        Take what other writers may have changed since the load. Called
+        numbers stay owned by memory (Mongo may lag the write-behind), so
+        only numbers missing here are added; fields with a queued write
+        (`pending`) keep their in-memory value.
+        """
+        self.host_id = room["host_id"]
+        self.status = room.get("status", self.status)
+        self.name = room.get("name", self.name)
+        self.prizes = list(room.get("prizes") or [])
+        self.auto_speed = room.get("auto_speed", self.auto_speed)
+        self.auto_claim = room.get("auto_claim", self.auto_claim)
+        if "is_paused" not in pending.get("set", {}):
+            self.is_paused = room.get("is_paused", self.is_paused)
+        for n in room.get("called_numbers") or []:
+            if not self.is_called(n):
+                self.called_numbers.append(n)
+                self.called_mask |= 1 << n
+        self.claimed_prizes |= claimed_prizes
+        self.refreshed_at = time.monotonic()
+
+    @property
+    def remaining(self) -> int:
+        return 90 - len(self.called_numbers)
+
+    @property
+    def seq(self) -> int:
+        """Call sequence number: n after the n-th call, so it survives restarts"""
+        return len(self.called_numbers)
+
+    def snapshot(self) -> dict:
+        """Compact state for resyncing clients (called numbers as a 91-bit mask)"""
+        return {
+            "room_id": self.room_id,
+            "seq": self.seq,
+            # 12 bytes as 24 hex digits, bit n set once number n is called
+            "called_mask": format(self.called_mask, "024x"),
+            "current_number": self.current_number,
+            "status": self.status,
+            "is_paused": self.is_paused,
+            "claimed_prizes": sorted(self.claimed_prizes),
+            "event_seq": self.event_seq,
+            "epoch": self.epoch,
+        }
+
+    def record_event(self, event: str, data: dict) -> dict:
+        """Number and buffer a room event; returns the payload to broadcast"""
+        self.event_seq += 1
+        data = {**data, "event_seq": self.event_seq}
+        self.events.append((self.event_seq, event, data))
+        return data
+
+    def events_since(self, last_seq: int) -> Optional[List[Tuple[str, dict]]]:
+        """Buffered events after `last_seq`, or None if some were already trimmed"""
+        if last_seq > self.event_seq:
+            return None
+        if last_seq == self.event_seq:
+            return []
+        if not self.events or self.events[0][0] > last_seq + 1:
+            return None
+        return [(event, data) for seq, event, data in self.events if seq > last_seq]
+
+    def is_called(self, number: int) -> bool:
+        return bool(self.called_mask >> number & 1)
+
+    def call(self, number: int):
+        self.called_numbers.append(number)
+        self.called_mask |= 1 << number
+        self.current_number = number
+
+
+class RoomStateRegistry:
+    """
+    Process-wide registry of RoomState objects.
+
+    Reads are served from memory. Frequent writes (called numbers, pause
+    flag) are queued per room and flushed by a background task as one
+    `bulk_write`, appending with `$addToSet` so a flush never rewrites
+    the whole `called_numbers` array and a retried one never repeats a
+    number. Rooms are loaded on first use, re-read every
+    ROOM_STATE_REFRESH seconds to pick up writes made elsewhere, and
+    active rooms are reloaded from Mongo at startup.
+    """
+
+    def __init__(self, flush_interval: float = ROOM_STATE_FLUSH_MS / 1000,
+                 refresh_interval: float = ROOM_STATE_REFRESH):
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self._rooms: Dict[str, RoomState] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._pending: Dict[str, dict] = {}  # room_id -> {"push": [...], "set": {...}}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._rooms
+
+    def peek(self, room_id: str) -> Optional[RoomState]:
+        """Return the cached state without touching Mongo"""
+        return self._rooms.get(room_id)
+
+    async def _load(self, db, room: dict) -> RoomState:
+        claimed = await db.winners.distinct("prize_type", {"room_id": room["id"]})
+        state = RoomState.from_doc(room, set(claimed))
+        self._rooms[state.room_id] = state
+        return state
+
+    def _is_fresh(self, state: RoomState) -> bool:
+        return self.refresh_interval <= 0 or time.monotonic() - state.refreshed_at < self.refresh_interval
+
+    async def get(self, db, room_id: str) -> Optional[RoomState]:
+        """Return a room's state, loaded on first use and re-read when stale"""
+        state = self._rooms.get(room_id)
+        if state is not None and self._is_fresh(state):
+            return state
+
+        lock = self._locks.setdefault(room_id, asyncio.Lock())
+        async with lock:
+            state = self._rooms.get(room_id)
+            if state is not None and self._is_fresh(state):
+                return state
+            room = await db.rooms.find_one({"id": room_id}, ROOM_STATE_PROJECTION)
+            if not room:
+                self.drop(room_id)
+                return None
+            if state is None:
+                return await self._load(db, room)
+            claimed = await db.winners.distinct("prize_type", {"room_id": room_id})
+            state.merge(room, set(claimed), self._pending.get(room_id, {}))
+            return state
+
+    async def recover(self, db) -> int:
+        """Reload every active room from Mongo (crash recovery at startup)"""
+        count = 0
+        async for room in db.rooms.find({"status": "active"}, ROOM_STATE_PROJECTION):
+            await self._load(db, room)
+            count += 1
+        logger.info(f"Recovered state for {count} active rooms")
+        return count
+
+    def drop(self, room_id: str):
+        """Forget a finished room. Queued writes are still flushed."""
+        self._rooms.pop(room_id, None)
+        self._locks.pop(room_id, None)
+
+    # ============= WRITE-BEHIND =============
+    def _pending_for(self, room_id: str) -> dict:
+        return self._pending.setdefault(room_id, {"push": [], "set": {}})
+
+    def record_call(self, state: RoomState, number: int):
+        """Apply a called number in memory and queue its persistence"""
+        state.call(number)
+        pending = self._pending_for(state.room_id)
+        pending["push"].append(number)
+        pending["set"]["current_number"] = number
+
+    def record_set(self, room_id: str, **fields):
+        """Queue plain field updates for a room"""
+        self._pending_for(room_id)["set"].update(fields)
+
+    async def flush(self, db):
+        """Persist every queued room update with a single bulk_write"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        room_ids = []
+        operations = []
+        for room_id, ops in pending.items():
+            update = {}
+            if ops["push"]:
+                # A number is called once per game, so $addToSet appends in
+                # order like $push but makes a retried write a no-op
+                update["$addToSet"] = {"called_numbers": {"$each": ops["push"]}}
+            if ops["set"]:
+                update["$set"] = ops["set"]
+            if update:
+                room_ids.append(room_id)
+                operations.append(UpdateOne({"id": room_id}, update))
+
+        if not operations:
+            return
+        try:
+            await db.rooms.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: every op not listed as failed was applied
+            failed = {room_ids[err["index"]] for err in e.details.get("writeErrors", [])}
+            logger.error(f"Room state flush failed for {len(failed)} room(s), will retry: {e}")
+            self._requeue({room_id: pending[room_id] for room_id in failed})
+        except Exception as e:
+            logger.error(f"Room state flush failed, will retry: {e}")
+            self._requeue(pending)
+
+    def _requeue(self, pending: dict):
+        """Put unwritten updates back ahead of anything queued since"""
+        for room_id, ops in pending.items():
+            newer = self._pending.get(room_id)
+            if newer:
+                ops["push"].extend(newer["push"])
+                ops["set"].update(newer["set"])
+            self._pending[room_id] = ops
+
+    async def _flush_loop(self, db):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush(db)
+
+    def start(self, db):
+        """Start the background flusher"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(db))
+
+    async def stop(self, db):
+        """Stop the flusher and persist anything still queued"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush(db)
+
+
+# Shared process-wide registry
+room_states = RoomStateRegistry()
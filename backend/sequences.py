@@ -0,0 +1,91 @@
+"""
+Per-room ticket-number allocation with an in-memory block cache
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Numbers reserved from Mongo per round-trip (per room, per process)
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", "50"))
+
+
+class TicketNumberAllocator:
+    """
+    Hands out unique ticket numbers per room.
+
+    Each process reserves a block of numbers with one `$inc` on the
+    room's counter document and serves allocations from memory until the
+    block runs out. Numbers are unique across processes. They are not
+    gap-free: unused parts of a block are lost on restart, and workers
+    interleave.
+
+    Reservations never run inside a caller's transaction. An aborted
+    purchase must not roll the counter back under numbers that are still
+    cached here.
+    """
+
+    def __init__(self, block_size: int = SEQUENCE_BLOCK_SIZE):
+        self.block_size = max(block_size, 1)
+        self._blocks: Dict[str, List[int]] = {}  # room_id -> [next, end)
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _counter_id(room_id: str) -> str:
+        return f"ticket_number:{room_id}"
+
+    async def _reserve(self, db, room_id: str, count: int) -> int:
+        """Reserve `count` numbers in Mongo; returns the first one"""
+        for _ in range(2):
+            counter = await db.counters.find_one_and_update(
+                {"_id": self._counter_id(room_id)},
+                {"$inc": {"seq": count}},
+                return_document=ReturnDocument.AFTER
+            )
+            if counter:
+                return counter["seq"] - count + 1
+
+            # First reservation for this room: continue after any existing tickets
+            last = await db.tickets.find_one(
+                {"room_id": room_id}, {"_id": 0, "ticket_number": 1},
+                sort=[("ticket_number", -1)]
+            )
+            try:
+                await db.counters.update_one(
+                    {"_id": self._counter_id(room_id)},
+                    {"$setOnInsert": {"seq": last["ticket_number"] if last else 0}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # another process seeded it first
+        raise RuntimeError(f"Could not reserve ticket numbers for room {room_id}")
+
+    async def allocate(self, db, room_id: str, count: int = 1) -> List[int]:
+        """Return `count` unique ticket numbers for a room, ascending"""
+        lock = self._locks.setdefault(room_id, asyncio.Lock())
+        async with lock:
+            block = self._blocks.get(room_id)
+            numbers: List[int] = []
+            while len(numbers) < count:
+                if block is None or block[0] >= block[1]:
+                    size = max(self.block_size, count - len(numbers))
+                    first = await self._reserve(db, room_id, size)
+                    block = self._blocks[room_id] = [first, first + size]
+                take = min(count - len(numbers), block[1] - block[0])
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+            return numbers
+
+    def drop(self, room_id: str):
+        """Forget a room's cached block (game started or finished)"""
+        self._blocks.pop(room_id, None)
+        self._locks.pop(room_id, None)
+
+
+# Shared process-wide allocator
+ticket_numbers = TicketNumberAllocator()
@@ -0,0 +1,72 @@
+"""
+JSON serialization for API responses and Socket.IO payloads
+
+One encoder for everything that leaves the server. Mongo documents go
+out as they are read: ObjectId, datetime, enums and Pydantic models are
+handled by the encoder in a single pass instead of rebuilding every dict
+and list first. Queries should still exclude `_id` (NO_ID) so it is
+never sent at all.
+
+orjson is used when installed, else the standard library encoder.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Projection for documents that are returned or emitted as-is
+NO_ID = {"_id": 0}
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        # model_dump on pydantic 2, dict() on the 1.x pinned in requirements.txt
+        dump = getattr(obj, "model_dump", None) or obj.dict
+        return dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps(obj: Any, **kwargs) -> str:
+        # kwargs (separators=...) are what Socket.IO passes; orjson is always compact
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any, **kwargs) -> str:
+        kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, default=_default, **kwargs)
+
+    def dumpb(obj: Any) -> bytes:
+        return dumps(obj).encode()
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the shared encoder; also accepts pre-encoded bytes"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumpb(content)
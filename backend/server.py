@@ -11,6 +11,9 @@ import uuid
 from datetime import datetime
 import random
 
+import ticket_generator
+from ticket_codec import with_packed
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,123 +30,6 @@ app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 
-# ============= TAMBOLA TICKET GENERATION ALGORITHM =============
-def generate_tambola_ticket(ticket_number: int):
-    """
-    Generate a valid Tambola/Housie ticket following standard rules:
-    - 3 rows x 9 columns
-    - 15 numbers total (5 per row)
-    - Column 0: 1-9, Column 1: 10-19, Column 2: 20-29... Column 8: 80-90
-    - Numbers sorted within columns
-    """
-    ticket = [[None for _ in range(9)] for _ in range(3)]
-    
-    # Define column ranges
-    column_ranges = [
-        (1, 9),    # Column 0: 1-9
-        (10, 19),  # Column 1: 10-19
-        (20, 29),  # Column 2: 20-29
-        (30, 39),  # Column 3: 30-39
-        (40, 49),  # Column 4: 40-49
-        (50, 59),  # Column 5: 50-59
-        (60, 69),  # Column 6: 60-69
-        (70, 79),  # Column 7: 70-79
-        (80, 90),  # Column 8: 80-90
-    ]
-    
-    # Step 1: Select numbers for each column
-    column_numbers = []
-    for col_idx, (start, end) in enumerate(column_ranges):
-        available = list(range(start, end + 1))
-        random.shuffle(available)
-        column_numbers.append(available)
-    
-    # Step 2: Decide which columns will have numbers (ensure 5 per row)
-    # Each row must have exactly 5 numbers and 4 blanks
-    # Each column can have 0, 1, 2, or 3 numbers
-    
-    # Generate column distribution (how many numbers per column across 3 rows)
-    # Total must be 15 numbers distributed across 9 columns
-    column_counts = []
-    remaining = 15
-    for i in range(9):
-        if i == 8:  # Last column gets remaining
-            column_counts.append(remaining)
-        else:
-            # Random between 0-3, but ensure we can still distribute remaining
-            max_for_this = min(3, remaining - (8 - i))  # Keep at least 1 for remaining columns
-            min_for_this = max(0, remaining - (8 - i) * 3)  # Ensure we use enough
-            count = random.randint(min_for_this, max_for_this)
-            column_counts.append(count)
-            remaining -= count
-    
-    # Step 3: Distribute numbers into rows ensuring 5 per row
-    rows_distribution = [[] for _ in range(3)]  # Track which columns have numbers in each row
-    
-    for col_idx, count in enumerate(column_counts):
-        if count == 0:
-            continue
-        
-        # Decide which rows will have numbers in this column
-        available_rows = [0, 1, 2]
-        random.shuffle(available_rows)
-        selected_rows = available_rows[:count]
-        
-        for row_idx in selected_rows:
-            rows_distribution[row_idx].append(col_idx)
-    
-    # Step 4: Balance rows to have exactly 5 numbers each
-    for row_idx in range(3):
-        current_count = len(rows_distribution[row_idx])
-        
-        if current_count < 5:
-            # Add more columns
-            available_cols = [c for c in range(9) if c not in rows_distribution[row_idx] and column_counts[c] < 3]
-            needed = 5 - current_count
-            
-            for _ in range(needed):
-                if available_cols:
-                    col = random.choice(available_cols)
-                    rows_distribution[row_idx].append(col)
-                    column_counts[col] += 1
-                    available_cols.remove(col)
-                    if column_counts[col] >= 3:
-                        available_cols = [c for c in available_cols if c != col]
-        
-        elif current_count > 5:
-            # Remove extra columns
-            extra = current_count - 5
-            random.shuffle(rows_distribution[row_idx])
-            to_remove = rows_distribution[row_idx][:extra]
-            
-            for col in to_remove:
-                rows_distribution[row_idx].remove(col)
-                column_counts[col] -= 1
-    
-    # Step 5: Fill ticket with numbers
-    for col_idx in range(9):
-        # Get all rows that should have a number in this column
-        rows_with_numbers = [r for r in range(3) if col_idx in rows_distribution[r]]
-        
-        # Sort and assign numbers
-        rows_with_numbers.sort()
-        for idx, row_idx in enumerate(rows_with_numbers):
-            ticket[row_idx][col_idx] = column_numbers[col_idx][idx]
-    
-    # Convert ticket to list format with numbers flattened
-    numbers_list = []
-    for row in ticket:
-        for num in row:
-            if num is not None:
-                numbers_list.append(num)
-    
-    return {
-        "ticket_number": ticket_number,
-        "grid": ticket,  # 3x9 grid with None for blanks
-        "numbers": sorted(numbers_list)  # All 15 numbers sorted
-    }
-
-
 # Define Models
 class Player(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -228,26 +114,25 @@ async def update_player(player_id: str, player: PlayerCreate):
 @api_router.post("/tickets/generate")
 async def generate_tickets(game_create: GameCreate):
     """Generate tickets for all players when game starts"""
+    counts = [game_create.tickets_per_player.get(player["id"], 1) for player in game_create.players]
+    # One vectorized batch for the whole game
+    batch = iter(ticket_generator.generate_tickets(sum(counts)))
     tickets = []
-    ticket_counter = 1
     
-    for player in game_create.players:
+    for player, count in zip(game_create.players, counts):
         player_id = player["id"]
         player_name = player["name"]
-        count = game_create.tickets_per_player.get(player_id, 1)
         
         for _ in range(count):
-            ticket_data = generate_tambola_ticket(ticket_counter)
+            ticket_data = next(batch)
             ticket = Ticket(
-                ticket_number=ticket_counter,
+                ticket_number=ticket_data["ticket_number"],
                 player_id=player_id,
                 player_name=player_name,
                 grid=ticket_data["grid"],
                 numbers=ticket_data["numbers"]
             )
             tickets.append(ticket)
-            await db.tickets.insert_one(ticket.dict())
-            ticket_counter += 1
         
         # Update player ticket count
         await db.players.update_one(
@@ -255,6 +140,9 @@ async def generate_tickets(game_create: GameCreate):
             {"$set": {"ticket_count": count}}
         )
     
+    if tickets:
+        await db.tickets.insert_many([with_packed(t.dict()) for t in tickets])
+    
     return {"tickets": [t.dict() for t in tickets]}
 
 @api_router.get("/tickets")
@@ -392,6 +280,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    from indexes import ensure_indexes, LEGACY_INDEXES
+    await ensure_indexes(db, LEGACY_INDEXES)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -1,18 +1,12 @@
 """
 Enhanced FastAPI Server with Multiplayer Features
 """
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-import os
 import logging
-from pathlib import Path
 from typing import List, Optional
 from datetime import datetime
-import random
 import socketio
-import uuid
 
 # Import models and auth
 from models import *
@@ -20,36 +14,81 @@ from auth import (
     get_password_hash, 
     verify_password, 
     create_user_token, 
-    get_current_user
+    get_current_user,
+    invalidate_user
 )
-
-# Load environment
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+from ticket_index import ticket_index
+from ticket_schema import normalized
+from room_state import room_states
+from win_engine import compile_ticket, check_prize, numbers_mask
+from purchases import purchase_tickets
+from claims import claim_prize
+from cluster import make_client_manager, room_router
+from ticket_codec import pack_tickets, PACKED_ENCODING, TICKET_PROJECTION
+from lobby import lobby_cache, lobby_feed, LOBBY_PROJECTION, LOBBY_LIMIT
+import serialization
+import wallet
+from wallet import WELCOME_BONUS, HISTORY_MAX_PAGE
+from settlement import settle_pending
+from serialization import NO_ID, FastJSONResponse
+
+# MongoDB connection (shared pool, also used by auth)
+from database import db
 
 # Lifespan: startup/shutdown (replaces deprecated on_event)
 from contextlib import asynccontextmanager
 
+def release_room_locally(room_id: str):
+    """Forget this worker's copy of a room's live state"""
+    room_states.drop(room_id)
+    ticket_index.drop(room_id)
+
+
 @asynccontextmanager
 async def lifespan(app_instance):
+    from auto_caller import auto_caller
+    from indexes import ensure_indexes
     from socket_handlers import register_socket_events
+    await ensure_indexes(db)
+    # Each room's live state is held by one worker (its owner); rooms this
+    # worker takes over are reloaded, and those it loses are let go
+    room_router.is_live = lambda room_id: room_states.peek(room_id) is not None
+    room_router.on_acquire(release_room_locally)
+    room_router.on_release(release_room_locally)
+    room_router.on_release(auto_caller.stop)
+    room_router.start()
+    # Reload active games (a lone worker owns them all; in a cluster their
+    # owners load them on first use), then persist room state in the background
+    if not room_router.clustered:
+        await room_states.recover(db)
+    room_states.start(db)
+    # Pay out games that completed while a previous process was settling them
+    await settle_pending(db)
     await register_socket_events(sio, db)
     logging.getLogger(__name__).info("Socket.IO handlers registered")
+    lobby_feed.start(sio, db, lobby_cache)
+    wallet.wallet_reconciler.start(db)
     yield
-    # shutdown if needed
-    pass
+    # Stop server-side auto-callers and flush queued room writes
+    await auto_caller.stop_all()
+    await lobby_feed.stop()
+    await wallet.wallet_reconciler.stop()
+    await room_states.stop(db)
+    await room_router.stop()
 
 # Create FastAPI app
-app = FastAPI(title="Tambola Multiplayer API", version="2.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Tambola Multiplayer API",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
 
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=make_client_manager(),  # Redis fan-out when SOCKETIO_MESSAGE_QUEUE is set
+    json=serialization,  # same encoder as the API; handles ObjectId/datetime
     cors_allowed_origins='*',
     logger=True,
     engineio_logger=True
@@ -75,167 +114,10 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# ============= SERIALIZATION HELPER =============
-from bson import ObjectId
-from typing import Any
-
-def serialize_doc(doc: Any) -> Any:
-    """
-    Recursively convert MongoDB document to JSON-serializable format.
-    Converts ObjectId to string and handles nested structures.
-    """
-    if doc is None:
-        return None
-    
-    if isinstance(doc, ObjectId):
-        return str(doc)
-    
-    if isinstance(doc, dict):
-        return {key: serialize_doc(value) for key, value in doc.items()}
-    
-    if isinstance(doc, list):
-        return [serialize_doc(item) for item in doc]
-    
-    if isinstance(doc, datetime):
-        return doc.isoformat()
-    
-    return doc
-
-
-# ============= TICKET GENERATION (from original) =============
-def generate_tambola_ticket(ticket_number: int):
-    """Generate a valid Tambola ticket"""
-    ticket = [[None for _ in range(9)] for _ in range(3)]
-    
-    column_ranges = [
-        (1, 9), (10, 19), (20, 29), (30, 39), (40, 49),
-        (50, 59), (60, 69), (70, 79), (80, 90)
-    ]
-    
-    column_numbers = []
-    for start, end in column_ranges:
-        available = list(range(start, end + 1))
-        random.shuffle(available)
-        column_numbers.append(available)
-    
-    column_counts = []
-    remaining = 15
-    for i in range(9):
-        if i == 8:
-            column_counts.append(remaining)
-        else:
-            max_for_this = min(3, remaining - (8 - i))
-            min_for_this = max(0, remaining - (8 - i) * 3)
-            count = random.randint(min_for_this, max_for_this)
-            column_counts.append(count)
-            remaining -= count
-    
-    rows_distribution = [[] for _ in range(3)]
-    for col_idx, count in enumerate(column_counts):
-        if count == 0:
-            continue
-        available_rows = [0, 1, 2]
-        random.shuffle(available_rows)
-        selected_rows = available_rows[:count]
-        for row_idx in selected_rows:
-            rows_distribution[row_idx].append(col_idx)
-    
-    for row_idx in range(3):
-        current_count = len(rows_distribution[row_idx])
-        if current_count < 5:
-            available_cols = [c for c in range(9) 
-                            if c not in rows_distribution[row_idx] 
-                            and column_counts[c] < 3]
-            needed = 5 - current_count
-            for _ in range(needed):
-                if available_cols:
-                    col = random.choice(available_cols)
-                    rows_distribution[row_idx].append(col)
-                    column_counts[col] += 1
-                    available_cols.remove(col)
-                    if column_counts[col] >= 3:
-                        available_cols = [c for c in available_cols if c != col]
-        elif current_count > 5:
-            extra = current_count - 5
-            random.shuffle(rows_distribution[row_idx])
-            to_remove = rows_distribution[row_idx][:extra]
-            for col in to_remove:
-                rows_distribution[row_idx].remove(col)
-                column_counts[col] -= 1
-    
-    for col_idx in range(9):
-        rows_with_numbers = [r for r in range(3) if col_idx in rows_distribution[r]]
-        rows_with_numbers.sort()
-        for idx, row_idx in enumerate(rows_with_numbers):
-            ticket[row_idx][col_idx] = column_numbers[col_idx][idx]
-    
-    numbers_list = []
-    for row in ticket:
-        for num in row:
-            if num is not None:
-                numbers_list.append(num)
-    
-    return {
-        "ticket_number": ticket_number,
-        "grid": ticket,
-        "numbers": sorted(numbers_list)
-    }
-
-
 # ============= WIN VALIDATION =============
 def validate_win(ticket: dict, called_numbers: List[int], prize_type: PrizeType) -> bool:
     """Validate if a ticket has won a specific prize"""
-    grid = ticket["grid"]
-    numbers = ticket["numbers"]
-    
-    # Check if all ticket numbers are in called numbers
-    ticket_called = [n for n in numbers if n in called_numbers]
-    
-    if prize_type == PrizeType.EARLY_FIVE:
-        # First 5 called numbers that match the ticket
-        matching_numbers = [n for n in called_numbers if n in numbers]
-        return len(matching_numbers) >= 5
-    
-    elif prize_type == PrizeType.TOP_LINE:
-        top_line = [n for n in grid[0] if n is not None]
-        return all(n in called_numbers for n in top_line)
-    
-    elif prize_type == PrizeType.MIDDLE_LINE:
-        middle_line = [n for n in grid[1] if n is not None]
-        return all(n in called_numbers for n in middle_line)
-    
-    elif prize_type == PrizeType.BOTTOM_LINE:
-        bottom_line = [n for n in grid[2] if n is not None]
-        return all(n in called_numbers for n in bottom_line)
-    
-    elif prize_type == PrizeType.FOUR_CORNERS:
-        corners = []
-        # Top-left corner
-        for n in grid[0]:
-            if n is not None:
-                corners.append(n)
-                break
-        # Top-right corner
-        for n in reversed(grid[0]):
-            if n is not None:
-                corners.append(n)
-                break
-        # Bottom-left corner
-        for n in grid[2]:
-            if n is not None:
-                corners.append(n)
-                break
-        # Bottom-right corner
-        for n in reversed(grid[2]):
-            if n is not None:
-                corners.append(n)
-                break
-        return len(corners) == 4 and all(n in called_numbers for n in corners)
-    
-    elif prize_type == PrizeType.FULL_HOUSE:
-        return all(n in called_numbers for n in numbers)
-    
-    return False
+    return check_prize(compile_ticket(ticket), numbers_mask(called_numbers), prize_type)
 
 
 # ============= AUTHENTICATION ROUTES =============
@@ -268,26 +150,12 @@ async def signup(user_data: UserCreate):
     
     await db.users.insert_one(user.dict())
     
-    # Create wallet with ₹500 initial balance
-    wallet_id = str(uuid.uuid4())
-    wallet = {
-        "id": wallet_id,
-        "user_id": user.id,
-        "balance": 500.0,  # ₹500 initial balance
-        "created_at": datetime.utcnow()
-    }
-    await db.wallets.insert_one(wallet)
-    
-    # Create initial transaction record
-    transaction_id = str(uuid.uuid4())
-    await db.transactions.insert_one({
-        "id": transaction_id,
-        "user_id": user.id,
-        "type": "credit",
-        "amount": 500.0,
-        "description": "Welcome bonus - Initial wallet balance",
-        "created_at": datetime.utcnow()
-    })
+    # ₹500 welcome bonus, through the ledger like every other credit
+    bonus = await wallet.credit(
+        db, user.id, WELCOME_BONUS, "Welcome bonus - Initial wallet balance",
+        key=f"welcome:{user.id}"
+    )
+    user.wallet_balance = bonus["balance_after"]
     
     logger.info(f"Created new user {user.id} with ₹500 welcome bonus")
     
@@ -333,6 +201,7 @@ async def login(credentials: UserLogin):
         {"id": user["id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    invalidate_user(user["id"])
     
     # Create token
     token = create_user_token(user["id"], user["email"])
@@ -372,25 +241,26 @@ async def get_profile(current_user: dict = Depends(get_current_user)):
 
 
 # ============= ROOM ROUTES =============
-@api_router.get("/rooms", response_model=List[Room])
+@api_router.get("/rooms", response_model=List[RoomSummary])
 async def get_rooms(
+    request: Request,
     room_type: Optional[RoomType] = None,
     status: Optional[RoomStatus] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get list of available rooms"""
-    query = {}
+    """Get list of available rooms (summaries; the default listing is cached)"""
+    if not status:
+        etag, body = await lobby_cache.listing(db, room_type.value if room_type else None)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return FastJSONResponse(body, headers=headers)
+    
+    query = {"status": status}
     if room_type:
         query["room_type"] = room_type
-    if status:
-        query["status"] = status
-    else:
-        query["status"] = {"$in": [RoomStatus.WAITING, RoomStatus.ACTIVE]}
-    
-    rooms = await db.rooms.find(query).sort("created_at", -1).limit(50).to_list(50)
-    # Serialize to remove ObjectId
-    serialized_rooms = [serialize_doc(room) for room in rooms]
-    return [Room(**room) for room in serialized_rooms]
+    rooms = await db.rooms.find(query, LOBBY_PROJECTION).sort("created_at", -1).limit(LOBBY_LIMIT).to_list(LOBBY_LIMIT)
+    return FastJSONResponse(rooms)
 
 
 @api_router.post("/rooms/create", response_model=Room)
@@ -425,18 +295,18 @@ async def create_room(
         max_players=room_data.max_players,
         min_players=room_data.min_players,
         auto_start=room_data.auto_start,
+        auto_speed=room_data.auto_speed,
+        auto_claim=room_data.auto_claim,
         prizes=fixed_prizes,  # Use fixed prizes with enum
         password=room_data.password
     )
     
     await db.rooms.insert_one(room.dict())
+    # Also queues a "created" diff for lobby subscribers
+    lobby_cache.room_created(room.dict())
     
     logger.info(f"Room created: {room.id} by {current_user['name']}")
     
-    # Broadcast new room to all connected clients
-    serialized_room = serialize_doc(room.dict())
-    await sio.emit('new_room', serialized_room)
-    
     return room
 
 
@@ -446,40 +316,113 @@ async def get_room(
     current_user: dict = Depends(get_current_user)
 ):
     """Get room details"""
-    room = await db.rooms.find_one({"id": room_id})
+    room = await db.rooms.find_one({"id": room_id}, NO_ID)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
-    # Serialize to remove ObjectId
-    serialized_room = serialize_doc(room)
-    return Room(**serialized_room)
+    # Live game fields come from memory; Mongo may lag by one flush
+    state = room_states.peek(room_id)
+    if state:
+        room["called_numbers"] = state.called_numbers
+        room["current_number"] = state.current_number
+        room["is_paused"] = state.is_paused
+    return Room(**room)
 
 
 @api_router.get("/rooms/{room_id}/tickets", response_model=List[Ticket])
 async def get_room_tickets(
     room_id: str,
+    encoding: str = "json",
     current_user: dict = Depends(get_current_user)
 ):
     """Get all tickets in a room (host only) - for admin winner selection"""
-    room = await db.rooms.find_one({"id": room_id})
+    room = await db.rooms.find_one({"id": room_id}, {"_id": 0, "host_id": 1})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     if room["host_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Only host can list room tickets")
-    tickets = await db.tickets.find({"room_id": room_id}).to_list(500)
+    tickets = await db.tickets.find({"room_id": room_id}, NO_ID).to_list(500)
+
+    # Tickets stored without their owner's name (see migrate_tickets.py):
+    # one lookup for all of them
+    nameless = list({t["user_id"] for t in tickets if not t.get("user_name") and t.get("user_id")})
+    if nameless:
+        names = {
+            u["id"]: u.get("name", "")
+            async for u in db.users.find({"id": {"$in": nameless}}, {"_id": 0, "id": 1, "name": 1})
+        }
+        for t in tickets:
+            if not t.get("user_name"):
+                t["user_name"] = names.get(t.get("user_id"), "")
+
+    if encoding == PACKED_ENCODING:
+        return FastJSONResponse(pack_tickets(tickets, binary=False))
+    return [Ticket(**normalized(t)) for t in tickets]
 
-    # Some older tickets may not have user_name populated; enrich them on the fly
-    enriched: List[Ticket] = []
-    for t in tickets:
-        if not t.get("user_name") and t.get("user_id"):
-            try:
-                user = await db.users.find_one({"id": t["user_id"]})
-                if user:
-                    t["user_name"] = user.get("name", "")
-            except Exception as e:
-                logger.error(f"Failed to enrich ticket user_name for ticket {t.get('id')}: {e}")
-        enriched.append(Ticket(**t))
 
-    return enriched
+# Display fields only; marks follow from the called numbers
+ALL_TICKETS_PROJECTION = {
+    "_id": 0, "id": 1, "ticket_number": 1, "user_id": 1, "user_name": 1,
+    "grid": 1, "numbers": 1, "packed": 1, "schema_version": 1,
+}
+
+
+@api_router.get("/rooms/{room_id}/all-tickets")
+async def get_all_tickets(
+    room_id: str,
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=500),
+    encoding: str = "json",
+    current_user: dict = Depends(get_current_user)
+):
+    """Every ticket in a room, one page at a time, for display screens"""
+    room = await db.rooms.find_one(
+        {"id": room_id}, {"_id": 0, "host_id": 1, "players": 1, "ticket_version": 1}
+    )
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    user_id = current_user["id"]
+    if room["host_id"] != user_id and user_id not in [p.get("id") for p in room.get("players", [])]:
+        if not await db.tickets.find_one({"room_id": room_id, "user_id": user_id}, {"_id": 1}):
+            raise HTTPException(status_code=403, detail="Not a player in this room")
+    
+    # A page only changes when tickets are added; rooms created before
+    # ticket_version existed are served uncached
+    version = room.get("ticket_version")
+    etag = f'W/"{version}-{page}-{page_size}-{encoding}"' if version is not None else None
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"} if etag else {}
+    if etag and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    tickets = await db.tickets.find(
+        {"room_id": room_id}, ALL_TICKETS_PROJECTION
+    ).sort("ticket_number", 1).skip((page - 1) * page_size).limit(page_size + 1).to_list(page_size + 1)
+    has_more = len(tickets) > page_size
+    tickets = tickets[:page_size]
+    
+    if encoding == PACKED_ENCODING:
+        payload = pack_tickets(tickets, binary=False)
+    else:
+        payload = [
+            {
+                "id": t.get("id"),
+                "ticket_number": t.get("ticket_number"),
+                "user_id": t.get("user_id"),
+                "user_name": t.get("user_name"),
+                "grid": t["grid"],
+                "numbers": t["numbers"],
+            }
+            for t in map(normalized, tickets)
+        ]
+    
+    return FastJSONResponse({
+        "room_id": room_id,
+        "ticket_version": version,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more,
+        "tickets": payload
+    }, headers=headers)
 
 
 @api_router.put("/rooms/{room_id}/admin-ticket", response_model=MessageResponse)
@@ -545,6 +488,7 @@ async def join_room(
             "$inc": {"current_players": 1}
         }
     )
+    lobby_cache.update(room_id, inc={"current_players": 1})
     
     # Broadcast player joined
     await sio.emit('player_joined', {
@@ -562,74 +506,16 @@ async def buy_tickets(
     current_user: dict = Depends(get_current_user)
 ):
     """Purchase tickets for a room"""
-    room = await db.rooms.find_one({"id": purchase.room_id})
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    if room["status"] != RoomStatus.WAITING:
-        raise HTTPException(status_code=400, detail="Cannot buy tickets after game starts")
-    
-    # Calculate total cost
-    total_cost = room["ticket_price"] * purchase.quantity
-    
-    # Check wallet balance
-    if current_user["wallet_balance"] < total_cost:
-        raise HTTPException(status_code=400, detail="Insufficient wallet balance")
-    
-    # Generate tickets
-    tickets = []
-    current_ticket_count = await db.tickets.count_documents({"room_id": purchase.room_id})
-    
-    for i in range(purchase.quantity):
-        ticket_number = current_ticket_count + i + 1
-        ticket_data = generate_tambola_ticket(ticket_number)
-        
-        ticket = Ticket(
-            ticket_number=ticket_number,
-            user_id=current_user["id"],
-            user_name=current_user["name"],
-            room_id=purchase.room_id,
-            grid=ticket_data["grid"],
-            numbers=ticket_data["numbers"]
-        )
-        tickets.append(ticket.dict())
-    
-    # Insert tickets
-    await db.tickets.insert_many(tickets)
-    
-    # Deduct from wallet
-    new_balance = current_user["wallet_balance"] - total_cost
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"wallet_balance": new_balance}}
-    )
-    
-    # Create transaction
-    transaction = Transaction(
-        user_id=current_user["id"],
-        amount=total_cost,
-        type=TransactionType.DEBIT,
-        description=f"Purchased {purchase.quantity} ticket(s) for {room['name']}",
-        balance_after=new_balance,
-        room_id=purchase.room_id
-    )
-    await db.transactions.insert_one(transaction.dict())
-    
-    # Update room
-    await db.rooms.update_one(
-        {"id": purchase.room_id},
-        {
-            "$inc": {
-                "tickets_sold": purchase.quantity,
-                "prize_pool": total_cost * 0.8  # 80% goes to prize pool
-            }
-        }
+    tickets, new_balance = await purchase_tickets(
+        db, current_user, purchase.room_id, purchase.quantity, purchase.strips
     )
+    for ticket in tickets:
+        ticket_index.add_ticket(purchase.room_id, ticket)
     
-    logger.info(f"User {current_user['id']} bought {purchase.quantity} tickets for room {purchase.room_id}")
+    logger.info(f"User {current_user['id']} bought {len(tickets)} tickets for room {purchase.room_id}")
     
     return MessageResponse(
-        message=f"Successfully purchased {purchase.quantity} ticket(s)",
+        message=f"Successfully purchased {len(tickets)} ticket(s)",
         data={"tickets": tickets, "new_balance": new_balance}
     )
 
@@ -637,22 +523,30 @@ async def buy_tickets(
 @api_router.get("/tickets/my-tickets/{room_id}", response_model=List[Ticket])
 async def get_my_tickets(
     room_id: str,
+    encoding: str = "json",
     current_user: dict = Depends(get_current_user)
 ):
-    """Get user's tickets for a specific room"""
+    """Get user's tickets for a specific room (encoding=packed for the compact form)"""
     tickets = await db.tickets.find({
         "room_id": room_id,
         "user_id": current_user["id"]
     }).to_list(100)
     
-    return [Ticket(**ticket) for ticket in tickets]
+    if encoding == PACKED_ENCODING:
+        return FastJSONResponse(pack_tickets(tickets, binary=False))
+    # Tickets not yet migrated may lack the owner's name - it's the caller's
+    return [
+        Ticket(**{**normalized(t), "user_name": t.get("user_name") or current_user.get("name", "")})
+        for t in tickets
+    ]
 
 
 # ============= WALLET ROUTES =============
 @api_router.get("/wallet/balance")
 async def get_wallet_balance(current_user: dict = Depends(get_current_user)):
     """Get wallet balance"""
-    return {"balance": current_user.get("wallet_balance", 0.0)}
+    # Read fresh, not from the cached user
+    return {"balance": await wallet.get_balance(db, current_user["id"])}
 
 
 @api_router.post("/wallet/add-money", response_model=MessageResponse)
@@ -664,22 +558,15 @@ async def add_money(
     # TODO: Integrate with Razorpay or other payment gateway
     # For now, just add money directly (for testing)
     
-    new_balance = current_user.get("wallet_balance", 0.0) + wallet_data.amount
-    
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"wallet_balance": new_balance}}
-    )
-    
-    # Create transaction
-    transaction = Transaction(
-        user_id=current_user["id"],
-        amount=wallet_data.amount,
-        type=TransactionType.CREDIT,
-        description=f"Added money via {wallet_data.payment_method}",
-        balance_after=new_balance
+    key = None
+    if wallet_data.idempotency_key:
+        key = f"topup:{current_user['id']}:{wallet_data.idempotency_key}"
+    entry = await wallet.credit(
+        db, current_user["id"], wallet_data.amount,
+        f"Added money via {wallet_data.payment_method}",
+        key=key
     )
-    await db.transactions.insert_one(transaction.dict())
+    new_balance = entry["balance_after"]
     
     logger.info(f"User {current_user['id']} added ₹{wallet_data.amount} to wallet")
     
@@ -689,31 +576,48 @@ async def add_money(
     )
 
 
-@api_router.get("/wallet/transactions", response_model=List[Transaction])
+@api_router.get("/wallet/transactions")
 async def get_transactions(
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=HISTORY_MAX_PAGE),
+    before: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get transaction history"""
-    transactions = await db.transactions.find({
-        "user_id": current_user["id"]
-    }).sort("created_at", -1).limit(limit).to_list(limit)
+    """Transaction history, newest first; pass next_before as `before` for the next page"""
+    transactions, next_before = await wallet.history(db, current_user["id"], limit, before)
     
-    return [Transaction(**txn) for txn in transactions]
+    return FastJSONResponse({
+        "transactions": transactions,
+        "has_more": next_before is not None,
+        "next_before": next_before
+    })
 
 
 # ============= GAME CONTROL ROUTES =============
+# Each runs on the room's owner worker (cluster.RoomRouter), so they take
+# and return plain data rather than request objects
+
+
+def _caller(current_user: dict) -> dict:
+    return {"id": current_user["id"], "name": current_user.get("name", "")}
+
+
 @api_router.post("/game/{room_id}/start", response_model=MessageResponse)
 async def start_game(
     room_id: str,
     current_user: dict = Depends(get_current_user)
 ):
     """Start the game (host only)"""
+    return MessageResponse(**await room_router.run(room_id, "api_start_game", room_id=room_id, user=_caller(current_user)))
+
+
+async def _start_game(room_id: str, user: dict) -> dict:
+    from socket_handlers import emit_room_event
+    
     room = await db.rooms.find_one({"id": room_id})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if room["host_id"] != current_user["id"]:
+    if room["host_id"] != user["id"]:
         raise HTTPException(status_code=403, detail="Only host can start the game")
     
     if room["status"] != RoomStatus.WAITING:
@@ -736,16 +640,21 @@ async def start_game(
             }
         }
     )
+    state = await room_states.get(db, room_id)
+    state.status = RoomStatus.ACTIVE.value
+    lobby_cache.update(room_id, set={"status": RoomStatus.ACTIVE.value, "started_at": datetime.utcnow()})
     
     # Broadcast via socket
-    await sio.emit('game_started', {
+    await emit_room_event(sio, state, 'game_started', {
         "room_id": room_id,
-        "started_at": datetime.utcnow().isoformat()
-    }, room=room_id)
+        "started_at": datetime.utcnow().isoformat(),
+        "ticket_version": room.get("ticket_version", 0),
+        "ticket_count": await db.tickets.count_documents({"room_id": room_id})
+    })
     
     logger.info(f"Game started in room {room_id}")
     
-    return MessageResponse(message="Game started successfully")
+    return {"message": "Game started successfully"}
 
 
 @api_router.post("/game/{room_id}/call-number", response_model=MessageResponse)
@@ -755,57 +664,37 @@ async def call_number_api(
     current_user: dict = Depends(get_current_user)
 ):
     """Call a number (host only)"""
-    room = await db.rooms.find_one({"id": room_id})
-    if not room:
+    return MessageResponse(**await room_router.run(
+        room_id, "api_call_number", room_id=room_id, user=_caller(current_user), number=call_data.number
+    ))
+
+
+async def _call_number(room_id: str, user: dict, number: Optional[int]) -> dict:
+    from socket_handlers import call_number_in_room
+    
+    state = await room_states.get(db, room_id)
+    if not state:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if room["host_id"] != current_user["id"]:
+    if state.host_id != user["id"]:
         raise HTTPException(status_code=403, detail="Only host can call numbers")
     
-    if room["status"] != RoomStatus.ACTIVE:
+    if state.status != RoomStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Game not active")
     
-    called_numbers = room.get("called_numbers", [])
-    
-    # Generate or validate number
-    if call_data.number is None:
-        # Auto-generate
-        available = [n for n in range(1, 91) if n not in called_numbers]
-        if not available:
-            raise HTTPException(status_code=400, detail="All numbers have been called")
-        number = random.choice(available)
-    else:
-        number = call_data.number
-        if number in called_numbers:
-            raise HTTPException(status_code=400, detail="Number already called")
-        if number < 1 or number > 90:
-            raise HTTPException(status_code=400, detail="Invalid number (must be 1-90)")
-    
-    # Update room
-    called_numbers.append(number)
-    await db.rooms.update_one(
-        {"id": room_id},
-        {
-            "$set": {
-                "current_number": number,
-                "called_numbers": called_numbers
-            }
-        }
-    )
-    
-    # Broadcast via socket
-    await sio.emit('number_called', {
-        "number": number,
-        "called_numbers": called_numbers,
-        "remaining": 90 - len(called_numbers)
-    }, room=room_id)
+    if number is None and state.remaining <= 0:
+        raise HTTPException(status_code=400, detail="All numbers have been called")
     
-    logger.info(f"Number {number} called in room {room_id}")
+    # Same path as the socket event: record, auto-mark and broadcast
+    try:
+        number = await call_number_in_room(sio, db, state, number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return MessageResponse(
-        message=f"Number {number} called",
-        data={"number": number, "remaining": 90 - len(called_numbers)}
-    )
+    return {
+        "message": f"Number {number} called",
+        "data": {"number": number, "seq": state.seq, "remaining": state.remaining}
+    }
 
 
 @api_router.post("/game/{room_id}/claim", response_model=MessageResponse)
@@ -815,101 +704,36 @@ async def claim_prize_api(
     current_user: dict = Depends(get_current_user)
 ):
     """Claim a prize with server-side validation"""
-    room = await db.rooms.find_one({"id": room_id})
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    if room["status"] != RoomStatus.ACTIVE:
-        raise HTTPException(status_code=400, detail="Game not active")
-    
-    # Get ticket
-    ticket = await db.tickets.find_one({"id": claim.ticket_id})
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    if ticket["user_id"] != current_user["id"]:
-        raise HTTPException(status_code=403, detail="Not your ticket")
-    
-    # Check if prize already claimed
-    existing_winner = await db.winners.find_one({
-        "room_id": room_id,
-        "prize_type": claim.prize_type
-    })
-    
-    prize_config = next((p for p in room["prizes"] if p["prize_type"] == claim.prize_type), None)
-    if not prize_config:
-        raise HTTPException(status_code=400, detail="Prize not configured")
-    
-    if existing_winner and not prize_config.get("multiple_winners", False):
-        raise HTTPException(status_code=400, detail="Prize already claimed")
-    
-    # Validate win
-    called_numbers = room.get("called_numbers", [])
-    is_valid = validate_win(ticket, called_numbers, claim.prize_type)
-    
-    if not is_valid:
-        raise HTTPException(status_code=400, detail="Invalid claim - winning condition not met")
-    
-    # Get prize amount
-    prize_amount = prize_config["amount"]
-    
-    # Create winner record
-    winner = Winner(
-        user_id=current_user["id"],
-        user_name=current_user["name"],
-        room_id=room_id,
-        ticket_id=claim.ticket_id,
-        ticket_number=ticket["ticket_number"],
-        prize_type=claim.prize_type,
-        amount=prize_amount,
-        verified=True,
-        verified_at=datetime.utcnow()
-    )
-    await db.winners.insert_one(winner.dict())
+    return MessageResponse(**await room_router.run(
+        room_id, "api_claim", room_id=room_id, user=_caller(current_user),
+        ticket_id=claim.ticket_id, prize_type=claim.prize_type.value
+    ))
+
+
+async def _claim(room_id: str, user: dict, ticket_id: str, prize_type: str) -> dict:
+    from socket_handlers import emit_room_event
     
-    # Credit wallet
-    new_balance = current_user.get("wallet_balance", 0.0) + prize_amount
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {
-            "$set": {"wallet_balance": new_balance},
-            "$inc": {
-                "total_wins": 1,
-                "total_winnings": prize_amount
-            }
-        }
-    )
+    state = await room_states.get(db, room_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Room not found")
     
-    # Create transaction
-    transaction = Transaction(
-        user_id=current_user["id"],
-        amount=prize_amount,
-        type=TransactionType.CREDIT,
-        description=f"Won {claim.prize_type.value} in {room['name']}",
-        balance_after=new_balance,
-        room_id=room_id,
-        ticket_id=claim.ticket_id
-    )
-    await db.transactions.insert_one(transaction.dict())
-    
-    # Update room winners
-    await db.rooms.update_one(
-        {"id": room_id},
-        {"$push": {"winners": winner.dict()}}
-    )
+    winner = await claim_prize(db, state, user, ticket_id, prize_type)
     
     # Broadcast via socket
-    await sio.emit('prize_won', {
+    await emit_room_event(sio, state, 'prize_won', {
         "winner": winner.dict(),
         "room_id": room_id
-    }, room=room_id)
-    
-    logger.info(f"User {current_user['id']} won {claim.prize_type} in room {room_id}")
+    })
     
-    return MessageResponse(
-        message=f"Congratulations! You won {claim.prize_type.value}",
-        data={"winner": winner.dict(), "new_balance": new_balance}
-    )
+    return {
+        "message": f"Congratulations! You won {winner.prize_type.value}",
+        "data": {"winner": winner.dict()}
+    }
+
+
+room_router.register("api_start_game", _start_game)
+room_router.register("api_call_number", _call_number)
+room_router.register("api_claim", _claim)
 
 
 @api_router.get("/game/{room_id}/winners", response_model=List[Winner])
@@ -933,110 +757,18 @@ async def get_my_tickets(
         tickets = await db.tickets.find({
             "room_id": room_id,
             "user_id": current_user["id"]
-        }).to_list(100)
+        }, TICKET_PROJECTION).to_list(100)
         
-        # Serialize tickets to remove ObjectId
-        serialized_tickets = [serialize_doc(t) for t in tickets]
-        
-        logger.info(f"Found {len(serialized_tickets)} tickets for user {current_user['id']} in room {room_id}")
+        logger.info(f"Found {len(tickets)} tickets for user {current_user['id']} in room {room_id}")
         
         # Return empty array if no tickets (not an error)
-        return serialized_tickets
+        return FastJSONResponse(tickets)
     except Exception as e:
         logger.error(f"Error fetching tickets: {e}")
         # Return empty array instead of error
         return []
 
 
-@api_router.post("/tickets/buy")
-async def buy_tickets(
-    room_id: str,
-    quantity: int,
-    current_user: dict = Depends(get_current_user)
-):
-    """Buy tickets for a room"""
-    try:
-        # Validate quantity
-        if quantity < 1 or quantity > 10:
-            raise HTTPException(status_code=400, detail="Quantity must be between 1 and 10")
-        
-        # Get room
-        room = await db.rooms.find_one({"id": room_id})
-        if not room:
-            raise HTTPException(status_code=404, detail="Room not found")
-        
-        # Check if room is still waiting
-        if room.get("status") != "waiting":
-            raise HTTPException(status_code=400, detail="Cannot buy tickets for a room that has started")
-        
-        # Calculate total cost
-        total_cost = room["ticket_price"] * quantity
-        
-        # Get user's wallet balance
-        wallet = await db.wallets.find_one({"user_id": current_user["id"]})
-        if not wallet:
-            raise HTTPException(status_code=400, detail="Wallet not found")
-        
-        balance = wallet.get("balance", 0)
-        if balance < total_cost:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient balance. Need ₹{total_cost}, have ₹{balance}"
-            )
-        
-        # Deduct from wallet
-        new_balance = balance - total_cost
-        await db.wallets.update_one(
-            {"user_id": current_user["id"]},
-            {"$set": {"balance": new_balance}}
-        )
-        
-        # Record transaction
-        transaction_id = str(uuid.uuid4())
-        await db.transactions.insert_one({
-            "id": transaction_id,
-            "user_id": current_user["id"],
-            "type": "debit",
-            "amount": total_cost,
-            "description": f"Bought {quantity} ticket(s) for room {room['name']}",
-            "created_at": datetime.utcnow()
-        })
-        
-        # Generate tickets
-        tickets_created = []
-        for i in range(quantity):
-            ticket_id = str(uuid.uuid4())
-            ticket_number = await db.tickets.count_documents({"room_id": room_id}) + 1
-            ticket_grid = generate_tambola_ticket(ticket_number)
-            
-            new_ticket = {
-                "id": ticket_id,
-                "room_id": room_id,
-                "user_id": current_user["id"],
-                "ticket_number": ticket_number,
-                "grid": ticket_grid,
-                "marked_numbers": [],
-                "created_at": datetime.utcnow()
-            }
-            
-            await db.tickets.insert_one(new_ticket)
-            tickets_created.append(serialize_doc(new_ticket))
-        
-        logger.info(f"User {current_user['id']} bought {quantity} tickets for room {room_id}")
-        
-        return {
-            "message": f"Successfully purchased {quantity} ticket(s)",
-            "tickets": tickets_created,
-            "new_balance": new_balance
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error buying tickets: {e}")
-        raise HTTPException(status_code=500, detail="Failed to purchase tickets")
-
-
 # Include router
 app.include_router(api_router)
 
@@ -0,0 +1,99 @@
+"""
+Prize settlement - ranks and payouts for a finished room
+
+Wins are recorded as they are claimed or auto-awarded (a winners
+document with paid=False, plus the room's winners list) but credited
+here, once the room completes. Ranks and payouts are computed in memory
+and written with a fixed number of bulk writes - users, ledger, winners,
+room - however many winners there are.
+
+Settling is idempotent: payouts are keyed per prize and ticket
+(wallet.prize_key) and the ledger skips keys it already holds, so a
+re-run after a crash, or end_game racing the last auto-called number,
+pays nothing twice. Rooms left completed but unpaid by a crash are
+settled again on startup (settle_pending).
+"""
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from serialization import NO_ID
+from win_engine import PRIZE_ORDER
+import wallet
+
+logger = logging.getLogger(__name__)
+
+_PRIZE_RANK = {prize_type: i for i, prize_type in enumerate(PRIZE_ORDER, 1)}
+
+
+def _prize_type(winner: dict) -> str:
+    return str(getattr(winner["prize_type"], "value", winner["prize_type"]))
+
+
+def rank_winners(winners: List[dict]) -> List[dict]:
+    """Winners sorted by prize order then claim time, with rank set from 1"""
+    ranked = sorted(winners, key=lambda w: (
+        _PRIZE_RANK.get(_prize_type(w), 999),
+        w.get("claimed_at") or datetime.utcnow()
+    ))
+    return [{**winner, "rank": rank} for rank, winner in enumerate(ranked, 1)]
+
+
+async def settle_room(db, room_id: str, room_name: Optional[str] = None) -> List[dict]:
+    """Rank a completed room's winners and pay every unpaid prize; returns the ranked winners"""
+    if room_name is None:
+        room = await db.rooms.find_one({"id": room_id}, {"_id": 0, "name": 1}) or {}
+        room_name = room.get("name", "")
+
+    winners = rank_winners(await db.winners.find({"room_id": room_id}, NO_ID).to_list(None))
+    if not winners:
+        await db.rooms.update_one({"id": room_id}, {"$set": {"settled_at": datetime.utcnow()}})
+        return []
+
+    # Only wins recorded for settlement; older ones were paid when claimed
+    unpaid = [w for w in winners if w.get("paid") is False]
+    applied = await wallet.credit_many(db, [
+        {
+            "user_id": w["user_id"],
+            "amount": w["amount"],
+            "description": f"Won {_prize_type(w)} in {room_name}",
+            "key": wallet.prize_key(room_id, _prize_type(w), w["ticket_id"]),
+            "room_id": room_id,
+            "ticket_id": w["ticket_id"],
+            "inc": {"total_wins": 1, "total_winnings": w["amount"]},
+        }
+        for w in unpaid
+    ])
+
+    now = datetime.utcnow()
+    operations = []
+    for w in winners:
+        update = {"rank": w["rank"]}
+        if w.get("paid") is False:
+            w["paid"] = True
+            w["paid_at"] = now
+            update.update(paid=True, paid_at=now)
+        operations.append(UpdateOne({"id": w["id"]}, {"$set": update}))
+    await db.winners.bulk_write(operations, ordered=False)
+    await db.rooms.update_one({"id": room_id}, {"$set": {"winners": winners, "settled_at": now}})
+
+    logger.info(f"Settled room {room_id}: {len(winners)} winners, {applied} payouts applied")
+    return winners
+
+
+async def settle_pending(db) -> int:
+    """Settle completed rooms that still have unpaid winners (after a crash)"""
+    room_ids = await db.winners.distinct("room_id", {"paid": False})
+    if not room_ids:
+        return 0
+
+    settled = 0
+    async for room in db.rooms.find({"id": {"$in": room_ids}, "status": "completed"}, {"_id": 0, "id": 1, "name": 1}):
+        try:
+            await settle_room(db, room["id"], room.get("name"))
+            settled += 1
+        except Exception as e:
+            logger.error(f"Settling room {room['id']} failed: {e}")
+    return settled
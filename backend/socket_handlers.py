@@ -2,83 +2,240 @@
 Socket.IO Event Handlers for Real-time Gameplay
 """
 import socketio
-from typing import Dict, Any
+from typing import Dict, List, Optional
 import logging
 from datetime import datetime
-from bson import ObjectId
-import uuid
+import random
+
+from fastapi import HTTPException
+
+from ticket_index import ticket_index, mark_number
+from ticket_generator import generate_tambola_ticket
+from ticket_codec import with_packed
+from serialization import NO_ID
+from lobby import lobby_cache, lobby_channels
+from sequences import ticket_numbers
+from cluster import presence, room_router
+from auto_caller import auto_caller, DEFAULT_AUTO_SPEED
+from room_state import room_states, RoomState
+from win_engine import compile_ticket, check_prize, PRIZE_ORDER
+from models import Ticket, Winner
+from settlement import settle_room
+import claims
 
 logger = logging.getLogger(__name__)
 
-# Store active connections
-active_connections: Dict[str, str] = {}  # sid -> user_id
-user_rooms: Dict[str, str] = {}  # user_id -> room_id
+# Connections (sid -> user) and user -> room live in the presence store,
+# shared across workers in cluster mode
 
 
-def serialize_doc(doc: Any) -> Any:
-    """
-    Recursively convert MongoDB document to JSON-serializable format.
-    Converts ObjectId to string and handles nested structures.
-    """
-    if doc is None:
-        return None
-    
-    if isinstance(doc, ObjectId):
-        return str(doc)
-    
-    if isinstance(doc, dict):
-        return {key: serialize_doc(value) for key, value in doc.items()}
-    
-    if isinstance(doc, list):
-        return [serialize_doc(item) for item in doc]
-    
-    if isinstance(doc, datetime):
-        return doc.isoformat()
-    
-    return doc
+def user_room(user_id: str) -> str:
+    """Private Socket.IO room joined by every connection of a user"""
+    return f"user:{user_id}"
+
+
+async def emit_room_event(sio, state: RoomState, event: str, data: dict):
+    """Broadcast a game event to a room and buffer it for resuming clients"""
+    await sio.emit(event, state.record_event(event, data), room=state.room_id)
 
 
 async def handle_game_completion(sio, db, room_id):
     """Handle graceful game completion with winners and rankings"""
     try:
         # Update room status
-        await db.rooms.update_one(
+        room = await db.rooms.find_one_and_update(
             {"id": room_id},
-            {"$set": {"status": "completed", "completed_at": datetime.utcnow()}}
+            {"$set": {"status": "completed", "completed_at": datetime.utcnow()}},
+            projection={"_id": 0, "name": 1}
         )
+        lobby_cache.room_closed(room_id)
+        ticket_index.drop(room_id)
+        ticket_numbers.drop(room_id)
+        auto_caller.stop(room_id)
+        room_states.drop(room_id)
         
-        # Get winners and rankings
-        winners = await db.winners.find({"room_id": room_id}).to_list(1000)
-        prize_order = {
-            'early_five': 1,
-            'top_line': 2,
-            'middle_line': 3,
-            'bottom_line': 4,
-            'four_corners': 5,
-            'full_house': 6
-        }
-        sorted_winners = sorted(winners, key=lambda w: (
-            prize_order.get(w['prize_type'], 999),
-            w.get('claimed_at', datetime.utcnow())
-        ))
-        
-        serialized_winners = [serialize_doc(w) for w in sorted_winners]
+        # Rank the winners and pay every prize in one settlement pass
+        sorted_winners = await settle_room(db, room_id, (room or {}).get("name"))
         
         # Emit game_completed event (not game_ended)
         await sio.emit('game_completed', {
             'room_id': room_id,
-            'winners': serialized_winners,
+            'winners': sorted_winners,
             'completed_at': str(datetime.utcnow())
         }, room=room_id)
         
-        logger.info(f"Game completed in room {room_id} with {len(winners)} winners")
+        logger.info(f"Game completed in room {room_id} with {len(sorted_winners)} winners")
     except Exception as e:
         logger.error(f"Game completion error: {e}")
 
 
+async def award_auto_prizes(sio, db, state: RoomState, number: int) -> List[dict]:
+    """
+    Award every prize completed by `number` (rooms with auto_claim on).
+    Only tickets holding the new number can have completed anything, so
+    just those are checked. Prizes are awarded in PRIZE_ORDER; without
+    multiple_winners the lowest ticket number takes the prize.
+    """
+    room_id = state.room_id
+    prizes = {
+        str(getattr(p["prize_type"], "value", p["prize_type"])): p
+        for p in state.prizes if p.get("enabled", True)
+    }
+    pending = [pt for pt in PRIZE_ORDER if pt in prizes and pt not in state.claimed_prizes]
+    if not pending:
+        return []
+    
+    candidates = await ticket_index.tickets_for(db, room_id, number)
+    compiled = [(entry, compile_ticket(entry)) for entry in candidates]
+    
+    awarded = []
+    for prize_type in pending:
+        winners = [entry for entry, ticket in compiled if check_prize(ticket, state.called_mask, prize_type)]
+        if not winners:
+            continue
+        
+        prize_config = prizes[prize_type]
+        if not prize_config.get("multiple_winners", False):
+            winners = [min(winners, key=lambda e: e.get("ticket_number") or 0)]
+        
+        # Reserve the prize before any await so manual claims lose
+        state.claimed_prizes.add(prize_type)
+        awarded.extend(_auto_winner(state, entry, prize_type, prize_config["amount"]) for entry in winners)
+    
+    if not awarded:
+        return []
+    
+    # Tickets stored without their owner's name
+    nameless = list({w["user_id"] for w in awarded if not w["user_name"]})
+    if nameless:
+        names = {
+            u["id"]: u.get("name", "")
+            async for u in db.users.find({"id": {"$in": nameless}}, {"_id": 0, "id": 1, "name": 1})
+        }
+        for winner in awarded:
+            winner["user_name"] = winner["user_name"] or names.get(winner["user_id"], "")
+    
+    # Recorded now, paid at settlement when the game ends
+    await db.winners.insert_many([{**winner} for winner in awarded])
+    await db.rooms.update_one(
+        {"id": room_id},
+        {"$push": {"winners": {"$each": awarded}}}
+    )
+    
+    for winner in awarded:
+        await emit_room_event(sio, state, 'prize_won', {
+            'winner': winner,
+            'room_id': room_id
+        })
+        logger.info(f"Auto-awarded {winner['prize_type']} to {winner['user_id']} in room {room_id}")
+    
+    return awarded
+
+
+def _auto_winner(state: RoomState, entry: dict, prize_type: str, amount: float) -> dict:
+    """Winner record for one auto-awarded prize (owner name from the ticket index)"""
+    return Winner(
+        user_id=entry["user_id"],
+        user_name=entry.get("user_name") or "",
+        room_id=state.room_id,
+        ticket_id=entry["id"],
+        ticket_number=entry.get("ticket_number") or 0,
+        prize_type=prize_type,
+        amount=amount,
+        verified=True,
+        verified_at=datetime.utcnow()
+    ).dict()
+
+
+async def call_number_in_room(sio, db, state: RoomState, number: Optional[int] = None) -> Optional[int]:
+    """
+    Call a number in an active room: record it, auto-mark tickets and broadcast.
+    Shared by the host's call_number event and the server-side auto-caller.
+    Returns the number called, or None once every number is out.
+    """
+    room_id = state.room_id
+    
+    # Generate or validate number
+    if number is None:
+        # Auto-generate
+        available = [n for n in range(1, 91) if not state.is_called(n)]
+        if not available:
+            # GRACEFUL GAME COMPLETION - NO ERROR
+            # Calculate winners and end game
+            await handle_game_completion(sio, db, room_id)
+            return None
+        number = random.choice(available)
+    else:
+        # Validate
+        if number < 1 or number > 90:
+            raise ValueError('Invalid number')
+        if state.is_called(number):
+            raise ValueError('Number already called')
+    
+    # Update room in memory; persisted by the write-behind flusher
+    room_states.record_call(state, number)
+    
+    # AUTO-MARK ALL TICKETS IN THE ROOM
+    # One bulk update for every ticket holding the number
+    marked_tickets = await mark_number(db, room_id, number)
+    
+    # One coalesced message per owner instead of every ticket to everyone
+    marked_by_user: Dict[str, List[str]] = {}
+    for entry in marked_tickets:
+        marked_by_user.setdefault(entry['user_id'], []).append(entry['id'])
+    
+    for owner_id, ticket_ids in marked_by_user.items():
+        await sio.emit('tickets_marked', {
+            'room_id': room_id,
+            'number': number,
+            'ticket_ids': ticket_ids
+        }, room=user_room(owner_id))
+    
+    # Check if all numbers have been called
+    game_complete = state.remaining <= 0
+    
+    # Broadcast only the delta; clients that see a gap in seq ask for sync_state
+    await emit_room_event(sio, state, 'number_called', {
+        'seq': state.seq,
+        'number': number,
+        'game_complete': game_complete
+    })
+    
+    # Server-side winner detection replaces the claim race
+    if state.auto_claim:
+        await award_auto_prizes(sio, db, state, number)
+    
+    # If game complete, trigger end game
+    if game_complete:
+        await handle_game_completion(sio, db, room_id)
+    
+    logger.info(f"Number {number} called in room {room_id}")
+    return number
+
+
 async def register_socket_events(sio: socketio.AsyncServer, db):
     """Register all socket.io event handlers"""
     
+    def room_event(handler):
+        """
+        Register an event that works on live room state. It runs on the
+        room's owner worker (cluster.RoomRouter), which may not hold the
+        socket, so the handler is given the caller's user id.
+        """
+        name = handler.__name__
+        room_router.register(name, handler)
+        
+        async def event(sid, data):
+            data = data or {}
+            try:
+                await room_router.run(data.get('room_id'), name, sid=sid, user_id=presence.user_for(sid), data=data)
+            except Exception as e:
+                logger.error(f"{name} error: {e}")
+                await sio.emit('error', {'message': str(e)}, room=sid)
+        
+        sio.on(name, event)
+        return handler
+    
     @sio.event
     async def connect(sid, environ):
         """Client connected"""
@@ -91,9 +248,9 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         logger.info(f"Client disconnected: {sid}")
         
         # Remove from active connections
-        user_id = active_connections.pop(sid, None)
+        user_id = await presence.unbind(sid)
         if user_id:
-            room_id = user_rooms.pop(user_id, None)
+            room_id = await presence.pop_room(user_id)
             if room_id:
                 # Notify room that player left
                 await sio.emit('player_disconnected', {
@@ -106,7 +263,8 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         try:
             user_id = data.get('user_id')
             if user_id:
-                active_connections[sid] = user_id
+                await presence.bind(sid, user_id)
+                await sio.enter_room(sid, user_room(user_id))
                 await sio.emit('authenticated', {'success': True}, room=sid)
                 logger.info(f"User {user_id} authenticated on {sid}")
         except Exception as e:
@@ -128,22 +286,45 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         logger.info(f"Admin panel opened on sid={sid}")
     
     @sio.event
-    async def join_room(sid, data):
+    async def subscribe_lobby(sid, data):
+        """Receive lobby_update diffs for rooms matching the filters"""
+        data = data or {}
+        room_types = data.get('room_types') or ([data['room_type']] if data.get('room_type') else None)
+        price_bands = data.get('price_bands')
+        
+        # Resubscribing replaces the previous filters
+        for channel in lobby_channels():
+            await sio.leave_room(sid, channel)
+        channels = lobby_channels(room_types, price_bands)
+        for channel in channels:
+            await sio.enter_room(sid, channel)
+        
+        await sio.emit('lobby_subscribed', {'channels': channels}, room=sid)
+    
+    @sio.event
+    async def unsubscribe_lobby(sid, data=None):
+        """Stop receiving lobby_update diffs"""
+        for channel in lobby_channels():
+            await sio.leave_room(sid, channel)
+    
+    @room_event
+    async def join_room(sid, user_id, data):
         """Join a game room"""
         try:
             room_id = data.get('room_id')
-            user_id = active_connections.get(sid)
             
             if not user_id:
                 await sio.emit('error', {'message': 'Not authenticated'}, room=sid)
                 return
             
-            # Join socket.io room
+            # Join socket.io room; players in a game get no lobby traffic
             await sio.enter_room(sid, room_id)
-            user_rooms[user_id] = room_id
+            for channel in lobby_channels():
+                await sio.leave_room(sid, channel)
+            await presence.set_room(user_id, room_id)
             
             # Get room data
-            room = await db.rooms.find_one({"id": room_id})
+            room = await db.rooms.find_one({"id": room_id}, NO_ID)
             if room:
                 # AUTO GENERATE ONE FREE TICKET FOR PLAYER
                 # Check if player already has a ticket in this room
@@ -153,37 +334,34 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
                 })
                 
                 if not existing_ticket:
-                    # Generate ticket number based on existing tickets count
-                    ticket_count = await db.tickets.count_documents({"room_id": room_id})
-                    ticket_number = ticket_count + 1
-                    
-                    # Import generate function from server_multiplayer
-                    from server_multiplayer import generate_tambola_ticket
+                    # Unique per room without counting existing tickets
+                    ticket_number = (await ticket_numbers.allocate(db, room_id))[0]
                     
-                    # Generate ticket grid
-                    ticket_grid = generate_tambola_ticket(ticket_number)
-                    
-                    # Create ticket document
-                    ticket_id = str(uuid.uuid4())
-                    new_ticket = {
-                        "id": ticket_id,
-                        "room_id": room_id,
-                        "user_id": user_id,
-                        "ticket_number": ticket_number,
-                        "grid": ticket_grid,
-                        "marked_numbers": [],  # Empty array for marking
-                        "created_at": datetime.utcnow()
-                    }
+                    # Same document shape as purchased tickets
+                    ticket_data = generate_tambola_ticket(ticket_number)
+                    user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1}) or {}
+                    new_ticket = Ticket(
+                        ticket_number=ticket_number,
+                        user_id=user_id,
+                        user_name=user.get("name", ""),
+                        room_id=room_id,
+                        grid=ticket_data["grid"],
+                        numbers=ticket_data["numbers"]
+                    ).dict()
+                    ticket_id = new_ticket["id"]
                     
-                    await db.tickets.insert_one(new_ticket)
+                    await db.tickets.insert_one(with_packed(new_ticket))
+                    await db.rooms.update_one({"id": room_id}, {"$inc": {"ticket_version": 1}})
+                    ticket_index.add_ticket(room_id, new_ticket)
                     logger.info(f"Auto-generated ticket {ticket_id} for user {user_id} in room {room_id}")
                 
-                # Serialize room data to remove ObjectId
-                serialized_room = serialize_doc(room)
-                
+                # Position in the room's event stream, for a later resume
+                state = await room_states.get(db, room_id)
                 await sio.emit('room_joined', {
-                    'room': serialized_room,
-                    'user_id': user_id
+                    'room': room,
+                    'user_id': user_id,
+                    'event_seq': state.event_seq if state else 0,
+                    'epoch': state.epoch if state else None
                 }, room=sid)
                 
                 # Notify others
@@ -204,11 +382,11 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         """Leave a game room"""
         try:
             room_id = data.get('room_id')
-            user_id = active_connections.get(sid)
+            user_id = presence.user_for(sid)
             
             if room_id and user_id:
                 await sio.leave_room(sid, room_id)
-                user_rooms.pop(user_id, None)
+                await presence.pop_room(user_id)
                 
                 # Notify others
                 await sio.emit('player_left', {
@@ -221,221 +399,215 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         except Exception as e:
             logger.error(f"Leave room error: {e}")
     
-    @sio.event
-    async def call_number(sid, data):
+    @room_event
+    async def call_number(sid, user_id, data):
         """Call a number in the game"""
         try:
             room_id = data.get('room_id')
             number = data.get('number')
-            user_id = active_connections.get(sid)
             
             # Get room
-            room = await db.rooms.find_one({"id": room_id})
-            if not room:
+            state = await room_states.get(db, room_id)
+            if not state:
                 await sio.emit('error', {'message': 'Room not found'}, room=sid)
                 return
             
             # Check if user is host
-            if room['host_id'] != user_id:
+            if state.host_id != user_id:
                 await sio.emit('error', {'message': 'Only host can call numbers'}, room=sid)
                 return
             
-            # Generate or validate number
-            called_numbers = room.get('called_numbers', [])
-            
-            if number is None:
-                # Auto-generate
-                available = [n for n in range(1, 91) if n not in called_numbers]
-                if not available:
-                    # GRACEFUL GAME COMPLETION - NO ERROR
-                    # Calculate winners and end game
-                    await handle_game_completion(sio, db, room_id)
-                    return
-                import random
-                number = random.choice(available)
-            else:
-                # Validate
-                if number in called_numbers:
-                    await sio.emit('error', {'message': 'Number already called'}, room=sid)
-                    return
-                if number < 1 or number > 90:
-                    await sio.emit('error', {'message': 'Invalid number'}, room=sid)
-                    return
-            
-            # Update room
-            called_numbers.append(number)
-            await db.rooms.update_one(
-                {"id": room_id},
-                {
-                    "$set": {
-                        "current_number": number,
-                        "called_numbers": called_numbers
-                    }
-                }
-            )
+            await call_number_in_room(sio, db, state, number)
+        
+        except ValueError as e:
+            await sio.emit('error', {'message': str(e)}, room=sid)
+        except Exception as e:
+            logger.error(f"Call number error: {e}")
+            await sio.emit('error', {'message': str(e)}, room=sid)
+
+    
+    async def auto_call_tick(room_id):
+        """One auto-caller beat; False stops the room's caller"""
+        state = await room_states.get(db, room_id)
+        if not state or state.status != 'active':
+            return False
+        return await call_number_in_room(sio, db, state) is not None
+    
+    async def auto_call_stopped(room_id):
+        """The caller ended without a stop_auto_call (game over or repeated errors)"""
+        state = room_states.peek(room_id)
+        if state:
+            await emit_room_event(sio, state, 'auto_call_state', {
+                'room_id': room_id,
+                'running': False
+            })
+    
+    @room_event
+    async def sync_state(sid, user_id, data):
+        """Send a compact room snapshot to a client that missed number_called events"""
+        try:
+            room_id = data.get('room_id')
+            state = await room_states.get(db, room_id)
+            if not state:
+                await sio.emit('error', {'message': 'Room not found'}, room=sid)
+                return
             
-            # AUTO-MARK ALL TICKETS IN THE ROOM
-            # Get all tickets for this room
-            tickets = await db.tickets.find({"room_id": room_id}).to_list(1000)
+            await sio.emit('state_snapshot', state.snapshot(), room=sid)
+        
+        except Exception as e:
+            logger.error(f"Sync state error: {e}")
+            await sio.emit('error', {'message': str(e)}, room=sid)
+    
+    @sio.event
+    async def resume(sid, data):
+        """
+        Rejoin a room after a reconnect without re-reading Mongo: replay
+        the events missed since `last_seq`, or send a snapshot when they
+        have left the buffer (or the server reloaded the room).
+        """
+        data = data or {}
+        user_id = presence.user_for(sid)
+        
+        # Reconnected sockets may resume before re-authenticating
+        if not user_id and data.get('user_id'):
+            user_id = data['user_id']
+            await presence.bind(sid, user_id)
+            await sio.enter_room(sid, user_room(user_id))
+        if not user_id:
+            await sio.emit('error', {'message': 'Not authenticated'}, room=sid)
+            return
+        
+        try:
+            await room_router.run(data.get('room_id'), 'resume_room', sid=sid, user_id=user_id, data=data)
+        except Exception as e:
+            logger.error(f"Resume error: {e}")
+            await sio.emit('error', {'message': str(e)}, room=sid)
+    
+    async def resume_room(sid, user_id, data):
+        """The replay half of resume, on the room's owner"""
+        try:
+            room_id = data.get('room_id')
+            last_seq = data.get('last_seq') or 0
             
-            for ticket in tickets:
-                # Check if number exists in ticket grid
-                number_found = False
-                grid = ticket.get('grid', [])
-                
-                # Ensure grid is a list
-                if not isinstance(grid, list):
-                    logger.warning(f"Invalid grid format for ticket {ticket.get('id')}")
-                    continue
-                
-                for row in grid:
-                    # Ensure row is a list
-                    if not isinstance(row, list):
-                        continue
-                    
-                    # Check if number is in this row
-                    if number in row:
-                        number_found = True
-                        break
-                
-                if number_found:
-                    # Add number to marked_numbers if not already there
-                    marked = ticket.get('marked_numbers', [])
-                    
-                    # Ensure marked is a list
-                    if not isinstance(marked, list):
-                        marked = []
-                    
-                    if number not in marked:
-                        marked.append(number)
-                        
-                        # Update ticket in database
-                        await db.tickets.update_one(
-                            {"id": ticket['id']},
-                            {"$set": {"marked_numbers": marked}}
-                        )
-                        
-                        # Emit ticket_updated event to the specific user
-                        serialized_ticket = serialize_doc(ticket)
-                        serialized_ticket['marked_numbers'] = marked
-                        
-                        await sio.emit('ticket_updated', {
-                            'ticket': serialized_ticket,
-                            'number': number
-                        }, room=room_id)
-            
-            # Check if all numbers have been called
-            game_complete = len(called_numbers) >= 90
-            
-            # Broadcast to all players in room
-            await sio.emit('number_called', {
-                'number': number,
-                'called_numbers': called_numbers,
-                'remaining': 90 - len(called_numbers),
-                'game_complete': game_complete
-            }, room=room_id)
+            state = await room_states.get(db, room_id)
+            if not state:
+                await sio.emit('error', {'message': 'Room not found'}, room=sid)
+                return
             
-            # If game complete, trigger end game
-            if game_complete:
-                await handle_game_completion(sio, db, room_id)
+            await sio.enter_room(sid, room_id)
+            await presence.set_room(user_id, room_id)
+            
+            missed = state.events_since(last_seq) if data.get('epoch') == state.epoch else None
+            if missed is None:
+                await sio.emit('state_snapshot', state.snapshot(), room=sid)
+            else:
+                for event, payload in missed:
+                    await sio.emit(event, payload, room=sid)
             
-            logger.info(f"Number {number} called in room {room_id}")
+            await sio.emit('resumed', {
+                'room_id': room_id,
+                'event_seq': state.event_seq,
+                'epoch': state.epoch,
+                'replayed': None if missed is None else len(missed)
+            }, room=sid)
         
         except Exception as e:
-            logger.error(f"Call number error: {e}")
+            logger.error(f"Resume error: {e}")
             await sio.emit('error', {'message': str(e)}, room=sid)
-
     
-    @sio.event
-    async def claim_prize(sid, data):
-        """Claim a prize with validation"""
+    room_router.register('resume_room', resume_room)
+    
+    @room_event
+    async def start_auto_call(sid, user_id, data):
+        """Start server-side auto-calling (host only)"""
         try:
             room_id = data.get('room_id')
-            ticket_id = data.get('ticket_id')
-            prize_type = data.get('prize_type')
-            user_id = active_connections.get(sid)
-            
-            # Get ticket
-            ticket = await db.tickets.find_one({"id": ticket_id})
-            if not ticket:
-                await sio.emit('error', {'message': 'Ticket not found'}, room=sid)
+            
+            state = await room_states.get(db, room_id)
+            if not state:
+                await sio.emit('error', {'message': 'Room not found'}, room=sid)
+                return
+            
+            if state.host_id != user_id:
+                await sio.emit('error', {'message': 'Only host can auto-call numbers'}, room=sid)
+                return
+            
+            if state.status != 'active':
+                await sio.emit('error', {'message': 'Game not active'}, room=sid)
                 return
             
-            # Check if prize already claimed
-            existing_winner = await db.winners.find_one({
-                "room_id": room_id,
-                "prize_type": prize_type
+            auto_speed = data.get('auto_speed') or state.auto_speed or DEFAULT_AUTO_SPEED
+            auto_caller.start(
+                room_id,
+                auto_call_tick,
+                auto_speed=float(auto_speed),
+                paused=state.is_paused,
+                on_stop=auto_call_stopped
+            )
+            
+            await emit_room_event(sio, state, 'auto_call_state', {
+                'room_id': room_id,
+                'running': True,
+                'auto_speed': auto_caller.speed(room_id)
             })
+        
+        except Exception as e:
+            logger.error(f"Start auto call error: {e}")
+            await sio.emit('error', {'message': str(e)}, room=sid)
+    
+    @room_event
+    async def stop_auto_call(sid, user_id, data):
+        """Stop server-side auto-calling (host only)"""
+        try:
+            room_id = data.get('room_id')
             
-            if existing_winner:
-                await sio.emit('error', {'message': f'{prize_type} already claimed'}, room=sid)
+            state = await room_states.get(db, room_id)
+            if not state:
                 return
             
-            # Validate win based on prize type
-            grid = ticket.get('grid', [])
-            marked = ticket.get('marked_numbers', [])
-            is_valid = False
-            
-            if prize_type == 'early_five':
-                # First 5 numbers marked
-                marked_count = len(marked)
-                is_valid = marked_count >= 5
-            
-            elif prize_type == 'top_line':
-                # All numbers in top row marked
-                top_row = [n for n in grid[0] if n is not None]
-                is_valid = all(n in marked for n in top_row)
-            
-            elif prize_type == 'middle_line':
-                # All numbers in middle row marked
-                middle_row = [n for n in grid[1] if n is not None]
-                is_valid = all(n in marked for n in middle_row)
-            
-            elif prize_type == 'bottom_line':
-                # All numbers in bottom row marked
-                bottom_row = [n for n in grid[2] if n is not None]
-                is_valid = all(n in marked for n in bottom_row)
-            
-            elif prize_type == 'four_corners':
-                # Four corners marked
-                corners = []
-                for row_idx in [0, 2]:  # Top and bottom rows
-                    row = grid[row_idx]
-                    # Find first and last non-None numbers
-                    non_none = [n for n in row if n is not None]
-                    if len(non_none) >= 2:
-                        corners.append(non_none[0])
-                        corners.append(non_none[-1])
-                is_valid = len(corners) == 4 and all(c in marked for c in corners)
-            
-            elif prize_type == 'full_house':
-                # All numbers in ticket marked
-                all_numbers = [n for row in grid for n in row if n is not None]
-                is_valid = all(n in marked for n in all_numbers)
-            
-            if not is_valid:
-                await sio.emit('error', {'message': 'Invalid claim - pattern not complete'}, room=sid)
+            if state.host_id != user_id:
+                await sio.emit('error', {'message': 'Only host can stop auto-call'}, room=sid)
                 return
             
-            # Save winner
-            winner_id = str(uuid.uuid4())
-            winner = {
-                "id": winner_id,
-                "room_id": room_id,
-                "user_id": user_id,
-                "ticket_id": ticket_id,
-                "prize_type": prize_type,
-                "claimed_at": datetime.utcnow()
-            }
+            auto_caller.stop(room_id)
             
-            await db.winners.insert_one(winner)
+            await emit_room_event(sio, state, 'auto_call_state', {
+                'room_id': room_id,
+                'running': False
+            })
+        
+        except Exception as e:
+            logger.error(f"Stop auto call error: {e}")
+            await sio.emit('error', {'message': str(e)}, room=sid)
+    
+    @room_event
+    async def claim_prize(sid, user_id, data):
+        """Claim a prize with validation (same checks as the REST claim)"""
+        try:
+            room_id = data.get('room_id')
+            if not user_id:
+                await sio.emit('error', {'message': 'Not authenticated'}, room=sid)
+                return
             
-            # Broadcast prize claimed
-            serialized_winner = serialize_doc(winner)
-            await sio.emit('prize_claimed', serialized_winner, room=room_id)
+            state = await room_states.get(db, room_id)
+            if not state:
+                await sio.emit('error', {'message': 'Room not found'}, room=sid)
+                return
+            
+            user = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1, "name": 1})
+            if not user:
+                await sio.emit('error', {'message': 'User not found'}, room=sid)
+                return
             
-            logger.info(f"Prize {prize_type} claimed by {user_id} in room {room_id}")
+            winner = await claims.claim_prize(db, state, user, data.get('ticket_id'), data.get('prize_type'))
+            
+            await emit_room_event(sio, state, 'prize_won', {
+                'winner': winner.dict(),
+                'room_id': room_id
+            })
         
+        except HTTPException as e:
+            await sio.emit('error', {'message': e.detail}, room=sid)
         except Exception as e:
             logger.error(f"Claim prize error: {e}")
             await sio.emit('error', {'message': str(e)}, room=sid)
@@ -446,7 +618,7 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         try:
             room_id = data.get('room_id')
             message = data.get('message')
-            user_id = active_connections.get(sid)
+            user_id = presence.user_for(sid)
             
             if not message or len(message) > 500:
                 return
@@ -467,20 +639,19 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
         except Exception as e:
             logger.error(f"Chat message error: {e}")
     
-    @sio.event
-    async def start_game(sid, data):
+    @room_event
+    async def start_game(sid, user_id, data):
         """Start the game"""
         try:
             room_id = data.get('room_id')
-            user_id = active_connections.get(sid)
             
             # Get room
-            room = await db.rooms.find_one({"id": room_id})
-            if not room:
+            state = await room_states.get(db, room_id)
+            if not state:
                 return
             
             # Check if user is host
-            if room['host_id'] != user_id:
+            if state.host_id != user_id:
                 await sio.emit('error', {'message': 'Only host can start game'}, room=sid)
                 return
             
@@ -501,55 +672,56 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
                     }
                 }
             )
+            state.status = 'active'
+            state.is_paused = False
+            lobby_cache.update(room_id, set={"status": "active", "started_at": datetime.utcnow()})
             
-            # Get all tickets for this room
-            tickets = await db.tickets.find({"room_id": room_id}).to_list(1000)
-            serialized_tickets = [serialize_doc(t) for t in tickets]
+            room = await db.rooms.find_one({"id": room_id}, {"_id": 0, "ticket_version": 1})
             
-            # Broadcast game started with tickets
-            await sio.emit('game_started', {
+            # Metadata only; players fetch their own tickets (or the
+            # paginated all-tickets view) when ticket_version changes
+            await emit_room_event(sio, state, 'game_started', {
                 'room_id': room_id,
                 'started_at': str(datetime.utcnow()),
-                'tickets': serialized_tickets
-            }, room=room_id)
+                'ticket_version': (room or {}).get('ticket_version', 0),
+                'ticket_count': tickets_count
+            })
             
-            logger.info(f"Game started in room {room_id} with {len(tickets)} tickets")
+            logger.info(f"Game started in room {room_id} with {tickets_count} tickets")
         
         except Exception as e:
             logger.error(f"Start game error: {e}")
             await sio.emit('error', {'message': str(e)}, room=sid)
     
-    @sio.event
-    async def pause_game(sid, data):
+    @room_event
+    async def pause_game(sid, user_id, data):
         """Pause/Resume the game"""
         try:
             room_id = data.get('room_id')
-            user_id = active_connections.get(sid)
             
             # Get room
-            room = await db.rooms.find_one({"id": room_id})
-            if not room:
+            state = await room_states.get(db, room_id)
+            if not state:
                 return
             
             # Check if user is host
-            if room['host_id'] != user_id:
+            if state.host_id != user_id:
                 await sio.emit('error', {'message': 'Only host can pause game'}, room=sid)
                 return
             
             # Toggle pause state
-            is_paused = not room.get('is_paused', False)
+            is_paused = not state.is_paused
             
-            # Update room status
-            await db.rooms.update_one(
-                {"id": room_id},
-                {"$set": {"is_paused": is_paused}}
-            )
+            # Update room status (persisted by the write-behind flusher)
+            state.is_paused = is_paused
+            room_states.record_set(room_id, is_paused=is_paused)
+            auto_caller.set_paused(room_id, is_paused)
             
             # Broadcast pause state
-            await sio.emit('game_paused', {
+            await emit_room_event(sio, state, 'game_paused', {
                 'room_id': room_id,
                 'is_paused': is_paused
-            }, room=room_id)
+            })
             
             logger.info(f"Game {'paused' if is_paused else 'resumed'} in room {room_id}")
         
@@ -557,49 +729,22 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
             logger.error(f"Pause game error: {e}")
             await sio.emit('error', {'message': str(e)}, room=sid)
     
-    @sio.event
-    async def end_game(sid, data):
+    @room_event
+    async def end_game(sid, user_id, data):
         """End the game and calculate rankings"""
         try:
             room_id = data.get('room_id')
-            user_id = active_connections.get(sid)
             
             # Get room
-            room = await db.rooms.find_one({"id": room_id})
-            if not room:
+            state = await room_states.get(db, room_id)
+            if not state:
                 return
             
             # Check if user is host
-            if room['host_id'] != user_id:
+            if state.host_id != user_id:
                 await sio.emit('error', {'message': 'Only host can end game'}, room=sid)
                 return
             
-            # Get all winners
-            winners = await db.winners.find({"room_id": room_id}).to_list(1000)
-            
-            # Calculate rankings based on prize types and claim time
-            prize_order = {
-                'early_five': 1,
-                'top_line': 2,
-                'middle_line': 3,
-                'bottom_line': 4,
-                'four_corners': 5,
-                'full_house': 6
-            }
-            
-            # Sort winners by prize order and claim time
-            sorted_winners = sorted(winners, key=lambda w: (
-                prize_order.get(w['prize_type'], 999),
-                w['claimed_at']
-            ))
-            
-            # Add rank to winners
-            for idx, winner in enumerate(sorted_winners):
-                await db.winners.update_one(
-                    {"id": winner['id']},
-                    {"$set": {"rank": idx + 1}}
-                )
-            
             # Update room status
             await db.rooms.update_one(
                 {"id": room_id},
@@ -610,14 +755,19 @@ async def register_socket_events(sio: socketio.AsyncServer, db):
                     }
                 }
             )
+            lobby_cache.room_closed(room_id)
+            ticket_index.drop(room_id)
+            ticket_numbers.drop(room_id)
+            auto_caller.stop(room_id)
+            room_states.drop(room_id)
             
-            # Serialize winners
-            serialized_winners = [serialize_doc(w) for w in sorted_winners]
+            # Rank the winners and pay every prize in one settlement pass
+            sorted_winners = await settle_room(db, room_id, state.name)
             
             # Broadcast game ended with rankings
             await sio.emit('game_ended', {
                 'room_id': room_id,
-                'winners': serialized_winners,
+                'winners': sorted_winners,
                 'completed_at': str(datetime.utcnow())
             }, room=room_id)
             
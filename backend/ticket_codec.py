@@ -0,0 +1,160 @@
+"""
+Compact binary ticket encoding for storage and the wire
+
+A ticket grid packs into a 4-byte layout mask (bit r*9+c set when the
+cell holds a number) followed by one byte per number in row-major order:
+19 bytes for a standard 15-number ticket, against a few hundred bytes of
+nested JSON. The mask says how many number bytes follow, so packed grids
+can be concatenated and read back without a length prefix.
+
+Marked numbers use a 12-byte bitmask (bit n = number n), the same bit
+order as the called_mask in state snapshots.
+"""
+import base64
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from ticket_index import ticket_grid
+
+ROWS = 3
+COLUMNS = 9
+MASK_SIZE = 4
+MARKED_SIZE = 12
+PACKED_TICKET_SIZE = MASK_SIZE + 15
+
+# Payload encoding names accepted from clients
+JSON_ENCODING = "json"
+PACKED_ENCODING = "packed"
+PACKED_VERSION = "packed-v1"
+
+_MASK = struct.Struct("<I")
+
+# Ticket fields sent as JSON; the packed grid only duplicates `grid`
+TICKET_PROJECTION = {"_id": 0, "packed": 0}
+
+
+# ============= GRIDS =============
+def pack_grid(grid: List[List[Optional[int]]]) -> bytes:
+    """Pack a 3x9 grid into mask + numbers"""
+    mask = 0
+    numbers = bytearray()
+    for r, row in enumerate(grid[:ROWS]):
+        for c, value in enumerate(row[:COLUMNS]):
+            if value:
+                mask |= 1 << (r * COLUMNS + c)
+                numbers.append(value)
+    return _MASK.pack(mask) + bytes(numbers)
+
+
+def unpack_grid_at(data: bytes, offset: int = 0) -> Tuple[List[List[Optional[int]]], int]:
+    """Decode one packed grid starting at `offset`; returns (grid, next offset)"""
+    mask, = _MASK.unpack_from(data, offset)
+    offset += MASK_SIZE
+    grid = []
+    for r in range(ROWS):
+        row = []
+        for c in range(COLUMNS):
+            if mask >> (r * COLUMNS + c) & 1:
+                row.append(data[offset])
+                offset += 1
+            else:
+                row.append(None)
+        grid.append(row)
+    return grid, offset
+
+
+def unpack_grid(data: bytes) -> List[List[Optional[int]]]:
+    return unpack_grid_at(bytes(data))[0]
+
+
+def unpack_numbers(data: bytes) -> List[int]:
+    """Numbers on a packed grid, sorted, without rebuilding the grid"""
+    return sorted(bytes(data)[MASK_SIZE:])
+
+
+def ticket_packed(ticket: dict) -> bytes:
+    """The stored packed grid if the ticket has one, else pack it now"""
+    packed = ticket.get("packed")
+    if packed:
+        return bytes(packed)
+    return pack_grid(ticket_grid(ticket))
+
+
+def with_packed(ticket: dict) -> dict:
+    """Copy of a ticket document with its packed grid, ready to insert"""
+    return {**ticket, "packed": pack_grid(ticket_grid(ticket))}
+
+
+# ============= MARKED NUMBERS =============
+def pack_marked(numbers: Iterable[int]) -> bytes:
+    mask = 0
+    for n in numbers:
+        mask |= 1 << n
+    return mask.to_bytes(MARKED_SIZE, "little")
+
+
+def unpack_marked(data: bytes) -> List[int]:
+    mask = int.from_bytes(data, "little")
+    return [n for n in range(1, 91) if mask >> n & 1]
+
+
+# ============= TICKET SETS =============
+def pack_tickets(tickets: List[dict], binary: bool = True) -> dict:
+    """
+    Columnar payload for a list of tickets. Owners are listed once and
+    referenced by position. With binary=False the byte fields are base64
+    so the payload can go in a JSON response.
+    """
+    owners: Dict[str, int] = {}
+    users = []
+    grids = bytearray()
+    marked = bytearray()
+    for ticket in tickets:
+        user_id = ticket.get("user_id")
+        if user_id not in owners:
+            owners[user_id] = len(users)
+            users.append({"id": user_id, "name": ticket.get("user_name")})
+        grids += ticket_packed(ticket)
+        marked += pack_marked(ticket.get("marked_numbers") or ())
+
+    grids, marked = bytes(grids), bytes(marked)
+    if not binary:
+        grids, marked = base64.b64encode(grids).decode(), base64.b64encode(marked).decode()
+
+    return {
+        "encoding": PACKED_VERSION,
+        "count": len(tickets),
+        "ids": [t.get("id") for t in tickets],
+        "ticket_numbers": [t.get("ticket_number") for t in tickets],
+        "users": users,
+        "owners": [owners[t.get("user_id")] for t in tickets],
+        "grids": grids,
+        "marked": marked,
+    }
+
+
+def unpack_tickets(payload: dict) -> List[dict]:
+    """Inverse of pack_tickets (accepts raw or base64 byte fields)"""
+    grids = _as_bytes(payload["grids"])
+    marked = _as_bytes(payload["marked"])
+    users = payload["users"]
+
+    tickets = []
+    offset = 0
+    for i in range(payload["count"]):
+        grid, offset = unpack_grid_at(grids, offset)
+        owner = users[payload["owners"][i]]
+        tickets.append({
+            "id": payload["ids"][i],
+            "ticket_number": payload["ticket_numbers"][i],
+            "user_id": owner["id"],
+            "user_name": owner["name"],
+            "grid": grid,
+            "numbers": sorted(n for row in grid for n in row if n),
+            "marked_numbers": unpack_marked(marked[i * MARKED_SIZE:(i + 1) * MARKED_SIZE]),
+        })
+    return tickets
+
+
+def _as_bytes(value: Union[bytes, str]) -> bytes:
+    return base64.b64decode(value) if isinstance(value, str) else bytes(value)
@@ -0,0 +1,230 @@
+"""
+Vectorized Tambola ticket generation
+
+Every valid row/column layout (5 numbers per row, 1-3 per column) is
+enumerated once. A batch of tickets is then one random layout pick plus
+one random draw per column, done for all tickets at once with NumPy.
+Valid by construction: 15 numbers, 5 per row, every column used and
+sorted top to bottom.
+
+Strips are 6 tickets that together hold 1-90 exactly once.
+"""
+from itertools import combinations
+from typing import List, Optional
+
+import numpy as np
+
+ROWS = 3
+COLUMNS = 9
+NUMBERS_PER_ROW = 5
+NUMBERS_PER_TICKET = ROWS * NUMBERS_PER_ROW
+STRIP_SIZE = 6
+
+# Column c holds COLUMN_START[c] .. COLUMN_START[c] + COLUMN_SIZE[c] - 1
+COLUMN_START = np.array([1, 10, 20, 30, 40, 50, 60, 70, 80])
+COLUMN_SIZE = np.array([9, 10, 10, 10, 10, 10, 10, 10, 11])
+
+# Random swaps applied to each strip's column-count matrix
+STRIP_SHUFFLE_ROUNDS = 200
+
+_layouts: Optional[np.ndarray] = None
+_layout_groups: Optional[tuple] = None
+_rng = np.random.default_rng()
+
+
+def _build_layouts() -> np.ndarray:
+    """All (3, 9) boolean layouts with 5 cells per row and no empty column"""
+    row_masks = np.array([
+        sum(1 << c for c in cols)
+        for cols in combinations(range(COLUMNS), NUMBERS_PER_ROW)
+    ], dtype=np.int32)
+
+    # Every combination of three row masks that covers all nine columns
+    a, b, c = np.meshgrid(row_masks, row_masks, row_masks, indexing="ij")
+    a, b, c = a.ravel(), b.ravel(), c.ravel()
+    keep = (a | b | c) == (1 << COLUMNS) - 1
+    masks = np.stack([a[keep], b[keep], c[keep]], axis=1)
+
+    bits = 1 << np.arange(COLUMNS, dtype=np.int32)
+    return (masks[:, :, None] & bits) != 0
+
+
+def get_layouts() -> np.ndarray:
+    """Precomputed layouts, built on first use"""
+    global _layouts
+    if _layouts is None:
+        _layouts = _build_layouts()
+    return _layouts
+
+
+def _layouts_by_counts() -> tuple:
+    """Layout indices grouped by their per-column counts (base-4 key)"""
+    global _layout_groups
+    if _layout_groups is None:
+        layouts = get_layouts()
+        keys = _count_keys(layouts.sum(axis=1))
+        order = np.argsort(keys, kind="stable")
+        unique, starts, sizes = np.unique(keys[order], return_index=True, return_counts=True)
+        _layout_groups = (order, unique, starts, sizes)
+    return _layout_groups
+
+
+def _count_keys(counts: np.ndarray) -> np.ndarray:
+    return (counts * 4 ** np.arange(COLUMNS)).sum(axis=-1)
+
+
+def _place(layout: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Fill (..., 3, 9) layouts with (..., 9, 3) column values sorted
+    ascending. The k-th filled cell of a column, top to bottom, gets the
+    column's k-th value. Blank cells are 0.
+    """
+    rank = np.cumsum(layout, axis=-2) - 1
+    placed = np.take_along_axis(values, np.swapaxes(np.clip(rank, 0, ROWS - 1), -1, -2), axis=-1)
+    return np.where(layout, np.swapaxes(placed, -1, -2), 0)
+
+
+def generate_ticket_grids(n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Return an (n, 3, 9) int array of tickets, 0 for blank cells"""
+    rng = rng or _rng
+    layouts = get_layouts()
+    layout = layouts[rng.integers(0, len(layouts), size=n)]  # (n, 3, 9)
+
+    # Three distinct random offsets per column: argsort of random keys,
+    # with keys past the column's size pushed to the end
+    width = int(COLUMN_SIZE.max())
+    keys = rng.random((n, COLUMNS, width))
+    keys[:, np.arange(width)[None, :] >= COLUMN_SIZE[:, None]] = 2.0
+    offsets = np.argsort(keys, axis=2)[:, :, :ROWS]
+    values = COLUMN_START[None, :, None] + offsets  # (n, 9, 3)
+
+    # Keep as many as the column needs, sorted ascending
+    counts = layout.sum(axis=1)  # (n, 9)
+    unused = np.arange(ROWS)[None, None, :] >= counts[:, :, None]
+    values = np.sort(np.where(unused, 1000, values), axis=2)
+    return _place(layout, values)
+
+
+def _base_strip_counts() -> np.ndarray:
+    """
+    One valid (6, 9) column-count matrix for a strip. Every entry is 1-3,
+    each ticket has 15 numbers and column c totals COLUMN_SIZE[c].
+    """
+    counts = np.ones((STRIP_SIZE, COLUMNS), dtype=np.int64)
+    extra = COLUMN_SIZE - STRIP_SIZE  # 3, 4 ... 4, 5 -> 36 in all
+    ticket = 0
+    for c in range(COLUMNS):
+        for _ in range(int(extra[c])):
+            counts[ticket % STRIP_SIZE, c] += 1
+            ticket += 1
+    return counts
+
+
+def generate_strip_grids(n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Return an (n, 6, 3, 9) int array of strips, 0 for blank cells"""
+    rng = rng or _rng
+    strips = np.arange(n)
+
+    # Randomise the count matrix with swaps that keep every row and column sum
+    counts = np.broadcast_to(_base_strip_counts(), (n, STRIP_SIZE, COLUMNS)).copy()
+    for _ in range(STRIP_SHUFFLE_ROUNDS):
+        t1, t2 = rng.integers(0, STRIP_SIZE, size=(2, n))
+        c1, c2 = rng.integers(0, COLUMNS, size=(2, n))
+        ok = (
+            (t1 != t2) & (c1 != c2)
+            & (counts[strips, t1, c1] > 1) & (counts[strips, t2, c2] > 1)
+            & (counts[strips, t1, c2] < ROWS) & (counts[strips, t2, c1] < ROWS)
+        )
+        s, a, b, x, y = strips[ok], t1[ok], t2[ok], c1[ok], c2[ok]
+        counts[s, a, x] -= 1
+        counts[s, a, y] += 1
+        counts[s, b, y] -= 1
+        counts[s, b, x] += 1
+
+    # A random layout with exactly those column counts for each ticket
+    order, unique, starts, sizes = _layouts_by_counts()
+    group = np.searchsorted(unique, _count_keys(counts))
+    pick = starts[group] + (rng.random(group.shape) * sizes[group]).astype(np.int64)
+    layout = get_layouts()[order[pick]]  # (n, 6, 3, 9)
+
+    # Deal each column's shuffled numbers out to the six tickets
+    width = int(COLUMN_SIZE.max())
+    keys = rng.random((n, COLUMNS, width))
+    keys[:, np.arange(width)[None, :] >= COLUMN_SIZE[:, None]] = 2.0
+    dealt = COLUMN_START[None, :, None] + np.argsort(keys, axis=2)  # (n, 9, 11)
+
+    first = np.cumsum(counts, axis=1) - counts  # first dealt position per ticket
+    slot = np.arange(ROWS)
+    position = np.minimum(first[..., None] + slot, width - 1)  # (n, 6, 9, 3)
+    values = np.take_along_axis(dealt[:, None], position, axis=3)
+    unused = slot >= counts[..., None]
+    values = np.sort(np.where(unused, 1000, values), axis=3)
+    return _place(layout, values)
+
+
+def _grid_to_ticket(grid: List[List[int]], ticket_number: int) -> dict:
+    return {
+        "ticket_number": ticket_number,
+        "grid": [[v or None for v in row] for row in grid],
+        "numbers": sorted(v for row in grid for v in row if v),
+    }
+
+
+def generate_tickets(n: int, start_number: int = 1, rng: Optional[np.random.Generator] = None) -> List[dict]:
+    """
+    Generate `n` tickets numbered from `start_number`, in the same
+    {"ticket_number", "grid", "numbers"} shape the handlers store.
+    """
+    if n <= 0:
+        return []
+    grids = generate_ticket_grids(n, rng)
+
+    return [_grid_to_ticket(grid, start_number + i) for i, grid in enumerate(grids.tolist())]
+
+
+def generate_strips(n: int, start_number: int = 1, rng: Optional[np.random.Generator] = None) -> List[List[dict]]:
+    """
+    Generate `n` strips of 6 tickets, numbered consecutively from
+    `start_number`. Each strip covers 1-90 exactly once.
+    """
+    if n <= 0:
+        return []
+    grids = generate_strip_grids(n, rng).tolist()
+
+    return [
+        [_grid_to_ticket(grid, start_number + s * STRIP_SIZE + t) for t, grid in enumerate(strip)]
+        for s, strip in enumerate(grids)
+    ]
+
+
+def generate_tambola_ticket(ticket_number: int) -> dict:
+    """Generate a single ticket"""
+    return generate_tickets(1, ticket_number)[0]
+
+
+def validate_strip(grids: List[List[List[Optional[int]]]]) -> bool:
+    """Check six grids form a strip: valid tickets covering 1-90 once"""
+    if len(grids) != STRIP_SIZE or not all(validate_ticket(g) for g in grids):
+        return False
+    numbers = sorted(v for g in grids for row in g for v in row if v is not None)
+    return numbers == list(range(1, 91))
+
+
+def validate_ticket(grid: List[List[Optional[int]]]) -> bool:
+    """Check a grid against the Tambola rules"""
+    if len(grid) != ROWS or any(len(row) != COLUMNS for row in grid):
+        return False
+    if any(sum(v is not None for v in row) != NUMBERS_PER_ROW for row in grid):
+        return False
+
+    for c in range(COLUMNS):
+        column = [grid[r][c] for r in range(ROWS) if grid[r][c] is not None]
+        if not column:
+            return False
+        low, high = int(COLUMN_START[c]), int(COLUMN_START[c] + COLUMN_SIZE[c] - 1)
+        if any(not low <= v <= high for v in column):
+            return False
+        # Strictly increasing also rules out duplicates
+        if any(a >= b for a, b in zip(column, column[1:])):
+            return False
+    return True
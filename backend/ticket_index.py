@@ -0,0 +1,187 @@
+"""
+Per-room number -> ticket inverted index used for bulk auto-marking
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from ticket_schema import TICKET_SCHEMA_VERSION, normalized
+
+logger = logging.getLogger(__name__)
+
+# Only the fields needed to build the index are pulled from Mongo
+TICKET_INDEX_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "user_id": 1,
+    "user_name": 1,
+    "ticket_number": 1,
+    "strip_id": 1,
+    "strip_index": 1,
+    "grid": 1,
+    "numbers": 1,
+    "marked_numbers": 1,
+    "schema_version": 1,
+}
+
+
+def ticket_grid(ticket: dict) -> List[List[Optional[int]]]:
+    """Return a ticket's 3x9 grid regardless of its schema version"""
+    return normalized(ticket)["grid"]
+
+
+def numbers_on_ticket(ticket: dict) -> List[int]:
+    """Return the numbers on a ticket regardless of its schema version"""
+    return normalized(ticket)["numbers"]
+
+
+class _StripSlots:
+    """
+    One strip of six tickets. Every number 1-90 is on exactly one of
+    them, so a 91-byte table (number -> ticket slot) replaces the strip's
+    90 entries in the per-number lists.
+    """
+    __slots__ = ("slots", "entries")
+
+    def __init__(self):
+        self.slots = bytearray(b"\xff" * 91)
+        self.entries: List[Optional[dict]] = [None] * 6
+
+    def add(self, position: int, entry: dict):
+        self.entries[position] = entry
+        for number in entry["numbers"]:
+            self.slots[number] = position
+
+    def ticket_for(self, number: int) -> Optional[dict]:
+        position = self.slots[number]
+        return self.entries[position] if position < len(self.entries) else None
+
+
+class _RoomIndex:
+    """Index for one room: loose tickets by number plus compact strips"""
+    __slots__ = ("by_number", "strips")
+
+    def __init__(self):
+        self.by_number: Dict[int, List[dict]] = {}
+        self.strips: Dict[str, _StripSlots] = {}
+
+    def add(self, ticket: dict, entry: dict):
+        strip_id = ticket.get("strip_id")
+        if strip_id is not None:
+            strip = self.strips.get(strip_id)
+            if strip is None:
+                strip = self.strips[strip_id] = _StripSlots()
+            strip.add(ticket.get("strip_index", 0), entry)
+            return
+        for number in set(entry["numbers"]):
+            self.by_number.setdefault(number, []).append(entry)
+
+    def tickets_for(self, number: int) -> List[dict]:
+        tickets = self.by_number.get(number, [])
+        if not self.strips:
+            return tickets
+        tickets = list(tickets)
+        for strip in self.strips.values():
+            entry = strip.ticket_for(number)
+            if entry is not None:
+                tickets.append(entry)
+        return tickets
+
+
+class RoomTicketIndex:
+    """
+    In-memory map of number -> tickets containing it, kept per room.
+
+    The index is built lazily from Mongo the first time a number is called
+    in a room and is then kept in sync by `add_ticket`, so each call only
+    touches the tickets that actually contain the number.
+    """
+
+    def __init__(self):
+        self._rooms: Dict[str, _RoomIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def is_loaded(self, room_id: str) -> bool:
+        return room_id in self._rooms
+
+    async def load(self, db, room_id: str) -> _RoomIndex:
+        """Build (once) and return the index for a room"""
+        index = self._rooms.get(room_id)
+        if index is not None:
+            return index
+
+        lock = self._locks.setdefault(room_id, asyncio.Lock())
+        async with lock:
+            index = self._rooms.get(room_id)
+            if index is not None:
+                return index
+
+            index = _RoomIndex()
+            cursor = db.tickets.find({"room_id": room_id}, TICKET_INDEX_PROJECTION)
+            count = 0
+            async for ticket in cursor:
+                self._index_ticket(index, ticket)
+                count += 1
+
+            self._rooms[room_id] = index
+            logger.info(f"Built ticket index for room {room_id} ({count} tickets)")
+            return index
+
+    def _index_ticket(self, index: _RoomIndex, ticket: dict):
+        ticket = normalized(ticket)
+        # Enough of the ticket to validate wins without going back to Mongo;
+        # entries are current-schema tickets themselves
+        entry = {
+            "id": ticket["id"],
+            "user_id": ticket.get("user_id"),
+            "user_name": ticket.get("user_name"),
+            "ticket_number": ticket.get("ticket_number"),
+            "grid": ticket["grid"],
+            "numbers": ticket["numbers"],
+            "marked_numbers": list(ticket.get("marked_numbers") or []),
+            "schema_version": TICKET_SCHEMA_VERSION,
+        }
+        index.add(ticket, entry)
+
+    def add_ticket(self, room_id: str, ticket: dict):
+        """Register a newly created ticket with an already-built room index"""
+        index = self._rooms.get(room_id)
+        if index is not None:
+            self._index_ticket(index, ticket)
+
+    async def tickets_for(self, db, room_id: str, number: int) -> List[dict]:
+        """Return index entries for every ticket in the room holding `number`"""
+        index = await self.load(db, room_id)
+        return index.tickets_for(number)
+
+    def drop(self, room_id: str):
+        """Forget a room (game over)"""
+        self._rooms.pop(room_id, None)
+        self._locks.pop(room_id, None)
+
+
+# Shared process-wide index
+ticket_index = RoomTicketIndex()
+
+
+async def mark_number(db, room_id: str, number: int) -> List[dict]:
+    """
+    Mark `number` on every ticket in the room that contains it.
+
+    Uses one `update_many` for the whole room instead of one write per
+    ticket. Returns the index entries of the tickets that were newly marked.
+    """
+    entries = await ticket_index.tickets_for(db, room_id, number)
+    newly_marked = [e for e in entries if number not in e["marked_numbers"]]
+    if not newly_marked:
+        return []
+
+    await db.tickets.update_many(
+        {"id": {"$in": [e["id"] for e in newly_marked]}},
+        {"$addToSet": {"marked_numbers": number}}
+    )
+
+    for entry in newly_marked:
+        entry["marked_numbers"].append(number)
+
+    return newly_marked
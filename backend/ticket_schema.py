@@ -0,0 +1,64 @@
+"""
+Ticket document schema versions
+
+1 (no schema_version field): what older code wrote. `grid` is either the
+  3x9 grid or, from the socket join path, the whole generator output
+  ({"ticket_number", "grid", "numbers"}); `numbers`, `user_name` and
+  `packed` may be missing.
+2: flat 3x9 `grid`, `numbers`, `user_name` and `packed` are always set.
+  Every creation path writes it (models.Ticket) and migrate_tickets.py
+  upgrades older documents in place.
+
+Readers go through normalized(): one version check, and a current
+ticket is returned as it is, so code built on it never inspects the
+grid's type. Older tickets are upgraded in memory until migrated.
+"""
+from typing import List, Optional
+
+TICKET_SCHEMA_VERSION = 2
+
+
+def legacy_grid(ticket: dict) -> List[List[Optional[int]]]:
+    """The 3x9 grid of a version 1 ticket, whichever way it was stored"""
+    grid = ticket.get("grid")
+    if isinstance(grid, dict):
+        grid = grid.get("grid")
+    return grid if isinstance(grid, list) else []
+
+
+def legacy_numbers(ticket: dict) -> List[int]:
+    """The numbers on a version 1 ticket, from the field, the nested dict or the grid"""
+    numbers = ticket.get("numbers")
+    grid = ticket.get("grid")
+    if isinstance(grid, dict):
+        numbers = numbers or grid.get("numbers")
+        grid = grid.get("grid")
+
+    if not numbers and isinstance(grid, list):
+        numbers = [
+            n for row in grid if isinstance(row, list)
+            for n in row if n is not None
+        ]
+
+    return list(numbers or [])
+
+
+def upgrade_ticket(ticket: dict) -> dict:
+    """
+    Copy of an older ticket with the version 2 grid and numbers. Fields
+    that need the database (user_name) or the codec (packed) are left to
+    migrate_tickets.py.
+    """
+    return {
+        **ticket,
+        "grid": legacy_grid(ticket),
+        "numbers": legacy_numbers(ticket),
+        "schema_version": TICKET_SCHEMA_VERSION,
+    }
+
+
+def normalized(ticket: dict) -> dict:
+    """The ticket in the current schema: itself if current, else upgraded in memory"""
+    if ticket.get("schema_version") == TICKET_SCHEMA_VERSION:
+        return ticket
+    return upgrade_ticket(ticket)
@@ -0,0 +1,365 @@
+"""
+Wallet - the one place balances change
+
+`users.wallet_balance` is the balance; the `transactions` collection is
+its append-only ledger. Every change is a single conditional `$inc` on
+the user document (debits only match while the balance covers them), so
+concurrent purchases and payouts never lose an update and never need a
+lock. Each applied change then appends one ledger entry with the balance
+it produced.
+
+Operations that may be retried (top-ups, prize payouts, the welcome
+bonus) carry an idempotency key. The key is recorded on the user
+document by the same update that moves the money, so a retry - or a
+second worker racing the first - matches nothing and just gets the
+original entry back. The last WALLET_KEY_HISTORY keys are kept per user;
+the ledger itself keeps every key (unique index) and is checked first,
+so older keys are never applied twice either.
+
+A mistaken or undone change is never edited away: it is reversed by a
+new entry (see refund).
+
+    python wallet.py reconcile    # compare every balance with its ledger
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from auth import invalidate_user
+from models import Transaction, TransactionType
+
+logger = logging.getLogger(__name__)
+
+WELCOME_BONUS = 500.0
+WALLET_KEY_HISTORY = 100  # recent idempotency keys kept on each user
+WALLET_RECONCILE_INTERVAL = float(os.getenv("WALLET_RECONCILE_INTERVAL", "3600"))  # seconds, 0 = off
+
+# Balances are floats; anything closer than this is a match
+RECONCILE_TOLERANCE = 0.01
+
+HISTORY_MAX_PAGE = 100
+# Fields shown in the transaction list
+HISTORY_PROJECTION = {
+    "_id": 0, "id": 1, "amount": 1, "type": 1, "description": 1,
+    "balance_after": 1, "room_id": 1, "created_at": 1,
+}
+
+
+async def apply(
+    db,
+    user_id: str,
+    amount: float,
+    type: TransactionType,
+    description: str,
+    key: Optional[str] = None,
+    room_id: Optional[str] = None,
+    ticket_id: Optional[str] = None,
+    inc: Optional[Dict[str, float]] = None,
+    session=None,
+) -> dict:
+    """
+    Credit or debit a wallet and append the ledger entry. `inc` adds
+    other counters (total_wins, ...) in the same update. Returns the
+    ledger entry; with a key that was already applied, the original one.
+    Raises HTTPException on an unknown user or an insufficient balance.
+    """
+    if key:
+        entry = await db.transactions.find_one({"key": key}, {"_id": 0}, session=session)
+        if entry is not None:
+            return entry
+
+    delta = amount if type == TransactionType.CREDIT else -amount
+    query = {"id": user_id}
+    update = {"$inc": {"wallet_balance": delta, **(inc or {})}}
+    if type == TransactionType.DEBIT:
+        query["wallet_balance"] = {"$gte": amount}
+    if key:
+        query["wallet_keys"] = {"$ne": key}
+        update["$push"] = {"wallet_keys": {"$each": [key], "$slice": -WALLET_KEY_HISTORY}}
+
+    user = await db.users.find_one_and_update(
+        query, update,
+        projection={"_id": 0, "wallet_balance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if user is None:
+        return await _not_applied(db, user_id, amount, type, description, key, room_id, ticket_id, session)
+    invalidate_user(user_id)
+
+    entry = Transaction(
+        user_id=user_id,
+        amount=amount,
+        type=type,
+        description=description,
+        balance_after=user["wallet_balance"],
+        room_id=room_id,
+        ticket_id=ticket_id,
+        key=key
+    ).dict()
+    if key is None:
+        del entry["key"]  # only keyed entries go in the key_unique index
+    try:
+        await db.transactions.insert_one({**entry}, session=session)
+    except DuplicateKeyError:
+        # A key older than wallet_keys, replayed concurrently: undo our $inc
+        await db.users.update_one(
+            {"id": user_id},
+            {"$inc": {field: -value for field, value in update["$inc"].items()}},
+            session=session
+        )
+        invalidate_user(user_id)
+        logger.warning(f"Wallet op {key} for {user_id} was already in the ledger; reversed")
+        return await db.transactions.find_one({"key": key}, {"_id": 0}, session=session)
+    return entry
+
+
+async def _not_applied(db, user_id, amount, type, description, key, room_id, ticket_id, session) -> dict:
+    """Why the guarded update matched nothing: replayed key, no funds or no user"""
+    user = await db.users.find_one(
+        {"id": user_id}, {"_id": 0, "wallet_balance": 1, "wallet_keys": 1}, session=session
+    )
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if key and key in user.get("wallet_keys", []):
+        entry = await db.transactions.find_one({"key": key}, {"_id": 0}, session=session)
+        if entry is not None:
+            return entry
+        # Applied, but the process died before the ledger write - write it now
+        entry = Transaction(
+            user_id=user_id, amount=amount, type=type, description=description,
+            balance_after=user.get("wallet_balance", 0.0), room_id=room_id, ticket_id=ticket_id, key=key
+        ).dict()
+        try:
+            await db.transactions.insert_one({**entry}, session=session)
+        except DuplicateKeyError:
+            entry = await db.transactions.find_one({"key": key}, {"_id": 0}, session=session)
+        logger.warning(f"Wallet op {key} for {user_id} was missing from the ledger; recorded")
+        return entry
+
+    raise HTTPException(status_code=400, detail="Insufficient wallet balance")
+
+
+async def credit(db, user_id: str, amount: float, description: str, **kwargs) -> dict:
+    return await apply(db, user_id, amount, TransactionType.CREDIT, description, **kwargs)
+
+
+async def debit(db, user_id: str, amount: float, description: str, **kwargs) -> dict:
+    return await apply(db, user_id, amount, TransactionType.DEBIT, description, **kwargs)
+
+
+async def refund(db, entry: dict, description: str) -> dict:
+    """Reverse a debit with a compensating credit (safe to repeat)"""
+    return await credit(
+        db, entry["user_id"], entry["amount"], description,
+        key=f"refund:{entry['id']}", room_id=entry.get("room_id")
+    )
+
+
+async def credit_many(db, credits: List[dict]) -> int:
+    """
+    Apply many keyed credits at once (prize settlement): one guarded update
+    per credit, then one bulk write to the ledger. Each credit is a dict of
+    credit()'s arguments and must have a key. Credits whose key is already
+    in the ledger are skipped, so a re-run pays nothing twice. Returns how
+    many were applied now.
+    """
+    keys = [c["key"] for c in credits]
+    done = {e["key"] async for e in db.transactions.find({"key": {"$in": keys}}, {"_id": 0, "key": 1})}
+
+    entries = []
+    for c in credits:
+        if c["key"] in done:
+            continue
+        # Same guard as apply(): a key already on the user means it was paid
+        user = await db.users.find_one_and_update(
+            {"id": c["user_id"], "wallet_keys": {"$ne": c["key"]}},
+            {
+                "$inc": {"wallet_balance": c["amount"], **(c.get("inc") or {})},
+                "$push": {"wallet_keys": {"$each": [c["key"]], "$slice": -WALLET_KEY_HISTORY}},
+            },
+            projection={"_id": 0, "wallet_balance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user is None:
+            # Paid before the ledger write of an interrupted run (recorded
+            # now), or no such user
+            try:
+                await _not_applied(
+                    db, c["user_id"], c["amount"], TransactionType.CREDIT, c["description"],
+                    c["key"], c.get("room_id"), c.get("ticket_id"), None
+                )
+            except HTTPException as e:
+                logger.error(f"Credit {c['key']} for {c['user_id']} not applied: {e.detail}")
+            continue
+        invalidate_user(c["user_id"])
+
+        entries.append(Transaction(
+            user_id=c["user_id"],
+            amount=c["amount"],
+            type=TransactionType.CREDIT,
+            description=c["description"],
+            balance_after=user["wallet_balance"],
+            room_id=c.get("room_id"),
+            ticket_id=c.get("ticket_id"),
+            key=c["key"]
+        ).dict())
+
+    if entries:
+        await db.transactions.bulk_write([
+            UpdateOne({"key": entry["key"]}, {"$setOnInsert": entry}, upsert=True)
+            for entry in entries
+        ], ordered=False)
+    return len(entries)
+
+
+async def get_balance(db, user_id: str) -> float:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "wallet_balance": 1})
+    return (user or {}).get("wallet_balance", 0.0)
+
+
+# ============= HISTORY =============
+def history_cursor(entry: dict) -> str:
+    """Opaque-ish `before` value continuing after this entry"""
+    return f"{entry['created_at'].isoformat()},{entry['id']}"
+
+
+def parse_history_cursor(before: str) -> Tuple[datetime, str]:
+    created_at, _, entry_id = before.partition(",")
+    try:
+        return datetime.fromisoformat(created_at), entry_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def history(db, user_id: str, limit: int, before: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a user's ledger, newest first, and the cursor for the next
+    page (None on the last). Keyset paging on (created_at, id) walks the
+    user_id_created_at_id index, so every page costs the same.
+    """
+    query = {"user_id": user_id}
+    if before:
+        created_at, entry_id = parse_history_cursor(before)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": entry_id}},
+        ]
+
+    entries = await db.transactions.find(query, HISTORY_PROJECTION).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    if len(entries) > limit:
+        entries = entries[:limit]
+        return entries, history_cursor(entries[-1])
+    return entries, None
+
+
+def prize_key(room_id: str, prize_type: str, ticket_id: str) -> str:
+    """One payout per prize per ticket, however many paths try to pay it"""
+    return f"prize:{room_id}:{prize_type}:{ticket_id}"
+
+
+# ============= RECONCILIATION =============
+async def reconcile(db, user_ids: Optional[List[str]] = None) -> List[dict]:
+    """
+    Compare balances with their ledgers: credits minus debits per user.
+    Returns one {user_id, balance, ledger, difference} per mismatch.
+    """
+    match = {"user_id": {"$in": user_ids}} if user_ids is not None else {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$user_id",
+            "ledger": {"$sum": {"$cond": [
+                {"$eq": ["$type", TransactionType.CREDIT.value]}, "$amount", {"$multiply": ["$amount", -1]}
+            ]}},
+        }},
+    ]
+    ledgers = {row["_id"]: row["ledger"] async for row in db.transactions.aggregate(pipeline)}
+
+    mismatches = []
+    users = db.users.find(
+        {"id": {"$in": user_ids}} if user_ids is not None else {},
+        {"_id": 0, "id": 1, "wallet_balance": 1}
+    )
+    async for user in users:
+        balance = user.get("wallet_balance", 0.0)
+        ledger = ledgers.get(user["id"], 0.0)
+        if abs(balance - ledger) > RECONCILE_TOLERANCE:
+            mismatches.append({
+                "user_id": user["id"],
+                "balance": balance,
+                "ledger": ledger,
+                "difference": round(balance - ledger, 2),
+            })
+    return mismatches
+
+
+class WalletReconciler:
+    """Background job running reconcile() and logging every mismatch"""
+
+    def __init__(self, interval: float = WALLET_RECONCILE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self, db):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                mismatches = await reconcile(db)
+            except Exception as e:
+                logger.error(f"Wallet reconciliation failed: {e}")
+                continue
+            for m in mismatches:
+                logger.error(
+                    f"Wallet mismatch for {m['user_id']}: balance ₹{m['balance']} "
+                    f"ledger ₹{m['ledger']} ({m['difference']:+})"
+                )
+            logger.info(f"Wallet reconciliation done: {len(mismatches)} mismatch(es)")
+
+    def start(self, db):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+wallet_reconciler = WalletReconciler()
+
+
+async def main(command: str):
+    from database import client, db
+
+    try:
+        if command == "reconcile":
+            mismatches = await reconcile(db)
+            for m in mismatches:
+                print(f"{m['user_id']}: balance {m['balance']} ledger {m['ledger']} ({m['difference']:+})")
+            print(f"{len(mismatches)} mismatch(es)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Wallet ledger tools")
+    parser.add_argument("command", choices=["reconcile"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
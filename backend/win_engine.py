@@ -0,0 +1,110 @@
+"""
+Bitset win validation shared by the REST and socket claim paths
+
+A ticket is compiled once into 91-bit integer masks (bit n = number n):
+one for the whole ticket and one per prize pattern. A room's called
+numbers are kept as the same kind of mask, so every prize check is a
+single AND and compare.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from models import PrizeType
+from ticket_schema import normalized
+
+EARLY_FIVE_COUNT = 5
+
+# Plain-string prize keys (enum attribute access is slow in the hot path)
+EARLY_FIVE = PrizeType.EARLY_FIVE.value
+TOP_LINE = PrizeType.TOP_LINE.value
+MIDDLE_LINE = PrizeType.MIDDLE_LINE.value
+BOTTOM_LINE = PrizeType.BOTTOM_LINE.value
+FOUR_CORNERS = PrizeType.FOUR_CORNERS.value
+STAR = PrizeType.STAR.value
+FULL_HOUSE = PrizeType.FULL_HOUSE.value
+
+# Award order when several prizes complete on the same number
+PRIZE_ORDER = [EARLY_FIVE, TOP_LINE, MIDDLE_LINE, BOTTOM_LINE, FOUR_CORNERS, STAR, FULL_HOUSE]
+
+# Tickets never change once issued, so compiled forms are cached by id
+COMPILED_CACHE_SIZE = 50000
+
+
+def numbers_mask(numbers: Iterable[int]) -> int:
+    """Pack numbers into a bitmask (bit n set for number n)"""
+    mask = 0
+    for n in numbers:
+        mask |= 1 << n
+    return mask
+
+
+def _row_numbers(row: Sequence[Optional[int]]) -> List[int]:
+    return [n for n in row if n is not None]
+
+
+class CompiledTicket:
+    """Precomputed masks for one ticket"""
+    __slots__ = ("ticket_id", "grid", "mask", "prize_masks")
+
+    def __init__(self, ticket_id: str, grid: List[List[Optional[int]]], numbers: List[int]):
+        self.ticket_id = ticket_id
+        self.grid = grid
+        self.mask = numbers_mask(numbers)
+
+        rows = [_row_numbers(row) for row in grid] if len(grid) == 3 else [[], [], []]
+        corners = [rows[0][0], rows[0][-1], rows[2][0], rows[2][-1]] if rows[0] and rows[2] else []
+        # Star: four corners plus the centre number of the middle row
+        star = corners + [rows[1][len(rows[1]) // 2]] if corners and rows[1] else []
+
+        # An empty pattern (malformed ticket) can never win
+        self.prize_masks: Dict[str, int] = {
+            TOP_LINE: numbers_mask(rows[0]),
+            MIDDLE_LINE: numbers_mask(rows[1]),
+            BOTTOM_LINE: numbers_mask(rows[2]),
+            FOUR_CORNERS: numbers_mask(corners) if len(set(corners)) == 4 else 0,
+            STAR: numbers_mask(star) if len(set(star)) == 5 else 0,
+            FULL_HOUSE: self.mask,
+        }
+
+    def pattern_mask(self, cells: Iterable[Tuple[int, int]]) -> int:
+        """Mask for a custom pattern given as (row, col) grid cells"""
+        return numbers_mask(
+            self.grid[r][c] for r, c in cells
+            if 0 <= r < len(self.grid) and 0 <= c < len(self.grid[r]) and self.grid[r][c] is not None
+        )
+
+
+_compiled_cache: Dict[str, CompiledTicket] = {}
+
+
+def compile_ticket(ticket: dict) -> CompiledTicket:
+    """Compile a stored ticket document (any schema version), cached by ticket id"""
+    ticket_id = ticket.get("id")
+    compiled = _compiled_cache.get(ticket_id)
+    if compiled is not None:
+        return compiled
+
+    ticket = normalized(ticket)
+    compiled = CompiledTicket(ticket_id, ticket["grid"], ticket["numbers"])
+    if ticket_id is not None:
+        if len(_compiled_cache) >= COMPILED_CACHE_SIZE:
+            # Evict the oldest entry (dicts keep insertion order)
+            _compiled_cache.pop(next(iter(_compiled_cache)))
+        _compiled_cache[ticket_id] = compiled
+    return compiled
+
+
+def check_prize(compiled: CompiledTicket, called_mask: int, prize_type) -> bool:
+    """Has this ticket completed `prize_type` given the called-number mask?"""
+    prize_type = getattr(prize_type, "value", prize_type)
+
+    if prize_type == EARLY_FIVE:
+        return (compiled.mask & called_mask).bit_count() >= EARLY_FIVE_COUNT
+
+    mask = compiled.prize_masks.get(prize_type, 0)
+    return mask != 0 and mask & called_mask == mask
+
+
+def check_pattern(pattern_mask: int, called_mask: int) -> bool:
+    """Check a custom pattern mask built with CompiledTicket.pattern_mask"""
+    return pattern_mask != 0 and pattern_mask & called_mask == pattern_mask
+
@@ -237,33 +237,44 @@ export default function AdminScreen() {
       return;
     }
 
-    const handleNewRoom = (room: any) => {
-      // Keep rooms list up to date when new rooms are created
+    const mapRoom = (room: any): RoomItem => ({
+      id: room.id,
+      name: room.name,
+      host_id: room.host_id,
+      host_name: room.host_name,
+      status: room.status,
+      current_players: room.current_players,
+      max_players: room.max_players,
+    });
+
+    const handleLobbyUpdate = (data: { changes: any[] }) => {
+      // Keep rooms list up to date as rooms are created, filled and closed
       setRooms((prevRooms) => {
-        const next = Array.isArray(prevRooms) ? [...prevRooms] : [];
-        const existingIndex = next.findIndex((r) => r.id === room.id);
-
-        const mappedRoom: RoomItem = {
-          id: room.id,
-          name: room.name,
-          host_id: room.host_id,
-          host_name: room.host_name,
-          status: room.status,
-          current_players: room.current_players,
-          max_players: room.max_players,
-        };
-
-        if (existingIndex !== -1) {
-          next[existingIndex] = mappedRoom;
-        } else {
-          next.unshift(mappedRoom);
+        let next = Array.isArray(prevRooms) ? [...prevRooms] : [];
+
+        for (const change of data.changes || []) {
+          if (change.op === 'created') {
+            const mappedRoom = mapRoom(change.room);
+            const existingIndex = next.findIndex((r) => r.id === mappedRoom.id);
+            if (existingIndex !== -1) {
+              next[existingIndex] = mappedRoom;
+            } else {
+              next.unshift(mappedRoom);
+            }
+          } else if (change.op === 'updated') {
+            const { op, ...fields } = change;
+            next = next.map((r) => (r.id === change.id ? { ...r, ...fields } : r));
+          } else if (change.op === 'closed') {
+            next = next.map((r) => (r.id === change.id ? { ...r, status: 'completed' } : r));
+          }
         }
 
         return next;
       });
     };
 
-    socketService.on('new_room', handleNewRoom);
+    socketService.on('lobby_update', handleLobbyUpdate);
+    socketService.subscribeLobby();
 
     // Inform backend that admin connected to panel
     if (user) {
@@ -271,7 +282,8 @@ export default function AdminScreen() {
     }
 
     return () => {
-      socketService.off('new_room', handleNewRoom);
+      socketService.off('lobby_update', handleLobbyUpdate);
+      socketService.unsubscribeLobby();
     };
   }, [authenticated, user]);
 
@@ -40,16 +40,48 @@ export default function LobbyScreen() {
   useEffect(() => {
     loadRooms();
 
-    // Ensure socket is connected for real-time updates
+    // Live updates: the server pushes diffs for rooms matching the filter
+    let unsubscribe: (() => void) | undefined;
+    let cancelled = false;
     import('../services/socket').then(({ socketService }) => {
+      if (cancelled) return;
       if (!socketService.isConnected()) {
         socketService.connect().catch(err => {
           console.error('Failed to connect socket:', err);
         });
       }
+
+      socketService.on('lobby_update', handleLobbyUpdate);
+      socketService.subscribeLobby(filter === 'all' ? {} : { room_types: [filter] });
+      unsubscribe = () => {
+        socketService.off('lobby_update', handleLobbyUpdate);
+        socketService.unsubscribeLobby();
+      };
     });
+
+    return () => {
+      cancelled = true;
+      unsubscribe?.();
+    };
   }, [filter]);
 
+  const handleLobbyUpdate = (data: { changes: any[] }) => {
+    setRooms(prev => {
+      let next = prev;
+      for (const change of data.changes || []) {
+        if (change.op === 'created') {
+          next = [change.room, ...next.filter(r => r.id !== change.room.id)];
+        } else if (change.op === 'updated') {
+          const { op, ...fields } = change;
+          next = next.map(r => (r.id === change.id ? { ...r, ...fields } : r));
+        } else if (change.op === 'closed') {
+          next = next.filter(r => r.id !== change.id);
+        }
+      }
+      return next;
+    });
+  };
+
   const loadRooms = async () => {
     try {
       const filters = filter === 'all' ? {} : { room_type: filter };
@@ -18,6 +18,7 @@ import { useFocusEffect } from '@react-navigation/native';
 import { useAuth } from '../../../contexts/AuthContext';
 import { roomAPI, ticketAPI, gameAPI } from '../../../services/api';
 import { socketService } from '../../../services/socket';
+import { isPackedTickets, unpackTickets } from '../../../utils/ticketCodec';
 import * as Speech from 'expo-speech';
 
 const { width } = Dimensions.get('window');
@@ -64,7 +65,8 @@ export default function LiveGameScreen() {
   const [autoCall, setAutoCall] = useState(false);
   const [soundEnabled, setSoundEnabled] = useState(true);
   const [gameEnded, setGameEnded] = useState(false);
-  const autoCallInterval = useRef<number | null>(null);
+  // Sequence number of the last number_called applied (0 = none)
+  const lastSeqRef = useRef(0);
 
   useEffect(() => {
     loadGameData();
@@ -72,9 +74,6 @@ export default function LiveGameScreen() {
 
     return () => {
       cleanupSocketListeners();
-      if (autoCallInterval.current) {
-        clearInterval(autoCallInterval.current);
-      }
     };
   }, []);
 
@@ -93,7 +92,8 @@ export default function LiveGameScreen() {
 
   const loadTickets = async () => {
     try {
-      const userTickets = await ticketAPI.getMyTickets(params.id);
+      const response = await ticketAPI.getMyTickets(params.id, 'packed');
+      const userTickets = isPackedTickets(response) ? unpackTickets(response) : response;
 
       // ENSURE userTickets is an array
       if (!userTickets || !Array.isArray(userTickets)) {
@@ -125,6 +125,7 @@ export default function LiveGameScreen() {
   const loadGameData = async () => {
     try {
       const roomData = await roomAPI.getRoom(params.id);
+      lastSeqRef.current = Math.max(lastSeqRef.current, roomData.called_numbers?.length || 0);
       setRoom(roomData);
 
       // Load user's tickets
@@ -148,22 +149,28 @@ export default function LiveGameScreen() {
     socketService.on('number_called', handleNumberCalled);
     socketService.on('prize_claimed', handlePrizeClaimed);
     socketService.on('winner_announced', handleWinnerAnnounced);
+    socketService.on('prize_won', handlePrizeWon); // Server-awarded prizes
     socketService.on('game_started', handleGameStarted);
     socketService.on('game_paused', handleGamePaused);
     socketService.on('game_ended', handleGameEnded);
     socketService.on('game_completed', handleGameCompleted); // Graceful completion
-    socketService.on('ticket_updated', handleTicketUpdated); // Auto-marking
+    socketService.on('tickets_marked', handleTicketsMarked); // Auto-marking
+    socketService.on('auto_call_state', handleAutoCallState);
+    socketService.on('state_snapshot', handleStateSnapshot);
   };
 
   const cleanupSocketListeners = () => {
     socketService.off('number_called');
     socketService.off('prize_claimed');
     socketService.off('winner_announced');
+    socketService.off('prize_won');
     socketService.off('game_started');
     socketService.off('game_paused');
     socketService.off('game_ended');
     socketService.off('game_completed');
-    socketService.off('ticket_updated');
+    socketService.off('tickets_marked');
+    socketService.off('auto_call_state');
+    socketService.off('state_snapshot');
   };
 
   const handleGameCompleted = (data: any) => {
@@ -172,11 +179,6 @@ export default function LiveGameScreen() {
     setWinners(data.winners || []);
     setShowWinnersModal(true);
 
-    // Stop auto-calling
-    if (autoCallInterval.current) {
-      clearInterval(autoCallInterval.current);
-      autoCallInterval.current = null;
-    }
     setAutoCall(false);
 
     if (soundEnabled) {
@@ -184,37 +186,25 @@ export default function LiveGameScreen() {
     }
   };
 
-  const handleTicketUpdated = (data: any) => {
-    console.log('Ticket updated:', data);
-    // Update local ticket state with server-marked numbers
-    if (data.ticket) {
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) =>
-          ticket.id === data.ticket.id
-            ? { ...ticket, marked_numbers: data.ticket.marked_numbers || [] }
-            : ticket
-        )
-      );
-
-      // Update selected ticket if it's the one that was updated
-      setSelectedTicket((prev) =>
-        prev && prev.id === data.ticket.id
-          ? { ...prev, marked_numbers: data.ticket.marked_numbers || [] }
-          : prev
-      );
-    }
+  const handleTicketsMarked = (data: any) => {
+    console.log('Tickets marked:', data);
+    // Server sends only the ids of our tickets that hold the called number
+    if (!Array.isArray(data.ticket_ids)) return;
+    const markOn = (ticket: Ticket) =>
+      data.ticket_ids.includes(ticket.id) && !ticket.marked_numbers.includes(data.number)
+        ? { ...ticket, marked_numbers: [...ticket.marked_numbers, data.number] }
+        : ticket;
+
+    setTickets((prevTickets) => prevTickets.map(markOn));
+
+    // Update selected ticket if it was one of the marked ones
+    setSelectedTicket((prev) => (prev ? markOn(prev) : prev));
   };
 
   const handleGameStarted = (data: any) => {
     console.log('Game started:', data);
-    // Load tickets if they were just generated
-    if (data.tickets) {
-      const myTickets = data.tickets.filter((t: any) => t.user_id === user?.id);
-      setTickets(myTickets);
-      if (myTickets.length > 0) {
-        setSelectedTicket(myTickets[0]);
-      }
-    }
+    // game_started only carries the ticket-set version; fetch our own tickets
+    loadTickets();
     Alert.alert('Game Started!', 'The game has begun. Good luck!');
   };
 
@@ -226,12 +216,7 @@ export default function LiveGameScreen() {
     });
 
     if (data.is_paused) {
-      // Stop auto-calling if active
-      if (autoCallInterval.current) {
-        clearInterval(autoCallInterval.current);
-        autoCallInterval.current = null;
-      }
-      setAutoCall(false);
+      // Server-side auto-caller stays armed and skips numbers while paused
       Alert.alert('Game Paused', 'The game has been paused by the host');
     } else {
       Alert.alert('Game Resumed', 'The game has been resumed');
@@ -244,11 +229,6 @@ export default function LiveGameScreen() {
     setWinners(data.winners || []);
     setShowWinnersModal(true);
 
-    // Stop auto-calling
-    if (autoCallInterval.current) {
-      clearInterval(autoCallInterval.current);
-      autoCallInterval.current = null;
-    }
     setAutoCall(false);
 
     if (soundEnabled) {
@@ -258,12 +238,21 @@ export default function LiveGameScreen() {
 
   const handleNumberCalled = (data: any) => {
     console.log('Number called:', data);
+    // Messages carry only the new number; a gap in seq means we missed some
+    if (data.seq <= lastSeqRef.current) return;
+    if (data.seq > lastSeqRef.current + 1) {
+      socketService.syncState(params.id);
+    }
+    lastSeqRef.current = data.seq;
+
     setRoom((prev) => {
       if (!prev) return prev;
       return {
         ...prev,
         current_number: data.number,
-        called_numbers: data.called_numbers,
+        called_numbers: prev.called_numbers.includes(data.number)
+          ? prev.called_numbers
+          : [...prev.called_numbers, data.number],
       };
     });
 
@@ -273,14 +262,44 @@ export default function LiveGameScreen() {
     // Check if game is complete
     if (data.game_complete) {
       setGameEnded(true);
-      if (autoCallInterval.current) {
-        clearInterval(autoCallInterval.current);
-        autoCallInterval.current = null;
-      }
       setAutoCall(false);
     }
   };
 
+  // called_mask: 24 hex digits, bit n set once number n has been called
+  const decodeCalledMask = (hex: string): number[] => {
+    const numbers: number[] = [];
+    for (let i = 0; i < hex.length; i++) {
+      const nibble = parseInt(hex[hex.length - 1 - i], 16);
+      for (let bit = 0; bit < 4; bit++) {
+        if (nibble & (1 << bit)) numbers.push(i * 4 + bit);
+      }
+    }
+    return numbers;
+  };
+
+  const handleStateSnapshot = (data: any) => {
+    console.log('State snapshot:', data);
+    if (data.seq < lastSeqRef.current) return;
+    lastSeqRef.current = data.seq;
+
+    const called = decodeCalledMask(data.called_mask);
+    setRoom((prev) => {
+      if (!prev) return prev;
+      // The mask has no call order; keep what we had and append the rest
+      const known = prev.called_numbers.filter((n) => called.includes(n));
+      const missing = called.filter((n) => !known.includes(n) && n !== data.current_number);
+      const ordered = [...known.filter((n) => n !== data.current_number), ...missing];
+      if (data.current_number) ordered.push(data.current_number);
+      return {
+        ...prev,
+        current_number: data.current_number,
+        called_numbers: ordered,
+      };
+    });
+    called.forEach((n) => autoMarkNumber(n));
+  };
+
   const handlePrizeClaimed = (data: any) => {
     console.log('Prize claimed:', data);
     Alert.alert('Prize Claimed!', `${data.user_name} claimed ${data.prize_type}`);
@@ -294,6 +313,15 @@ export default function LiveGameScreen() {
     );
   };
 
+  const handlePrizeWon = (data: any) => {
+    console.log('Prize won:', data);
+    const winner = data.winner;
+    Alert.alert(
+      '🎉 Winner! 🎉',
+      `${winner.user_name} won ${winner.prize_type} with ticket #${winner.ticket_number} - ₹${winner.amount}!`
+    );
+  };
+
   const autoMarkNumber = (number: number) => {
     setTickets((prevTickets) =>
       prevTickets.map((ticket) => {
@@ -330,21 +358,19 @@ export default function LiveGameScreen() {
       return;
     }
 
+    // Numbers are drawn by the server; we only arm/disarm it
     if (autoCall) {
-      if (autoCallInterval.current) {
-        clearInterval(autoCallInterval.current);
-        autoCallInterval.current = null;
-      }
-      setAutoCall(false);
+      socketService.stopAutoCall(params.id);
     } else {
-      handleCallNumber(); // Call first number immediately
-      autoCallInterval.current = setInterval(() => {
-        handleCallNumber();
-      }, 5000); // Every 5 seconds
-      setAutoCall(true);
+      socketService.startAutoCall(params.id);
     }
   };
 
+  const handleAutoCallState = (data: any) => {
+    console.log('Auto call state:', data);
+    setAutoCall(!!data.running);
+  };
+
   const togglePause = () => {
     if (!room) return;
     socketService.pauseGame(params.id);
@@ -23,6 +23,9 @@ function safeParseResponseBody(text: string): any {
   }
 }
 
+// Last ETag and body per GET endpoint; a 304 reuses the body
+const etagCache = new Map<string, { etag: string; data: any }>();
+
 // safeFetch: never throws on plain "Internal Server Error"; uses text() only (no response.json()).
 const apiFetch = async (endpoint: string, options: RequestInit = {}) => {
   const token = await AsyncStorage.getItem('auth_token');
@@ -36,6 +39,12 @@ const apiFetch = async (endpoint: string, options: RequestInit = {}) => {
     headers.Authorization = `Bearer ${token}`;
   }
 
+  const isGet = !options.method || options.method === 'GET';
+  const cached = isGet ? etagCache.get(endpoint) : undefined;
+  if (cached) {
+    headers['If-None-Match'] = cached.etag;
+  }
+
   const controller = new AbortController();
   const timeoutId = setTimeout(() => controller.abort(), 30000);
 
@@ -48,6 +57,10 @@ const apiFetch = async (endpoint: string, options: RequestInit = {}) => {
 
     clearTimeout(timeoutId);
 
+    if (response.status === 304 && cached) {
+      return cached.data;
+    }
+
     const text = await response.text();
     const trimmedText = (text || '').trim();
 
@@ -70,6 +83,11 @@ const apiFetch = async (endpoint: string, options: RequestInit = {}) => {
       throw new Error((data && data.message) || `Server Error (${response.status})`);
     }
 
+    const etag = isGet ? response.headers.get('ETag') : null;
+    if (etag) {
+      etagCache.set(endpoint, { etag, data });
+    }
+
     return data;
   } catch (error: any) {
     if (error.name === 'AbortError') {
@@ -155,6 +173,11 @@ export const roomAPI = {
     return apiFetch(`/rooms/${roomId}/tickets`);
   },
 
+  /** Every ticket in a room, a page at a time (ETag-cached) - for display screens */
+  getAllTickets: async (roomId: string, page: number = 1, pageSize: number = 100, encoding: string = 'packed') => {
+    return apiFetch(`/rooms/${roomId}/all-tickets?page=${page}&page_size=${pageSize}&encoding=${encoding}`);
+  },
+
   /** Set winning ticket for room (host only) */
   setRoomAdminTicket: async (roomId: string, ticketId: string) => {
     return apiFetch(`/rooms/${roomId}/admin-ticket?ticket_id=${encodeURIComponent(ticketId)}`, {
@@ -175,18 +198,21 @@ export const roomAPI = {
 
 // ============= TICKET API =============
 export const ticketAPI = {
-  buyTickets: async (roomId: string, quantity: number) => {
+  // With strips=true, quantity is the number of 6-ticket strips (all 90 numbers each)
+  buyTickets: async (roomId: string, quantity: number, strips: boolean = false) => {
     return apiFetch('/tickets/buy', {
       method: 'POST',
       body: JSON.stringify({
         room_id: roomId,
         quantity,
+        strips,
       }),
     });
   },
 
-  getMyTickets: async (roomId: string) => {
-    return apiFetch(`/tickets/my-tickets/${roomId}`);
+  // encoding='packed' returns the compact form; decode with utils/ticketCodec
+  getMyTickets: async (roomId: string, encoding: string = 'json') => {
+    return apiFetch(`/tickets/my-tickets/${roomId}?encoding=${encoding}`);
   },
 };
 
@@ -196,18 +222,27 @@ export const walletAPI = {
     return apiFetch('/wallet/balance');
   },
 
-  addMoney: async (amount: number, paymentMethod: string = 'razorpay') => {
+  addMoney: async (
+    amount: number,
+    paymentMethod: string = 'razorpay',
+    idempotencyKey: string = `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  ) => {
+    // Reuse the key when retrying the same top-up so it is credited once
     return apiFetch('/wallet/add-money', {
       method: 'POST',
       body: JSON.stringify({
         amount,
         payment_method: paymentMethod,
+        idempotency_key: idempotencyKey,
       }),
     });
   },
 
-  getTransactions: async () => {
-    return apiFetch('/wallet/transactions');
+  // Newest first; pass the previous page's next_before to continue
+  getTransactions: async (before?: string, limit: number = 50) => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (before) params.append('before', before);
+    return apiFetch(`/wallet/transactions?${params.toString()}`);
   },
 };
 
@@ -10,10 +10,18 @@ if (!SOCKET_URL) {
   console.error('EXPO_PUBLIC_BACKEND_URL is missing!');
 }
 
+export interface LobbyFilters {
+  room_types?: string[];
+  price_bands?: ('low' | 'mid' | 'high')[];
+}
+
 class SocketService {
   private socket: Socket | null = null;
   private userId: string | null = null;
   private currentRoom: string | null = null;
+  private lastEventSeq = 0;
+  private roomEpoch: string | null = null;
+  private lobbyFilters: LobbyFilters | null = null;
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 5;
 
@@ -87,6 +95,29 @@ class SocketService {
       if (this.userId) {
         this.socket?.emit('authenticate', { user_id: this.userId });
       }
+
+      // Reconnected while in a room - replay what we missed
+      if (this.currentRoom && this.roomEpoch) {
+        this.resume(this.currentRoom);
+      }
+
+      // Lobby channel membership does not survive a reconnect
+      if (this.lobbyFilters && !this.currentRoom) {
+        this.socket?.emit('subscribe_lobby', this.lobbyFilters);
+      }
+    });
+
+    // Track the room event stream position for resume
+    this.socket.onAny((_event: string, data: any) => {
+      if (data && typeof data.event_seq === 'number') {
+        if (data.epoch && data.epoch !== this.roomEpoch) {
+          // New epoch (server restart / room reload): event_seq starts over
+          this.lastEventSeq = data.event_seq;
+          this.roomEpoch = data.epoch;
+        } else {
+          this.lastEventSeq = Math.max(this.lastEventSeq, data.event_seq);
+        }
+      }
     });
 
     this.socket.on('disconnect', () => {
@@ -117,6 +148,10 @@ class SocketService {
       return;
     }
 
+    if (this.currentRoom !== roomId) {
+      this.lastEventSeq = 0;
+      this.roomEpoch = null;
+    }
     this.currentRoom = roomId;
     this.socket.emit('join_room', { room_id: roomId });
     console.log('Joining room:', roomId);
@@ -133,6 +168,28 @@ class SocketService {
     this.socket.emit('leave_room', { room_id: this.currentRoom });
     console.log('Leaving room:', this.currentRoom);
     this.currentRoom = null;
+    this.lastEventSeq = 0;
+    this.roomEpoch = null;
+  }
+
+  /**
+   * Receive lobby_update diffs for rooms matching the filters
+   */
+  subscribeLobby(filters: LobbyFilters = {}) {
+    this.lobbyFilters = filters;
+    if (this.socket?.connected) {
+      this.socket.emit('subscribe_lobby', filters);
+    }
+  }
+
+  /**
+   * Stop lobby updates
+   */
+  unsubscribeLobby() {
+    this.lobbyFilters = null;
+    if (this.socket?.connected) {
+      this.socket.emit('unsubscribe_lobby');
+    }
   }
 
   /**
@@ -150,6 +207,64 @@ class SocketService {
     });
   }
 
+  /**
+   * Ask for a compact room snapshot after missing number_called events
+   */
+  syncState(roomId: string) {
+    if (!this.socket?.connected) {
+      console.error('Socket not connected');
+      return;
+    }
+
+    this.socket.emit('sync_state', { room_id: roomId });
+  }
+
+  /**
+   * Resume a room after reconnecting: the server replays events after
+   * lastEventSeq, or sends a state_snapshot if they are gone
+   */
+  resume(roomId: string) {
+    if (!this.socket?.connected) {
+      console.error('Socket not connected');
+      return;
+    }
+
+    this.socket.emit('resume', {
+      room_id: roomId,
+      user_id: this.userId,
+      last_seq: this.lastEventSeq,
+      epoch: this.roomEpoch,
+    });
+    console.log('Resuming room:', roomId, 'after event', this.lastEventSeq);
+  }
+
+  /**
+   * Start server-side auto-calling (host only)
+   */
+  startAutoCall(roomId: string, autoSpeed?: number) {
+    if (!this.socket?.connected) {
+      console.error('Socket not connected');
+      return;
+    }
+
+    this.socket.emit('start_auto_call', {
+      room_id: roomId,
+      auto_speed: autoSpeed,
+    });
+  }
+
+  /**
+   * Stop server-side auto-calling (host only)
+   */
+  stopAutoCall(roomId: string) {
+    if (!this.socket?.connected) {
+      console.error('Socket not connected');
+      return;
+    }
+
+    this.socket.emit('stop_auto_call', { room_id: roomId });
+  }
+
   /**
    * Claim a prize
    */
@@ -0,0 +1,92 @@
+/**
+ * Packed Ticket Decoding
+ * Mirrors backend/ticket_codec.py: each grid is a 4-byte little-endian
+ * layout mask (bit r*9+c) followed by one byte per number in row-major
+ * order; marked numbers are a 12-byte bitmask per ticket (bit n = number n)
+ */
+
+export interface PackedTickets {
+    encoding: string;
+    count: number;
+    ids: string[];
+    ticket_numbers: number[];
+    users: { id: string; name: string }[];
+    owners: number[];
+    grids: ArrayBuffer | Uint8Array | string;
+    marked: ArrayBuffer | Uint8Array | string;
+}
+
+const ROWS = 3;
+const COLUMNS = 9;
+const MARKED_SIZE = 12;
+
+const toBytes = (value: ArrayBuffer | Uint8Array | string): Uint8Array => {
+    if (typeof value === 'string') {
+        const raw = atob(value);
+        const bytes = new Uint8Array(raw.length);
+        for (let i = 0; i < raw.length; i++) {
+            bytes[i] = raw.charCodeAt(i);
+        }
+        return bytes;
+    }
+    return value instanceof Uint8Array ? value : new Uint8Array(value);
+};
+
+/**
+ * Check if a payload is a packed ticket set rather than a plain array
+ */
+export const isPackedTickets = (payload: any): payload is PackedTickets =>
+    !!payload && !Array.isArray(payload) && typeof payload.encoding === 'string';
+
+/**
+ * Expand a packed ticket set into the usual ticket objects
+ */
+export const unpackTickets = (payload: PackedTickets) => {
+    const grids = toBytes(payload.grids);
+    const marked = toBytes(payload.marked);
+    const tickets = [];
+    let offset = 0;
+
+    for (let i = 0; i < payload.count; i++) {
+        const mask =
+            (grids[offset] | (grids[offset + 1] << 8) | (grids[offset + 2] << 16) | (grids[offset + 3] << 24)) >>> 0;
+        offset += 4;
+
+        const grid: (number | null)[][] = [];
+        const numbers: number[] = [];
+        for (let r = 0; r < ROWS; r++) {
+            const row: (number | null)[] = [];
+            for (let c = 0; c < COLUMNS; c++) {
+                if ((mask >>> (r * COLUMNS + c)) & 1) {
+                    row.push(grids[offset]);
+                    numbers.push(grids[offset]);
+                    offset++;
+                } else {
+                    row.push(null);
+                }
+            }
+            grid.push(row);
+        }
+
+        const markedNumbers: number[] = [];
+        const base = i * MARKED_SIZE;
+        for (let n = 1; n <= 90; n++) {
+            if ((marked[base + (n >> 3)] >> (n & 7)) & 1) {
+                markedNumbers.push(n);
+            }
+        }
+
+        const owner = payload.users[payload.owners[i]];
+        tickets.push({
+            id: payload.ids[i],
+            ticket_number: payload.ticket_numbers[i],
+            user_id: owner.id,
+            user_name: owner.name,
+            grid,
+            numbers: numbers.sort((a, b) => a - b),
+            marked_numbers: markedNumbers,
+        });
+    }
+
+    return tickets;
+};
@@ -0,0 +1,112 @@
+"""
+RoomRouter over the in-process bus: two workers, one owner per room
+"""
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from cluster import MemoryRoomBus, RoomOwnerUnavailable, RoomRouter
+
+
+def _workers(count=2, **kwargs):
+    namespace = str(uuid.uuid4())
+    routers = [RoomRouter(MemoryRoomBus(namespace), **kwargs) for _ in range(count)]
+    ran = []
+
+    for router in routers:
+        async def whoami(room_id, router=router):
+            ran.append((router.worker_id, room_id))
+            return router.worker_id
+
+        async def refuse(room_id):
+            raise HTTPException(status_code=403, detail="Only host can call numbers")
+
+        router.register("whoami", whoami)
+        router.register("refuse", refuse)
+    return routers, ran
+
+
+def _run(coro_fn):
+    async def main():
+        routers, ran = _workers()
+        for router in routers:
+            router.start()
+        await asyncio.sleep(0)  # let the listeners subscribe
+        try:
+            await coro_fn(routers, ran)
+        finally:
+            for router in routers:
+                await router.stop()
+    asyncio.run(main())
+
+
+def test_operations_run_on_the_owner():
+    async def check(routers, ran):
+        a, b = routers
+        assert await b.run("r1", "whoami", room_id="r1") == b.worker_id
+        # a forwards to b, which took r1 first; r2 is a's
+        assert await a.run("r1", "whoami", room_id="r1") == b.worker_id
+        assert await a.run("r2", "whoami", room_id="r2") == a.worker_id
+        assert await b.run("r2", "whoami", room_id="r2") == a.worker_id
+        assert ran == [(b.worker_id, "r1"), (b.worker_id, "r1"), (a.worker_id, "r2"), (a.worker_id, "r2")]
+    _run(check)
+
+
+def test_http_errors_travel_back():
+    async def check(routers, ran):
+        a, b = routers
+        await a.run("r1", "whoami", room_id="r1")
+        with pytest.raises(HTTPException) as e:
+            await b.run("r1", "refuse", room_id="r1")
+        assert (e.value.status_code, e.value.detail) == (403, "Only host can call numbers")
+    _run(check)
+
+
+def test_rooms_move_when_the_owner_stops():
+    async def check(routers, ran):
+        a, b = routers
+        dropped = []
+        b.on_acquire(dropped.append)
+        await a.run("r1", "whoami", room_id="r1")
+        await a.stop()
+        assert await b.run("r1", "whoami", room_id="r1") == b.worker_id
+        assert dropped == ["r1"]
+    _run(check)
+
+
+def test_idle_rooms_are_released():
+    async def check(routers, ran):
+        a, b = routers
+        released = []
+        a.on_release(released.append)
+        a.is_live = lambda room_id: False
+        await a.run("r1", "whoami", room_id="r1")
+        a._owned["r1"] -= a.ttl  # taken long enough ago
+        await a._renew_owned()
+        assert released == ["r1"]
+        assert await b.run("r1", "whoami", room_id="r1") == b.worker_id
+    _run(check)
+
+
+def test_silent_owner_times_out():
+    async def main():
+        namespace = str(uuid.uuid4())
+        owner = RoomRouter(MemoryRoomBus(namespace))
+        caller = RoomRouter(MemoryRoomBus(namespace), timeout=0.05)
+        await owner.owner("r1")  # owns r1 but never listens
+        caller.start()
+        with pytest.raises(RoomOwnerUnavailable):
+            await caller.run("r1", "whoami", room_id="r1")
+        await caller.stop()
+    asyncio.run(main())
+
+
+def test_without_a_bus_everything_runs_locally():
+    async def main():
+        router = RoomRouter()
+        router.register("echo", lambda **kwargs: asyncio.sleep(0, kwargs))
+        assert not router.clustered
+        assert await router.run("r1", "echo", room_id="r1") == {"room_id": "r1"}
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+A prize claimed over the socket is recorded unpaid and paid by settlement
+"""
+import asyncio
+import logging
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from cluster import presence
+from models import Ticket
+from room_state import room_states
+from settlement import settle_room
+from socket_handlers import register_socket_events
+from ticket_generator import generate_tambola_ticket
+
+
+@pytest.fixture(autouse=True)
+def after_with_projection(monkeypatch):
+    """
+    mongomock re-runs the filter to fetch the AFTER document when the
+    projection drops _id, so guarded updates ({"wallet_keys": {"$ne": key}})
+    come back None. Project _id and drop it afterwards instead.
+    """
+    from mongomock.collection import Collection
+    find_and_modify = Collection._find_and_modify
+
+    def patched(self, query, projection=None, *args, **kwargs):
+        if isinstance(projection, dict) and projection.get("_id") == 0:
+            doc = find_and_modify(self, query, {k: v for k, v in projection.items() if k != "_id"} or None,
+                                  *args, **kwargs)
+            if doc is not None:
+                doc.pop("_id", None)
+            return doc
+        return find_and_modify(self, query, projection, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, "_find_and_modify", patched)
+
+
+class StubSio:
+    """Records handlers and emits; rooms are not tracked"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.emits = []
+
+    def event(self, handler):
+        self.handlers[handler.__name__] = handler
+        return handler
+
+    def on(self, name, handler):
+        self.handlers[name] = handler
+
+    async def emit(self, event, data=None, room=None, **kwargs):
+        self.emits.append((event, data, room))
+
+    async def enter_room(self, sid, room, namespace=None):
+        pass
+
+    async def leave_room(self, sid, room, namespace=None):
+        pass
+
+
+async def _claim_and_settle():
+    db = mongomock_motor.AsyncMongoMockClient()["tambola_test"]
+    await db.transactions.create_index("key", unique=True, sparse=True)
+
+    ticket_data = generate_tambola_ticket(1)
+    ticket = Ticket(
+        ticket_number=1, user_id="u1", user_name="Player", room_id="r1",
+        grid=ticket_data["grid"], numbers=ticket_data["numbers"]
+    ).dict()
+    await db.tickets.insert_one({**ticket})
+    await db.users.insert_one({"id": "u1", "name": "Player", "wallet_balance": 0.0})
+    await db.rooms.insert_one({
+        "id": "r1", "name": "Room", "host_id": "h", "status": "active",
+        "called_numbers": sorted(ticket["numbers"])[:5],
+        "prizes": [{"prize_type": "early_five", "amount": 50.0, "enabled": True, "multiple_winners": False}],
+    })
+
+    sio = StubSio()
+    await register_socket_events(sio, db)
+    await presence.bind("s1", "u1")
+    try:
+        await sio.handlers["claim_prize"]("s1", {
+            "room_id": "r1", "ticket_id": ticket["id"], "prize_type": "early_five"
+        })
+    finally:
+        await presence.unbind("s1")
+        room_states.drop("r1")
+
+    assert [event for event, _, _ in sio.emits] == ["prize_won"]
+    winner = await db.winners.find_one({"room_id": "r1"}, {"_id": 0})
+    assert (winner["amount"], winner["paid"]) == (50.0, False)
+
+    await settle_room(db, "r1")
+    user = await db.users.find_one({"id": "u1"}, {"_id": 0})
+    winner = await db.winners.find_one({"room_id": "r1"}, {"_id": 0})
+    entry = await db.transactions.find_one({"user_id": "u1"}, {"_id": 0})
+    return user, winner, entry
+
+
+def test_socket_claim_is_paid_at_settlement(caplog):
+    with caplog.at_level(logging.WARNING, logger="wallet"):
+        user, winner, entry = asyncio.run(_claim_and_settle())
+
+    # Paid by settlement itself, not recovered as an interrupted payout
+    assert not caplog.records
+
+    assert user["wallet_balance"] == 50.0
+    assert (user["total_wins"], user["total_winnings"]) == (1, 50.0)
+    assert winner["paid"] is True
+    assert (entry["amount"], entry["balance_after"]) == (50.0, 50.0)
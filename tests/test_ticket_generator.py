@@ -0,0 +1,73 @@
+"""
+Property tests for the vectorized ticket generator, over many seeds
+"""
+import numpy as np
+import pytest
+
+from ticket_generator import (
+    COLUMN_SIZE, COLUMN_START, COLUMNS, NUMBERS_PER_ROW, NUMBERS_PER_TICKET, ROWS, STRIP_SIZE,
+    generate_strips, generate_tickets, validate_strip, validate_ticket,
+)
+
+SEEDS = range(50)
+
+
+def _columns(grid):
+    return [[grid[r][c] for r in range(ROWS) if grid[r][c] is not None] for c in range(COLUMNS)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_generate_tickets(seed):
+    tickets = generate_tickets(200, start_number=7, rng=np.random.default_rng(seed))
+
+    assert [t["ticket_number"] for t in tickets] == list(range(7, 207))
+    for ticket in tickets:
+        grid = ticket["grid"]
+        assert validate_ticket(grid)
+        assert len(grid) == ROWS and all(len(row) == COLUMNS for row in grid)
+        assert all(sum(v is not None for v in row) == NUMBERS_PER_ROW for row in grid)
+
+        numbers = [v for row in grid for v in row if v is not None]
+        assert len(numbers) == len(set(numbers)) == NUMBERS_PER_TICKET
+        assert ticket["numbers"] == sorted(numbers)
+
+        for c, column in enumerate(_columns(grid)):
+            low, high = COLUMN_START[c], COLUMN_START[c] + COLUMN_SIZE[c] - 1
+            assert column, f"column {c} empty"
+            assert column == sorted(column)
+            assert all(low <= v <= high for v in column)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_generate_strips(seed):
+    strips = generate_strips(20, start_number=1, rng=np.random.default_rng(seed))
+
+    assert len(strips) == 20
+    for s, strip in enumerate(strips):
+        assert len(strip) == STRIP_SIZE
+        assert [t["ticket_number"] for t in strip] == list(range(s * STRIP_SIZE + 1, (s + 1) * STRIP_SIZE + 1))
+        assert validate_strip([t["grid"] for t in strip])
+        numbers = sorted(n for t in strip for n in t["numbers"])
+        assert numbers == list(range(1, 91))
+
+
+def test_validate_ticket_rejects_broken_grids():
+    grid = generate_tickets(1, rng=np.random.default_rng(0))[0]["grid"]
+    assert validate_ticket(grid)
+
+    # Swap the numbers of one filled column: no longer sorted
+    c = next(c for c in range(COLUMNS) if sum(grid[r][c] is not None for r in range(ROWS)) >= 2)
+    rows = [r for r in range(ROWS) if grid[r][c] is not None]
+    unsorted = [list(row) for row in grid]
+    unsorted[rows[0]][c], unsorted[rows[1]][c] = grid[rows[1]][c], grid[rows[0]][c]
+    assert not validate_ticket(unsorted)
+
+    short_row = [list(row) for row in grid]
+    short_row[0][next(i for i, v in enumerate(grid[0]) if v is not None)] = None
+    assert not validate_ticket(short_row)
+
+
+def test_validate_strip_rejects_repeated_ticket():
+    strip = [t["grid"] for t in generate_strips(1, rng=np.random.default_rng(0))[0]]
+    assert validate_strip(strip)
+    assert not validate_strip(strip[:-1] + strip[:1])